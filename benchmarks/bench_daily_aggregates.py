@@ -0,0 +1,95 @@
+"""Benchmark range statistics from the daily aggregate table against raw readings.
+
+Fills a throwaway database with a long history for one user, then times the
+statistics /summarize needs for the whole range computed from every reading
+(iter_readings + compute_stats) and from the per-day totals maintained by
+triggers (get_daily_aggregates + aggregate_stats). Also reports what the
+trigger adds to bulk inserts and how long the removals that update the
+totals take.
+
+    python benchmarks/bench_daily_aggregates.py --readings 50000 --per-day 8
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Database  # noqa: E402
+from models.reading_batch import ReadingBatch  # noqa: E402
+from services.stats_service import aggregate_stats, compute_stats  # noqa: E402
+
+FIRST_DAY = datetime(2015, 1, 1)
+USER_ID = 1
+
+def history(readings, per_day):
+    """`per_day` evenly spaced readings a day, starting at FIRST_DAY."""
+    rng = random.Random(42)
+    step = timedelta(days=1) / per_day
+    return [(USER_ID, rng.randint(95, 180), rng.randint(55, 115), rng.choice((None, 72)),
+             FIRST_DAY + i * step, None)
+            for i in range(readings)]
+
+def best_of(repeat, func):
+    """Fastest of `repeat` runs, in seconds."""
+    return min(timed(func) for _ in range(repeat))
+
+def timed(func):
+    """Seconds taken by one call of func."""
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=50_000)
+    parser.add_argument("--per-day", type=int, default=8)
+    parser.add_argument("--busy-day", type=int, default=8_640,
+                        help="readings on the single day removed with remove_readings_by_date")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    rows = history(args.readings, args.per_day)
+    busy_day = FIRST_DAY - timedelta(days=1)
+    busy_rows = [(USER_ID, 120, 80, None, busy_day + i * timedelta(days=1) / args.busy_day, None)
+                 for i in range(args.busy_day)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench.db")
+        db = Database(path, pool_size=1)
+        with_triggers = timed(lambda: db.add_readings(rows))
+
+        raw = best_of(args.repeat, lambda: compute_stats(
+            ReadingBatch.from_rows(db.iter_readings(USER_ID))))
+        days = len(db.get_daily_aggregates(USER_ID))
+        totals = best_of(args.repeat, lambda: aggregate_stats(db.get_daily_aggregates(USER_ID)))
+
+        # Removals keep the totals current as well
+        db.add_readings(busy_rows)
+        remove_day = timed(lambda: db.remove_readings_by_date(USER_ID, busy_day.date()))
+        remove_last = timed(lambda: [db.remove_last_reading(USER_ID) for _ in range(100)]) / 100
+        remove_all = timed(lambda: db.remove_all_readings(USER_ID))
+        db.close()
+
+        # The same insert into a table without the aggregate trigger
+        with sqlite3.connect(path) as conn:
+            conn.execute("DROP TRIGGER trg_readings_insert_aggregate")
+        db = Database(path, pool_size=1)
+        without_triggers = timed(lambda: db.add_readings(rows))
+        db.close()
+
+    print(f"{args.readings:,} readings over {days:,} days, best of {args.repeat}")
+    print(f"  raw readings:     {raw * 1000:9.1f} ms")
+    print(f"  daily aggregates: {totals * 1000:9.1f} ms  ({raw / totals:.0f}x faster)")
+    print(f"  bulk insert:      {without_triggers:9.2f} s without triggers, "
+          f"{with_triggers:.2f} s with")
+    print(f"  remove a day of {args.busy_day:,} readings: {remove_day * 1000:9.1f} ms")
+    print(f"  remove last reading:        {remove_last * 1000:9.2f} ms")
+    print(f"  remove all readings:        {remove_all * 1000:9.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark date-range reading queries before and after the composite index.
+
+Builds a throwaway database with millions of readings spread across thousands
+of users, then times the original DATE()-based query on the unindexed table
+against the indexed half-open range query used by Database.get_readings.
+
+    python benchmarks/bench_date_range.py --rows 2000000 --users 5000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Database, MIGRATIONS  # noqa: E402
+
+LEGACY_QUERY = '''SELECT systolic, diastolic, heart_rate, reading_datetime, description
+                  FROM blood_pressure_readings WHERE user_id = ?
+                  AND DATE(reading_datetime) BETWEEN ? AND ? ORDER BY reading_datetime'''
+
+FIRST_DAY = datetime(2020, 1, 1)
+DAYS = 4 * 365
+
+def populate(db_path, rows, users):
+    """Create the original, unindexed schema and fill it with random readings."""
+    rng = random.Random(42)
+
+    def generate():
+        for _ in range(rows):
+            taken_at = FIRST_DAY + timedelta(minutes=rng.randrange(DAYS * 24 * 60))
+            yield (rng.randrange(users), rng.randint(95, 180), rng.randint(55, 115),
+                   rng.randint(50, 110), taken_at.strftime("%Y-%m-%d %H:%M:%S"), None)
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(MIGRATIONS[0])
+        conn.executemany('''INSERT INTO blood_pressure_readings
+                         (user_id, systolic, diastolic, heart_rate, reading_datetime, description)
+                         VALUES (?, ?, ?, ?, ?, ?)''', generate())
+
+def random_ranges(queries, users):
+    """Pick (user_id, start_date, end_date) triples covering one to ninety days."""
+    rng = random.Random(7)
+    ranges = []
+    for _ in range(queries):
+        start = FIRST_DAY.date() + timedelta(days=rng.randrange(DAYS - 90))
+        ranges.append((rng.randrange(users), start, start + timedelta(days=rng.randint(0, 89))))
+    return ranges
+
+def time_queries(run_query, ranges):
+    """Return (total rows, seconds per query) for the given ranges."""
+    total = 0
+    started = time.perf_counter()
+    for user_id, start, end in ranges:
+        total += len(run_query(user_id, start, end))
+    return total, (time.perf_counter() - started) / len(ranges)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+
+        started = time.perf_counter()
+        populate(db_path, args.rows, args.users)
+        print(f"Inserted {args.rows:,} rows for {args.users:,} users "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        ranges = random_ranges(args.queries, args.users)
+
+        with sqlite3.connect(db_path) as conn:
+            def legacy(user_id, start, end):
+                return conn.execute(LEGACY_QUERY, (user_id, start.isoformat(), end.isoformat())).fetchall()
+            legacy_rows, legacy_time = time_queries(legacy, ranges)
+
+        # Opening through Database applies the index migration
+        started = time.perf_counter()
+        db = Database(db_path)
+        print(f"Built index in {time.perf_counter() - started:.1f}s")
+        indexed_rows, indexed_time = time_queries(db.get_readings, ranges)
+        db.close()
+
+        assert legacy_rows == indexed_rows, "queries returned different results"
+
+        print(f"DATE() BETWEEN, no index : {legacy_time * 1000:9.3f} ms/query")
+        print(f"Half-open range, indexed : {indexed_time * 1000:9.3f} ms/query")
+        print(f"Speedup                  : {legacy_time / indexed_time:9.1f}x "
+              f"({indexed_rows:,} rows over {args.queries} queries)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Micro-benchmark of the reading timestamp parse path.
+
+Compares the per-row datetime.strptime that Reading.from_tuple used to do
+against datetime.fromisoformat, and against rows that arrive already typed
+from SQLite through the DATETIME converter.
+
+    python benchmarks/bench_datetime_parse.py --rows 200000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Database  # noqa: E402
+from models.reading import Reading  # noqa: E402
+
+def report(label, seconds, rows):
+    print(f"{label:<42}: {seconds * 1000:8.1f} ms ({seconds / rows * 1e9:6.0f} ns/row)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    first = datetime(2020, 1, 1)
+    texts = [(first + timedelta(minutes=17 * i)).strftime("%Y-%m-%d %H:%M:%S")
+             for i in range(args.rows)]
+
+    report("datetime.strptime (old from_tuple)",
+           timeit.timeit(lambda: [datetime.strptime(t, "%Y-%m-%d %H:%M:%S") for t in texts],
+                         number=1), args.rows)
+    report("datetime.fromisoformat",
+           timeit.timeit(lambda: [datetime.fromisoformat(t) for t in texts], number=1), args.rows)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, "bench.db"))
+        with sqlite3.connect(db.db_path) as conn:
+            conn.executemany('''INSERT INTO blood_pressure_readings
+                             (user_id, systolic, diastolic, heart_rate, reading_datetime)
+                             VALUES (1, 120, 80, 70, ?)''', ((t,) for t in texts))
+
+        def old_path():
+            # Plain connection returns TEXT; every row is parsed with strptime
+            with sqlite3.connect(db.db_path) as conn:
+                rows = conn.execute('''SELECT systolic, diastolic, heart_rate, reading_datetime,
+                                    description FROM blood_pressure_readings''').fetchall()
+            return [Reading(r[0], r[1], r[2], datetime.strptime(r[3], "%Y-%m-%d %H:%M:%S"), r[4])
+                    for r in rows]
+
+        def new_path():
+            # Rows arrive typed through the DATETIME converter
+            return [Reading.from_tuple(r) for r in db.iter_readings(1)]
+
+        report("fetch + Reading, strptime per row", timeit.timeit(old_path, number=1), args.rows)
+        report("fetch + Reading, typed rows", timeit.timeit(new_path, number=1), args.rows)
+        db.close()
+
+if __name__ == "__main__":
+    main()
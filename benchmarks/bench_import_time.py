@@ -0,0 +1,61 @@
+"""Startup import-time benchmark for the bot.
+
+Runs `python -X importtime -c "import main"` in fresh interpreters and reports
+the median cumulative import time with the slowest modules. Exits non-zero if
+startup is slower than --max-ms or loads a module that should only be
+imported on first use, so it can guard against cold-start regressions.
+
+    python benchmarks/bench_import_time.py --runs 5 --max-ms 800
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy dependencies that only /report and /summarize need
+LAZY_MODULES = ("reportlab", "openai", "numpy", "markdown", "bs4", "tiktoken")
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def import_main():
+    """Import main once and return {module: cumulative microseconds}."""
+    env = dict(os.environ, TELEGRAM_BOT_TOKEN="benchmark", OPENAI_API_KEY="benchmark")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for match in LINE.finditer(result.stderr):
+        times[match.group(4)] = int(match.group(2))
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--max-ms", type=float, help="fail if the median exceeds this")
+    args = parser.parse_args()
+
+    runs = [import_main() for _ in range(args.runs)]
+    total = statistics.median(run["main"] for run in runs) / 1000
+    print(f"import main: {total:.1f} ms (median of {args.runs})")
+
+    last = runs[-1]
+    print("\nSlowest modules (cumulative, last run):")
+    for name, micros in sorted(last.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    failures = []
+    eager = sorted({name.split(".")[0] for name in last} & set(LAZY_MODULES))
+    if eager:
+        failures.append(f"imported at startup but should load lazily: {', '.join(eager)}")
+    if args.max_ms is not None and total > args.max_ms:
+        failures.append(f"startup import took {total:.1f} ms, over the {args.max_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark of converting AI advice from markdown to plain text.
+
+Compares the markdown -> HTML -> BeautifulSoup pipeline that analysis_service
+used to run on every completion against utils.plain_text.markdown_to_text,
+including the one-off cost of importing each.
+
+    python benchmarks/bench_markdown_to_text.py --repeat 2000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.plain_text import markdown_to_text  # noqa: E402
+
+SAMPLE = """## Summary
+
+Your average blood pressure over the last **30 days** is 128/83 mmHg, which is in the
+*stage 1* range. Morning readings are about 6 mmHg higher than evening ones.
+
+### What this means
+
+1. Your readings are **slightly above** the normal range.
+2. The trend is stable; there are no sudden spikes.
+3. Your heart rate is normal at around 72 bpm.
+
+### Advice
+
+- Reduce salt & processed food.
+- Aim for 30 minutes of walking most days.
+- Keep logging at the same times so trends are easy to see.
+- See [your doctor](https://example.com) if readings stay above 140/90.
+
+Stay well!
+"""
+
+def report(label, seconds, repeat):
+    print(f"{label:<34}: {seconds * 1000:8.1f} ms ({seconds / repeat * 1e6:7.1f} us/call)")
+
+def import_time(statement):
+    """Seconds to import in a fresh interpreter, so cached modules don't hide the cost."""
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    return float(subprocess.check_output([sys.executable, "-c", code], cwd=ROOT))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    import markdown
+    from bs4 import BeautifulSoup
+
+    def old(md_content):
+        return BeautifulSoup(markdown.markdown(md_content), "html.parser").get_text()
+
+    if old(SAMPLE) != markdown_to_text(SAMPLE):
+        sys.exit("Outputs differ; the benchmark would not be comparing like with like")
+
+    report("markdown + BeautifulSoup", timeit.timeit(lambda: old(SAMPLE), number=args.repeat),
+           args.repeat)
+    report("plain_text.markdown_to_text",
+           timeit.timeit(lambda: markdown_to_text(SAMPLE), number=args.repeat), args.repeat)
+
+    print(f"{'import markdown + bs4':<34}: "
+          f"{import_time('import markdown; import bs4') * 1000:8.1f} ms")
+    print(f"{'import utils.plain_text':<34}: "
+          f"{import_time('import utils.plain_text') * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
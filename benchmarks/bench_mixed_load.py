@@ -0,0 +1,108 @@
+"""Benchmark concurrent reads and writes under each SQLite storage profile.
+
+Fills a throwaway database with readings for a set of users, then runs reader
+threads fetching whole histories (as /report and /summarize do) alongside writer
+threads logging single readings (as /log does) for a fixed time per profile.
+
+    python benchmarks/bench_mixed_load.py --readers 4 --writers 2 --duration 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Database, STORAGE_PROFILES  # noqa: E402
+
+FIRST_DAY = datetime(2020, 1, 1)
+
+def populate(db, users, readings_per_user):
+    """Give every user a history of readings, one per eight hours."""
+    rng = random.Random(42)
+    db.add_readings([
+        (user_id, rng.randint(95, 180), rng.randint(55, 115), rng.randint(50, 110),
+         FIRST_DAY + timedelta(hours=8 * i), None)
+        for user_id in range(users) for i in range(readings_per_user)])
+
+def run_mixed_load(db, readers, writers, users, duration):
+    """Return (reads, writes, failed writes, write latencies) after `duration` seconds."""
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "failed": 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def read(seed):
+        rng = random.Random(seed)
+        done = 0
+        while not stop.is_set():
+            db.get_readings(rng.randrange(users))
+            done += 1
+        with lock:
+            counts["reads"] += done
+
+    def write(seed):
+        rng = random.Random(seed)
+        done = failed = 0
+        taken = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                db.add_reading(rng.randrange(users), 120, 80, 70, datetime.now(), "bench")
+                done += 1
+                taken.append(time.perf_counter() - started)
+            except sqlite3.OperationalError:
+                # "database is locked" once the busy timeout runs out
+                failed += 1
+        with lock:
+            counts["writes"] += done
+            counts["failed"] += failed
+            latencies.extend(taken)
+
+    threads = ([threading.Thread(target=read, args=(i,)) for i in range(readers)] +
+               [threading.Thread(target=write, args=(100 + i,)) for i in range(writers)])
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts["reads"], counts["writes"], counts["failed"], sorted(latencies)
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--readings", type=int, default=1_000, help="history length per user")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per profile")
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers and {args.writers} writers over {args.users} users "
+          f"with {args.readings:,} readings each, {args.duration:g}s per profile")
+    for profile in args.profiles:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = Database(os.path.join(tmp_dir, "bench.db"),
+                          pool_size=args.readers + args.writers, profile=profile)
+            populate(db, args.users, args.readings)
+            reads, writes, failed, latencies = run_mixed_load(
+                db, args.readers, args.writers, args.users, args.duration)
+            db.close()
+
+        print(f"{profile:>9}: {reads / args.duration:8.1f} reads/s  "
+              f"{writes / args.duration:8.1f} writes/s  "
+              f"write p50 {percentile(latencies, 0.5) * 1000:7.2f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:7.2f} ms  "
+              f"{failed} writes failed")
+
+if __name__ == "__main__":
+    main()
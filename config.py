@@ -7,13 +7,60 @@ load_dotenv()
 # Bot configuration
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # None uses the default OpenAI endpoint
 
 # Database configuration
 DB_PATH = 'blood_pressure.db'
+DB_POOL_SIZE = 5  # Maximum number of pooled SQLite connections
+DB_POOL_TIMEOUT = 10  # Seconds to wait for a free connection
+DB_STATEMENT_CACHE_SIZE = 128  # Prepared statements cached per connection
+DB_FETCH_SIZE = 500  # Rows fetched per chunk when streaming readings
+DB_STORAGE_PROFILE = os.getenv('DB_STORAGE_PROFILE', 'wal')  # 'wal' lets readers and writers overlap, 'rollback' is SQLite's default journal
+DB_MMAP_SIZE = 64 * 1024 * 1024  # Bytes of the database file memory-mapped by the 'wal' profile
+DB_CACHE_SIZE = 16 * 1024  # KiB of page cache per connection in the 'wal' profile
+DB_CHECKPOINT_INTERVAL = 300  # Seconds between WAL checkpoints run after writes
+DB_WRITE_BATCH_SIZE = 100  # Most readings the write-behind queue commits together
+DB_WRITE_BATCH_DELAY = 0.005  # Seconds a reading waits for others to share its commit
+REGEX_CACHE_SIZE = 128  # Compiled description filters kept for the REGEXP function
 
 # AI Model configuration
 AI_MODEL = "gpt-4o"
+OPENAI_MAX_CONCURRENCY = 4  # Completions allowed in flight at once
+OPENAI_TIMEOUT = 60  # Seconds before a single completion request times out
+OPENAI_MAX_RETRIES = 3  # Retries for timeouts, connection errors, rate limits and 5xx
+OPENAI_BACKOFF_BASE = 0.5  # Seconds; the retry delay doubles up to OPENAI_BACKOFF_MAX
+OPENAI_BACKOFF_MAX = 8
+STREAM_SUMMARIES = True  # Edit /summarize replies as the advice is written instead of waiting
+STREAM_EDIT_INTERVAL = 1.0  # Minimum seconds between edits, within Telegram's rate limits
+PROMPT_TOKEN_BUDGET = 6000  # Tokens allowed for the readings in an analysis prompt
+PROMPT_RECENT_READINGS = 50  # Newest readings kept verbatim when a prompt is compacted
+SUMMARY_AGGREGATE_THRESHOLD = 2000  # Readings above which /summarize works from daily totals
 
 # Application configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
-CACHE_EXPIRY = 3600  # Cache expiry in seconds
\ No newline at end of file
+CACHE_EXPIRY = 3600  # Cache expiry in seconds
+CACHE_MAX_ENTRIES = 1000  # Least recently used entries are evicted beyond this
+CACHE_MAX_BYTES = 8 * 1024 * 1024  # Approximate memory budget for cached values
+CACHE_SWEEP_INTERVAL = 60  # Seconds between sweeps for expired entries
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite')  # 'sqlite' keeps advice across restarts, 'memory' does not
+
+# Update delivery configuration
+BOT_MODE = os.getenv('BOT_MODE', 'polling')  # 'polling', or 'webhook' to serve updates over HTTP
+CONCURRENT_UPDATES = 16  # Updates handled at once, so one slow /report doesn't block other users
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Public base URL; if set, the webhook is registered at startup
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # Checked against Telegram's secret token header
+
+# Report rendering configuration
+REPORT_WORKERS = 2  # Worker processes rendering PDF reports in parallel
+REPORT_QUEUE_SIZE = 20  # Reports allowed to wait for a free worker
+
+# Import configuration
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024  # Largest file a bot can download from Telegram
+IMPORT_BATCH_SIZE = 500  # Rows parsed, validated and inserted at a time
+IMPORT_PROGRESS_INTERVAL = 2  # Seconds between progress message updates
+
+# Export configuration
+EXPORT_ROW_GROUP_SIZE = 10000  # Readings per row group in the columnar export format
\ No newline at end of file
@@ -0,0 +1,55 @@
+import tempfile
+from datetime import datetime
+from telegram import Update
+from telegram.ext import CallbackContext
+from utils.formatting import parse_date, extract_regex_pattern
+from models.async_database import async_db
+
+# Export format -> file name sent to the user
+EXPORT_FILENAMES = {
+    "csv": "blood_pressure_readings.csv.gz",
+    "columnar": "blood_pressure_readings.bpr",
+}
+
+async def export(update: Update, context: CallbackContext) -> None:
+    """Command to export readings as a gzipped CSV or columnar file."""
+    user_id = update.message.from_user.id
+
+    # Extract regex pattern from the command
+    regex_pattern, clean_text = extract_regex_pattern(update.message.text)
+
+    # Split the remaining text to get command, optional format and date arguments
+    args = clean_text.strip().split()[1:]
+    file_format = "csv"
+    if args and args[0].lower() in EXPORT_FILENAMES:
+        file_format = args.pop(0).lower()
+
+    # Process date arguments
+    start_date = end_date = None
+    try:
+        if len(args) >= 2:  # two dates
+            start_date = parse_date(args[0])
+            end_date = parse_date(args[1])
+        elif len(args) == 1:  # from one date until today
+            start_date = parse_date(args[0])
+            end_date = datetime.now().date()
+    except ValueError as e:
+        await update.message.reply_text(str(e))
+        return
+
+    # Written to a temporary file so a long history is never built up in memory
+    with tempfile.TemporaryFile() as out:
+        try:
+            count = await async_db.export_readings(user_id, out, file_format, start_date,
+                                                   end_date, regex_pattern)
+        except ValueError as e:
+            await update.message.reply_text(str(e))
+            return
+
+        if not count:
+            await update.message.reply_text("No readings found to export.")
+            return
+
+        out.seek(0)
+        await update.message.reply_document(document=out, filename=EXPORT_FILENAMES[file_format],
+                                            caption=f"Exported {count} readings.")
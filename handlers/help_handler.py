@@ -12,12 +12,18 @@ Here's how you can use this bot:
 
 /report [start_date] [end_date] pattern:"regex" - Generate a PDF report of your blood pressure readings with AI recommendation. Date range and regex pattern for filtering descriptions are optional.
 
+/cancelreport - Cancel a report that is queued or being generated.
+
 /removelast - Remove the most recent blood pressure reading.
 
 /removebydate <YYYY-MM-DD> - Remove all readings for a specific date.
 
 /removeall - Remove all your blood pressure readings.
 
+/export [csv|columnar] [start_date] [end_date] pattern:"regex" - Download your readings as a gzipped CSV (the default) or a compact columnar file. One date exports from that date until today.
+
+/import - Send a CSV or JSON file of readings with /import as its caption to add them all at once. Columns: systolic, diastolic, datetime, and optionally heart_rate and description.
+
 /summarize [start_date] [end_date] pattern:"regex" - Summarize your blood pressure readings and get medical advice. Date range and regex pattern for filtering descriptions are optional.
 
 /help - Show this help message.
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import tempfile
+from telegram import Update
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import CallbackContext
+from models.async_database import async_db
+from services.import_service import (ImportFormatError, ImportResult, detect_format,
+                                     read_import_batches)
+from config import IMPORT_MAX_FILE_SIZE, IMPORT_PROGRESS_INTERVAL
+
+USAGE = ('Send a CSV or JSON file with the caption /import, or reply /import to one.\n'
+         'Each row needs systolic, diastolic and datetime (YYYY-MM-DD HH:MM) columns; '
+         'heart_rate and description are optional.')
+
+def _progress_text(result):
+    text = f"Importing readings... {result.imported} imported so far"
+    if result.skipped:
+        text += f", {result.skipped} skipped"
+    return text + "."
+
+def _summary_text(result):
+    text = f"Imported {result.imported} readings."
+    if result.skipped:
+        text += f"\nSkipped {result.skipped} invalid rows:"
+        text += "".join(f"\nRow {number}: {error}" for number, error in result.errors)
+        if result.skipped > len(result.errors):
+            text += "\n..."
+    return text
+
+async def _show_progress(message, text):
+    """Edit the progress message; a missed update is simply shown with the next one."""
+    try:
+        await message.edit_text(text)
+    except (BadRequest, RetryAfter):
+        pass
+
+async def import_readings(update: Update, context: CallbackContext) -> None:
+    """Command to import readings from an uploaded CSV or JSON file."""
+    message = update.message
+    document = message.document
+    if document is None and message.reply_to_message is not None:
+        document = message.reply_to_message.document
+    if document is None:
+        await message.reply_text(USAGE)
+        return
+
+    file_format = detect_format(document.file_name, document.mime_type)
+    if file_format is None:
+        await message.reply_text("Only .csv and .json files can be imported.")
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await message.reply_text(
+            f"The file is too large; the limit is {IMPORT_MAX_FILE_SIZE // (1024 * 1024)} MB.")
+        return
+
+    status = await message.reply_text("Importing readings...")
+    result = ImportResult()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            # Downloaded to disk so the rows can be streamed rather than held in memory
+            path = os.path.join(tmp_dir, "upload")
+            telegram_file = await document.get_file()
+            await telegram_file.download_to_drive(path)
+
+            batches = read_import_batches(path, file_format, message.from_user.id, result)
+            work = asyncio.ensure_future(async_db.import_readings(batches))
+            while not work.done():
+                done, _ = await asyncio.wait({work}, timeout=IMPORT_PROGRESS_INTERVAL)
+                if not done:
+                    await _show_progress(status, _progress_text(result))
+            work.result()
+        except ImportFormatError as e:
+            await status.edit_text(f"Nothing was imported. {e}")
+            return
+        except Exception as e:
+            # The import is one transaction, so a failure part way leaves nothing behind
+            await status.edit_text(f"Nothing was imported: {e}")
+            return
+    await status.edit_text(_summary_text(result))
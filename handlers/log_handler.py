@@ -2,8 +2,18 @@ import re
 from datetime import datetime
 from telegram import Update
 from telegram.ext import CallbackContext
-from models.database import db
+from models.async_database import async_db
 from utils.formatting import parse_datetime
+from services.import_service import SYSTOLIC_RANGE, DIASTOLIC_RANGE, HEART_RATE_RANGE
+
+def _out_of_range(systolic, diastolic, heart_rate):
+    """Return an error message for an implausible value, or None if all are plausible."""
+    for name, value, (low, high) in (("Systolic", systolic, SYSTOLIC_RANGE),
+                                     ("Diastolic", diastolic, DIASTOLIC_RANGE),
+                                     ("Heart rate", heart_rate, HEART_RATE_RANGE)):
+        if value is not None and not low <= int(value) <= high:
+            return f"{name} must be from {low} to {high}."
+    return None
 
 async def log(update: Update, context: CallbackContext) -> None:
     """Command to log a new blood pressure reading."""
@@ -18,6 +28,12 @@ async def log(update: Update, context: CallbackContext) -> None:
         description = match.group(4) if match.group(4) else None
         datetime_str = match.group(5)
         
+        # Reject typos like 1200 before they are stored with the user's history
+        error = _out_of_range(systolic, diastolic, heart_rate)
+        if error:
+            await update.message.reply_text(error)
+            return
+        
         try:
             reading_datetime = datetime.now().replace(second=0, microsecond=0)
             if datetime_str:
@@ -27,7 +43,7 @@ async def log(update: Update, context: CallbackContext) -> None:
             return
 
         # Add reading to the database
-        db.add_reading(
+        await async_db.add_reading(
             update.message.from_user.id, 
             systolic, 
             diastolic, 
@@ -1,9 +1,11 @@
-import os
 import re
 from telegram import Update
 from telegram.ext import CallbackContext
 from utils.formatting import parse_date, extract_regex_pattern
-from services.report_generator import generate_pdf
+from models.async_database import async_db
+from services.report_queue import report_queue, ReportQueueFull, ReportCancelled
+
+REPORT_FILENAME = 'blood_pressure_report.pdf'
 
 async def report(update: Update, context: CallbackContext) -> None:
     """Command to generate a PDF report of blood pressure readings."""
@@ -43,13 +45,42 @@ async def report(update: Update, context: CallbackContext) -> None:
             )
             return
 
+    # The analysis and PDF stacks (openai, numpy, reportlab) load on the first report
+    # rather than when the bot starts
+    from services.analysis_service import analyze_readings_async
+    from services.report_generator import render_report_from_db
+
     try:
-        # Generate the report
-        filename = generate_pdf(user_id, start_date=start_date, end_date=end_date, 
-                               regex_pattern=regex_pattern)
+        # Refuse before reading the history or asking for advice if the report can't be queued
+        report_queue.check_capacity()
         
-        with open(filename, 'rb') as f:
-            await update.message.reply_document(document=f, caption='Here is your blood pressure report.')
+        # Stream the readings into the analysis without blocking the event loop. The data
+        # version is read first so it can never be newer than the readings it keys
+        data_version = await async_db.get_data_version(user_id)
+        readings = async_db.database.iter_readings(user_id, start_date, end_date, regex_pattern)
+        advice = await analyze_readings_async(readings, user_id, start_date, end_date, regex_pattern,
+                                              data_version)
+        
+        # Render the PDF on a worker process so reports build in parallel across cores;
+        # the worker reads the readings itself rather than receiving the whole history
+        job = report_queue.submit(user_id, render_report_from_db, user_id, advice,
+                                  async_db.database.db_path, start_date, end_date, regex_pattern,
+                                  in_memory=True)
+        position = report_queue.position(job)
+        if position:
+            await update.message.reply_text(
+                f"Your report is queued, position {position}. Send /cancelreport to cancel it.")
+        pdf_bytes = await job
+        
+        # Upload straight from memory; nothing touches the filesystem
+        await update.message.reply_document(document=pdf_bytes, filename=REPORT_FILENAME,
+                                            caption='Here is your blood pressure report.')
+    except ReportQueueFull:
+        await update.message.reply_text(
+            "Too many reports are being generated right now. Please try again in a few minutes.")
+    except ReportCancelled:
+        # /cancelreport has already confirmed the cancellation
+        pass
     except Exception as e:
         if "invalid regex" in str(e).lower():
             await update.message.reply_text(
@@ -58,7 +89,12 @@ async def report(update: Update, context: CallbackContext) -> None:
             )
         else:
             await update.message.reply_text(f"An error occurred while generating the report: {e}")
-    finally:
-        # Clean up the file if it exists
-        if 'filename' in locals() and os.path.exists(filename):
-            os.remove(filename)
\ No newline at end of file
+
+async def cancel_report(update: Update, context: CallbackContext) -> None:
+    """Command to cancel the user's queued or rendering reports."""
+    user_id = update.message.from_user.id
+    
+    if report_queue.cancel(user_id):
+        await update.message.reply_text("Your pending report has been cancelled.")
+    else:
+        await update.message.reply_text("You don't have a report in progress.")
@@ -1,9 +1,64 @@
+import asyncio
 from telegram import Update
+from telegram.constants import MessageLimit
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import CallbackContext
 from datetime import datetime
 from utils.formatting import parse_date, extract_regex_pattern
-from models.database import db
-from services.analysis_service import analyze_readings
+from models.async_database import async_db
+from config import (STREAM_SUMMARIES, STREAM_EDIT_INTERVAL, SUMMARY_AGGREGATE_THRESHOLD,
+                    PROMPT_RECENT_READINGS)
+
+def _advice_text(advice):
+    from services.analysis_service import ANALYSIS_ERROR_PREFIX, NO_READINGS_MESSAGE
+    # Only actual advice is labelled as such
+    if advice == NO_READINGS_MESSAGE or advice.startswith(ANALYSIS_ERROR_PREFIX):
+        return advice
+    return f"Medical Advice:\n{advice}"
+
+async def _edit(message, text):
+    """Edit a message, returning the seconds Telegram asks us to back off before
+    retrying, or None once the message shows `text`."""
+    try:
+        await message.edit_text(text)
+    except RetryAfter as e:
+        return e.retry_after
+    except BadRequest as e:
+        # Raised when the text hasn't changed since the last edit
+        if "not modified" not in str(e):
+            raise
+    return None
+
+async def _stream_reply(message, updates):
+    """Show streamed advice by editing `message`, at most once per STREAM_EDIT_INTERVAL.
+    
+    Advice too long for one message is continued in follow-up messages at the end.
+    """
+    loop = asyncio.get_running_loop()
+    next_edit = 0
+    shown = text = None
+    async for advice in updates:
+        text = _advice_text(advice)
+        if loop.time() >= next_edit and text[:MessageLimit.MAX_TEXT_LENGTH] != shown:
+            delay = await _edit(message, text[:MessageLimit.MAX_TEXT_LENGTH])
+            if delay is None:
+                shown = text[:MessageLimit.MAX_TEXT_LENGTH]
+            next_edit = loop.time() + max(delay or 0, STREAM_EDIT_INTERVAL)
+    
+    if text is None:
+        return
+    # The final text always goes out, after waiting out any throttle or back-off
+    parts = [text[i:i + MessageLimit.MAX_TEXT_LENGTH]
+             for i in range(0, len(text), MessageLimit.MAX_TEXT_LENGTH)]
+    if parts[0] != shown:
+        await asyncio.sleep(max(0, next_edit - loop.time()))
+        delay = await _edit(message, parts[0])
+        # Keep backing off until it lands, or a partial reply would stay on screen
+        while delay is not None:
+            await asyncio.sleep(delay)
+            delay = await _edit(message, parts[0])
+    for part in parts[1:]:
+        await message.reply_text(part)
 
 async def summarize(update: Update, context: CallbackContext) -> None:
     """Command to summarize blood pressure readings and get medical advice."""
@@ -31,21 +86,42 @@ async def summarize(update: Update, context: CallbackContext) -> None:
         await update.message.reply_text(str(e))
         return
     
+    # The analysis stack (openai, numpy) loads on the first summary rather than at startup
+    from services.analysis_service import analyze_readings_async, analyze_readings_stream
+    
     # Inform the user that their request is being processed
-    await update.message.reply_text("Please wait, analyzing your blood pressure readings...")
+    status = await update.message.reply_text("Please wait, analyzing your blood pressure readings...")
     
-    # Get readings from database
+    # Stream readings from the database straight into the analysis
     try:
-        readings = db.get_readings(user_id, start_date, end_date, regex_pattern)
+        # Read the data version first so it can never be newer than the readings it keys
+        data_version = await async_db.get_data_version(user_id)
+        readings = async_db.database.iter_readings(user_id, start_date, end_date, regex_pattern)
+        
+        # Long histories are described from their daily totals and newest readings
+        # rather than by reading every row; the totals can't be filtered by description
+        daily_aggregates = None
+        if regex_pattern is None:
+            daily_aggregates = await async_db.get_daily_aggregates(user_id, start_date, end_date)
+            if sum(day[1] for day in daily_aggregates) > SUMMARY_AGGREGATE_THRESHOLD:
+                readings = await async_db.get_recent_readings(user_id, PROMPT_RECENT_READINGS,
+                                                              start_date, end_date)
+            else:
+                daily_aggregates = None
         
-        if not readings:
-            await update.message.reply_text("No blood pressure readings found for the specified criteria.")
+        if STREAM_SUMMARIES:
+            # Replace the waiting message with the advice as the model writes it
+            await _stream_reply(status, analyze_readings_stream(
+                readings, user_id, start_date, end_date, regex_pattern, data_version,
+                daily_aggregates))
             return
         
-        # Analyze readings
-        advice = analyze_readings(readings, user_id, start_date, end_date, regex_pattern)
+        # Analyze readings without blocking the event loop; cached advice for this
+        # data version is returned without reading the rows
+        advice = await analyze_readings_async(readings, user_id, start_date, end_date, regex_pattern,
+                                              data_version, daily_aggregates)
         
         # Send the advice back to the user
-        await update.message.reply_text(f"Medical Advice:\n{advice}")
+        await update.message.reply_text(_advice_text(advice))
     except Exception as e:
-        await update.message.reply_text(f"An error occurred while processing your request: {e}")
\ No newline at end of file
+        await update.message.reply_text(f"An error occurred while processing your request: {e}")
@@ -1,17 +1,23 @@
 import logging
-from telegram.ext import Application, CommandHandler
-from config import TELEGRAM_BOT_TOKEN, LOG_LEVEL
+from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from config import TELEGRAM_BOT_TOKEN, LOG_LEVEL, BOT_MODE, CONCURRENT_UPDATES
 
 # Import handlers
 from handlers.start_handler import start
 from handlers.log_handler import log
-from handlers.report_handler import report
+from handlers.report_handler import report, cancel_report
 from handlers.remove_handler import remove_last, remove_by_date, remove_all
 from handlers.summarize_handler import summarize
 from handlers.help_handler import help_command
+from handlers.import_handler import import_readings
+from handlers.export_handler import export
 
 # Initialize database
 from models.database import init_db
+from utils.cache import init_cache
+
+# Report rendering workers
+from services.report_queue import report_queue
 
 # Configure logging
 logging.basicConfig(
@@ -20,27 +26,53 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def main() -> None:
-    """Start the bot."""
-    logger.info("Initializing database...")
-    init_db()
-
-    logger.info("Starting the bot...")
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+def build_application(webhook=False) -> Application:
+    """Build the bot application with all command handlers registered."""
+    builder = Application.builder().token(TELEGRAM_BOT_TOKEN).concurrent_updates(CONCURRENT_UPDATES)
+    if webhook:
+        # Updates arrive through the webhook server instead of the polling updater
+        builder = builder.updater(None)
+    application = builder.build()
 
     # Register command handlers
     logger.info("Registering command handlers...")
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("log", log))
     application.add_handler(CommandHandler("report", report))
+    application.add_handler(CommandHandler("cancelreport", cancel_report))
     application.add_handler(CommandHandler("removelast", remove_last))
     application.add_handler(CommandHandler("removebydate", remove_by_date))
     application.add_handler(CommandHandler("removeall", remove_all))
     application.add_handler(CommandHandler("summarize", summarize))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("export", export))
+    application.add_handler(CommandHandler("import", import_readings))
+    # Files uploaded with /import as their caption
+    application.add_handler(MessageHandler(
+        filters.Document.ALL & filters.CaptionRegex(r"^/import\b"), import_readings))
+    return application
 
-    logger.info("Bot is running...")
-    application.run_polling()
+def main() -> None:
+    """Start the bot."""
+    logger.info("Initializing database...")
+    init_db()
+
+    logger.info("Loading cached advice...")
+    loaded = init_cache()
+    logger.info("Loaded %d cached advice entries", loaded)
+
+    logger.info("Starting the bot...")
+    if BOT_MODE == "webhook":
+        # aiohttp is only needed, and imported, in webhook mode
+        from services.webhook_server import run_webhook
+        application = build_application(webhook=True)
+        logger.info("Bot is running with a webhook...")
+        run_webhook(application)
+    else:
+        application = build_application()
+        logger.info("Bot is running...")
+        application.run_polling()
+    report_queue.shutdown()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
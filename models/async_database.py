@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import models.database as database_module
+from models.write_queue import WriteBehindQueue
+from config import DB_POOL_SIZE
+
+class AsyncDatabase:
+    """Asyncio counterpart of Database that runs queries on a dedicated thread pool."""
+
+    def __init__(self, database=None, max_workers=DB_POOL_SIZE):
+        self._database = database
+        self._max_workers = max_workers
+        self._executor = None
+        self._writes = WriteBehindQueue(self._write_readings)
+
+    @property
+    def database(self):
+        """The wrapped Database, defaulting to the current module-level singleton."""
+        # Resolved on every call so that init_db() replacing the singleton is honoured
+        return self._database or database_module.db
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="db")
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking database callable without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), partial(func, *args, **kwargs))
+
+    async def add_reading(self, user_id, systolic, diastolic, heart_rate=None,
+                          reading_datetime=None, description=None):
+        """Add a new blood pressure reading to the database and return its id.
+
+        Readings added at about the same time are committed in one transaction; this
+        returns once that transaction is committed.
+        """
+        return await self._writes.put(
+            (user_id, systolic, diastolic, heart_rate, reading_datetime, description))
+
+    async def add_readings(self, readings):
+        """Add many readings in one transaction and return their ids."""
+        return await self.run(self.database.add_readings, readings)
+
+    async def import_readings(self, batches):
+        """Insert batches of readings in one transaction; `batches` is consumed on a worker thread."""
+        return await self.run(self.database.import_readings, batches)
+
+    async def _write_readings(self, readings):
+        return await self.run(self.database.add_readings, readings)
+
+    async def flush(self):
+        """Commit readings that are waiting for their batch."""
+        await self._writes.drain()
+
+    async def get_readings(self, user_id, start_date=None, end_date=None, regex_pattern=None):
+        """Get blood pressure readings with optional date range and regex filtering."""
+        return await self.run(self.database.get_readings, user_id, start_date, end_date,
+                              regex_pattern)
+
+    async def get_recent_readings(self, user_id, limit, start_date=None, end_date=None,
+                                  regex_pattern=None):
+        """Get the newest `limit` readings matching the filters, in chronological order."""
+        return await self.run(self.database.get_recent_readings, user_id, limit, start_date,
+                              end_date, regex_pattern)
+
+    async def get_daily_aggregates(self, user_id, start_date=None, end_date=None):
+        """Get the per-day totals of a user's readings."""
+        return await self.run(self.database.get_daily_aggregates, user_id, start_date, end_date)
+
+    async def export_readings(self, user_id, out, file_format="csv", start_date=None,
+                              end_date=None, regex_pattern=None):
+        """Write a user's readings to a binary file and return how many were written."""
+        return await self.run(self.database.export_readings, user_id, out, file_format,
+                              start_date, end_date, regex_pattern)
+
+    async def get_data_version(self, user_id):
+        """Get the version number of a user's readings."""
+        return await self.run(self.database.get_data_version, user_id)
+
+    async def remove_last_reading(self, user_id):
+        """Remove the last reading for a user."""
+        return await self.run(self.database.remove_last_reading, user_id)
+
+    async def remove_readings_by_date(self, user_id, target_date):
+        """Remove readings for a specific date."""
+        return await self.run(self.database.remove_readings_by_date, user_id, target_date)
+
+    async def remove_all_readings(self, user_id):
+        """Remove all readings for a user."""
+        return await self.run(self.database.remove_all_readings, user_id)
+
+    def close(self):
+        """Shut down the worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+# Initialize async database instance
+async_db = AsyncDatabase()
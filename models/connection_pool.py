@@ -0,0 +1,85 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from config import DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_STATEMENT_CACHE_SIZE
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections."""
+
+    def __init__(self, db_path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, on_connect=None,
+                 detect_types=0):
+        self.db_path = db_path
+        self.on_connect = on_connect
+        self.detect_types = detect_types
+        self.size = size
+        self.timeout = timeout
+        # LIFO so the most recently used (warmest) connection is handed out first
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        """Open a new connection that may be shared between worker threads."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               cached_statements=DB_STATEMENT_CACHE_SIZE,
+                               detect_types=self.detect_types)
+        if self.on_connect:
+            self.on_connect(conn)
+        return conn
+
+    def acquire(self):
+        """Take a connection from the pool, opening a new one if below the size limit."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Timed out waiting for a database connection to {self.db_path}")
+
+    def release(self, conn):
+        """Return a connection to the pool."""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of one transaction."""
+        conn = self.acquire()
+        try:
+            # Commits on success and rolls back on error, like sqlite3.connect() did
+            with conn:
+                yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close all idle connections; connections in use are closed on release."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
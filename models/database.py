@@ -1,25 +1,244 @@
+import logging
 import sqlite3
-from datetime import datetime
+import threading
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
 import re
-from config import DB_PATH
+from time import monotonic
+from config import (DB_PATH, DB_POOL_SIZE, DB_FETCH_SIZE, REGEX_CACHE_SIZE, DB_STORAGE_PROFILE,
+                    DB_MMAP_SIZE, DB_CACHE_SIZE, DB_CHECKPOINT_INTERVAL, EXPORT_ROW_GROUP_SIZE)
+from models.connection_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# SQL shared by the daily_aggregates migrations below and Database._recompute_day().
+# Migrations that have already run are never re-applied, so changing these does not
+# rebuild the totals of existing databases.
+
+# Category of a reading as an index into stats_service.CATEGORIES, the most severe first
+# as in stats_service.categorize()
+_CATEGORY_SQL = """CASE
+    WHEN systolic > 180 OR diastolic > 120 THEN 4
+    WHEN systolic >= 140 OR diastolic >= 90 THEN 3
+    WHEN systolic BETWEEN 130 AND 139 OR diastolic BETWEEN 80 AND 89 THEN 2
+    WHEN systolic BETWEEN 120 AND 129 AND diastolic < 80 THEN 1
+    ELSE 0 END"""
+
+_AGGREGATE_COLUMNS = """user_id, day, reading_count,
+    systolic_sum, systolic_min, systolic_max, diastolic_sum, diastolic_min, diastolic_max,
+    heart_rate_count, heart_rate_sum, heart_rate_min, heart_rate_max,
+    normal_count, elevated_count, stage1_count, stage2_count, crisis_count"""
+
+def _aggregate_days_sql(where):
+    """INSERT recomputing the daily_aggregates rows of the readings matching `where`."""
+    return f"""INSERT OR REPLACE INTO daily_aggregates ({_AGGREGATE_COLUMNS})
+       SELECT user_id, date(reading_datetime), COUNT(*),
+              SUM(systolic), MIN(systolic), MAX(systolic),
+              SUM(diastolic), MIN(diastolic), MAX(diastolic),
+              COUNT(heart_rate), COALESCE(SUM(heart_rate), 0), MIN(heart_rate), MAX(heart_rate),
+              SUM(category = 0), SUM(category = 1), SUM(category = 2), SUM(category = 3),
+              SUM(category = 4)
+       FROM (SELECT *, {_CATEGORY_SQL} AS category FROM blood_pressure_readings WHERE {where})
+       GROUP BY user_id, date(reading_datetime)"""
+
+# Schema migrations, applied in order. PRAGMA user_version stores how many have run,
+# so new statements must only ever be appended.
+MIGRATIONS = [
+    '''CREATE TABLE IF NOT EXISTS blood_pressure_readings (
+       id INTEGER PRIMARY KEY,
+       user_id INTEGER NOT NULL,
+       systolic INTEGER NOT NULL,
+       diastolic INTEGER NOT NULL,
+       heart_rate INTEGER NULL,
+       reading_datetime DATETIME NOT NULL,
+       description TEXT NULL)''',
+    '''CREATE INDEX IF NOT EXISTS idx_readings_user_datetime
+       ON blood_pressure_readings (user_id, reading_datetime)''',
+    # Normalize legacy TEXT values (e.g. 'T' separators or missing seconds) so every
+    # stored timestamp is canonical ISO text that the DATETIME converter can parse
+    '''UPDATE blood_pressure_readings
+       SET reading_datetime = strftime('%Y-%m-%d %H:%M:%S', reading_datetime)
+       WHERE strftime('%Y-%m-%d %H:%M:%S', reading_datetime) IS NOT NULL
+       AND reading_datetime IS NOT strftime('%Y-%m-%d %H:%M:%S', reading_datetime)''',
+    # Persisted AI advice so completions survive restarts; expires_at is Unix time
+    '''CREATE TABLE IF NOT EXISTS advice_cache (
+       cache_key TEXT PRIMARY KEY,
+       value TEXT NOT NULL,
+       expires_at REAL NOT NULL)''',
+    # A per-user counter bumped by every write to the user's readings, so cached
+    # results can be keyed on it and invalidated exactly
+    '''CREATE TABLE IF NOT EXISTS user_data_versions (
+       user_id INTEGER PRIMARY KEY,
+       version INTEGER NOT NULL)''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_readings_insert_version
+       AFTER INSERT ON blood_pressure_readings
+       BEGIN
+           INSERT INTO user_data_versions (user_id, version) VALUES (NEW.user_id, 1)
+           ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_readings_delete_version
+       AFTER DELETE ON blood_pressure_readings
+       BEGIN
+           INSERT INTO user_data_versions (user_id, version) VALUES (OLD.user_id, 1)
+           ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+       END''',
+    # Bumps both users in case an update moves a reading between them
+    '''CREATE TRIGGER IF NOT EXISTS trg_readings_update_version
+       AFTER UPDATE ON blood_pressure_readings
+       BEGIN
+           INSERT INTO user_data_versions (user_id, version) VALUES (OLD.user_id, 1)
+           ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+           INSERT INTO user_data_versions (user_id, version) VALUES (NEW.user_id, 1)
+           ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+       END''',
+    # Per-user daily totals, so long date ranges can be summarized from one row per
+    # day. Inserts update them incrementally in the trigger below; since a minimum or
+    # maximum can't be undone, the remove_* methods recompute the affected days once
+    # per call. Readings are never edited in place.
+    """CREATE TABLE IF NOT EXISTS daily_aggregates (
+       user_id INTEGER NOT NULL,
+       day TEXT NOT NULL,
+       reading_count INTEGER NOT NULL,
+       systolic_sum INTEGER NOT NULL,
+       systolic_min INTEGER NOT NULL,
+       systolic_max INTEGER NOT NULL,
+       diastolic_sum INTEGER NOT NULL,
+       diastolic_min INTEGER NOT NULL,
+       diastolic_max INTEGER NOT NULL,
+       heart_rate_count INTEGER NOT NULL,
+       heart_rate_sum INTEGER NOT NULL,
+       heart_rate_min INTEGER NULL,
+       heart_rate_max INTEGER NULL,
+       normal_count INTEGER NOT NULL,
+       elevated_count INTEGER NOT NULL,
+       stage1_count INTEGER NOT NULL,
+       stage2_count INTEGER NOT NULL,
+       crisis_count INTEGER NOT NULL,
+       PRIMARY KEY (user_id, day)) WITHOUT ROWID""",
+    _aggregate_days_sql("1"),
+    f"""CREATE TRIGGER IF NOT EXISTS trg_readings_insert_aggregate
+       AFTER INSERT ON blood_pressure_readings
+       BEGIN
+           INSERT INTO daily_aggregates ({_AGGREGATE_COLUMNS})
+           SELECT NEW.user_id, date(NEW.reading_datetime), 1,
+                  NEW.systolic, NEW.systolic, NEW.systolic,
+                  NEW.diastolic, NEW.diastolic, NEW.diastolic,
+                  NEW.heart_rate IS NOT NULL, COALESCE(NEW.heart_rate, 0),
+                  NEW.heart_rate, NEW.heart_rate,
+                  category = 0, category = 1, category = 2, category = 3, category = 4
+           FROM (SELECT {_CATEGORY_SQL} AS category
+                 FROM (SELECT NEW.systolic AS systolic, NEW.diastolic AS diastolic))
+           WHERE true
+           ON CONFLICT (user_id, day) DO UPDATE SET
+               reading_count = reading_count + 1,
+               systolic_sum = systolic_sum + excluded.systolic_sum,
+               systolic_min = MIN(systolic_min, excluded.systolic_min),
+               systolic_max = MAX(systolic_max, excluded.systolic_max),
+               diastolic_sum = diastolic_sum + excluded.diastolic_sum,
+               diastolic_min = MIN(diastolic_min, excluded.diastolic_min),
+               diastolic_max = MAX(diastolic_max, excluded.diastolic_max),
+               heart_rate_count = heart_rate_count + excluded.heart_rate_count,
+               heart_rate_sum = heart_rate_sum + excluded.heart_rate_sum,
+               -- MIN() and MAX() of a NULL are NULL, so fall back to whichever is set
+               heart_rate_min = COALESCE(MIN(heart_rate_min, excluded.heart_rate_min),
+                                         heart_rate_min, excluded.heart_rate_min),
+               heart_rate_max = COALESCE(MAX(heart_rate_max, excluded.heart_rate_max),
+                                         heart_rate_max, excluded.heart_rate_max),
+               normal_count = normal_count + excluded.normal_count,
+               elevated_count = elevated_count + excluded.elevated_count,
+               stage1_count = stage1_count + excluded.stage1_count,
+               stage2_count = stage2_count + excluded.stage2_count,
+               crisis_count = crisis_count + excluded.crisis_count;
+       END""",
+]
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Fields of the rows returned by Database.get_daily_aggregates()
+DAILY_AGGREGATE_FIELDS = (
+    "date", "count", "systolic_sum", "systolic_min", "systolic_max",
+    "diastolic_sum", "diastolic_min", "diastolic_max",
+    "heart_rate_count", "heart_rate_sum", "heart_rate_min", "heart_rate_max",
+    "normal", "elevated", "stage1", "stage2", "crisis",
+)
+
+# Pragmas of each storage profile. journal_mode is stored in the database file and set
+# once at startup; the others apply per connection and are set as each one is opened.
+STORAGE_PROFILES = {
+    # SQLite's defaults: a reader blocks writers, and every commit is fully synced
+    "rollback": {"journal_mode": "DELETE"},
+    # Readers and a writer run concurrently. synchronous=FULL syncs the WAL on every
+    # commit, so a /log batch is on disk before it is acknowledged
+    "wal": {"journal_mode": "WAL", "synchronous": "FULL", "mmap_size": DB_MMAP_SIZE,
+            "cache_size": -DB_CACHE_SIZE, "temp_store": "MEMORY"},
+}
+
+def _adapt_datetime(value):
+    """Store datetimes as ISO text ('YYYY-MM-DD HH:MM:SS'), as sqlite3 always has."""
+    return value.isoformat(" ")
+
+def _convert_datetime(value):
+    """Parse DATETIME columns once in SQLite's row conversion instead of per row in Python."""
+    return datetime.fromisoformat(value.decode())
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter("DATETIME", _convert_datetime)
+
+@lru_cache(maxsize=REGEX_CACHE_SIZE)
+def _compile_pattern(pattern):
+    """Compile a description filter once and reuse it across rows and queries."""
+    return re.compile(pattern, re.IGNORECASE)
+
+def _regexp(pattern, value):
+    """SQLite REGEXP implementation; `value REGEXP pattern` calls this as (pattern, value)."""
+    if value is None:
+        return False
+    return _compile_pattern(pattern).search(value) is not None
+
+def day_bounds(start_date, end_date=None):
+    """Return the half-open [start, end) timestamp range covering whole days."""
+    end_date = end_date or start_date
+    start = datetime.combine(start_date, time.min)
+    end = datetime.combine(end_date + timedelta(days=1), time.min)
+    return start.strftime(DATETIME_FORMAT), end.strftime(DATETIME_FORMAT)
 
 class Database:
-    def __init__(self, db_path=DB_PATH):
+    def __init__(self, db_path=DB_PATH, pool_size=DB_POOL_SIZE, profile=DB_STORAGE_PROFILE,
+                 checkpoint_interval=DB_CHECKPOINT_INTERVAL):
+        if profile not in STORAGE_PROFILES:
+            raise ValueError(f"Unknown storage profile: {profile}")
         self.db_path = db_path
+        self.profile = profile
+        self._pragmas = STORAGE_PROFILES[profile]
+        self.checkpoint_interval = checkpoint_interval
+        self._last_checkpoint = monotonic()
+        self._checkpoint_lock = threading.Lock()
+        # PARSE_DECLTYPES makes reading_datetime arrive as a datetime via _convert_datetime
+        self._pool = ConnectionPool(db_path, size=pool_size,
+                                    on_connect=self._configure_connection,
+                                    detect_types=sqlite3.PARSE_DECLTYPES)
         self._init_db()
     
+    def _configure_connection(self, conn):
+        """Register the SQL functions and apply the profile's pragmas on a new connection."""
+        conn.create_function("REGEXP", 2, _regexp, deterministic=True)
+        for name, value in self._pragmas.items():
+            if name != "journal_mode":
+                conn.execute(f"PRAGMA {name} = {value}")
+    
     def _init_db(self):
-        """Initialize the database schema if it doesn't exist."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''CREATE TABLE IF NOT EXISTS blood_pressure_readings (
-                           id INTEGER PRIMARY KEY,
-                           user_id INTEGER NOT NULL,
-                           systolic INTEGER NOT NULL,
-                           diastolic INTEGER NOT NULL,
-                           heart_rate INTEGER NULL,
-                           reading_datetime DATETIME NOT NULL,
-                           description TEXT NULL)''')
+        """Initialize the database schema and apply any pending migrations."""
+        with self._pool.connection() as conn:
+            # Switching journal mode needs no other connection in a transaction,
+            # so it happens here before any query runs
+            conn.execute(f"PRAGMA journal_mode = {self._pragmas['journal_mode']}")
+            # Take the write lock up front so concurrent starts don't race on user_version
+            conn.execute("BEGIN IMMEDIATE")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for statement in MIGRATIONS[version:]:
+                conn.execute(statement)
+            if version < len(MIGRATIONS):
+                conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
     
     def add_reading(self, user_id, systolic, diastolic, heart_rate=None, 
                    reading_datetime=None, description=None):
@@ -27,88 +246,284 @@ class Database:
         if not reading_datetime:
             reading_datetime = datetime.now().replace(second=0, microsecond=0)
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''INSERT INTO blood_pressure_readings 
                            (user_id, systolic, diastolic, heart_rate, reading_datetime, description) 
                            VALUES (?, ?, ?, ?, ?, ?)''', 
                            (user_id, systolic, diastolic, heart_rate, reading_datetime, description))
-            return cursor.lastrowid
-    
+        self._maybe_checkpoint()
+        return cursor.lastrowid
+
+    def add_readings(self, readings):
+        """Add many readings in one transaction and return their ids in order.
+
+        Each reading is a (user_id, systolic, diastolic, heart_rate, reading_datetime,
+        description) tuple; a missing reading_datetime means now.
+        """
+        now = datetime.now().replace(second=0, microsecond=0)
+        rows = [(*reading[:4], reading[4] or now, reading[5]) for reading in readings]
+        if not rows:
+            return []
+
+        with self._pool.connection() as conn:
+            conn.executemany('''INSERT INTO blood_pressure_readings
+                             (user_id, systolic, diastolic, heart_rate, reading_datetime, description)
+                             VALUES (?, ?, ?, ?, ?, ?)''', rows)
+            # The transaction holds the write lock, so the new ids are consecutive
+            # and end at the last one inserted
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        self._maybe_checkpoint()
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def import_readings(self, batches):
+        """Insert batches of readings, as taken by add_readings, in one transaction.
+        
+        `batches` may be a generator that parses its rows lazily; if it raises, nothing
+        is imported. Returns the number of readings inserted.
+        """
+        count = 0
+        with self._pool.connection() as conn:
+            # Rows are staged in a temporary table while the file is parsed. Writing it
+            # doesn't lock the database, so other writers only wait for the final copy.
+            conn.execute('''CREATE TEMP TABLE IF NOT EXISTS import_staging (
+                         user_id INTEGER, systolic INTEGER, diastolic INTEGER,
+                         heart_rate INTEGER, reading_datetime DATETIME, description TEXT)''')
+            for rows in batches:
+                conn.executemany('''INSERT INTO temp.import_staging
+                                 (user_id, systolic, diastolic, heart_rate, reading_datetime, description)
+                                 VALUES (?, ?, ?, ?, ?, ?)''', rows)
+                count += len(rows)
+            conn.execute('''INSERT INTO blood_pressure_readings
+                         (user_id, systolic, diastolic, heart_rate, reading_datetime, description)
+                         SELECT user_id, systolic, diastolic, heart_rate, reading_datetime, description
+                         FROM temp.import_staging ORDER BY rowid''')
+            conn.execute("DELETE FROM temp.import_staging")
+        self._maybe_checkpoint()
+        return count
+
     def get_readings(self, user_id, start_date=None, end_date=None, regex_pattern=None):
         """Get blood pressure readings with optional date range and regex filtering."""
-        query, params = self._prepare_query(user_id, start_date, end_date)
+        return list(self.iter_readings(user_id, start_date, end_date, regex_pattern))
+    
+    def iter_readings(self, user_id, start_date=None, end_date=None, regex_pattern=None,
+                      chunk_size=DB_FETCH_SIZE):
+        """Stream readings in chronological order, fetching them from SQLite in chunks.
+        
+        The filters are validated immediately; rows are only read as the result is iterated.
+        """
+        if regex_pattern:
+            try:
+                _compile_pattern(regex_pattern)
+            except re.error:
+                # Re-raise with more informative message
+                raise ValueError(f"Invalid regex pattern: {regex_pattern}")
+        
+        query, params = self._prepare_query(user_id, start_date, end_date, regex_pattern)
+        return self._stream(query, params, chunk_size)
+    
+    def get_recent_readings(self, user_id, limit, start_date=None, end_date=None,
+                            regex_pattern=None):
+        """Get the newest `limit` readings matching the filters, in chronological order."""
+        query, params = self._prepare_query(user_id, start_date, end_date, regex_pattern)
+        # Walk the index from the newest end and stop after `limit` rows
+        with self._pool.connection() as conn:
+            rows = conn.execute(query + " DESC LIMIT ?", (*params, limit)).fetchall()
+        rows.reverse()
+        return rows
+    
+    def get_daily_aggregates(self, user_id, start_date=None, end_date=None):
+        """Get one row per day with readings, in date order, with DAILY_AGGREGATE_FIELDS.
         
-        with sqlite3.connect(self.db_path) as conn:
+        The rows are kept up to date by triggers, so a range of years is read as a few
+        hundred rows rather than every reading in it.
+        """
+        query = """SELECT day, reading_count, systolic_sum, systolic_min, systolic_max,
+                   diastolic_sum, diastolic_min, diastolic_max,
+                   heart_rate_count, heart_rate_sum, heart_rate_min, heart_rate_max,
+                   normal_count, elevated_count, stage1_count, stage2_count, crisis_count
+                   FROM daily_aggregates WHERE user_id = ?"""
+        params = [user_id]
+        if start_date:
+            query += " AND day BETWEEN ? AND ?"
+            params.extend((start_date.isoformat(), (end_date or start_date).isoformat()))
+        query += " ORDER BY day"
+        with self._pool.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [(date.fromisoformat(row[0]), *row[1:]) for row in rows]
+    
+    def export_readings(self, user_id, out, file_format="csv", start_date=None, end_date=None,
+                        regex_pattern=None):
+        """Write a user's readings to the binary file `out` and return how many were written.
+        
+        file_format is "csv" for gzipped CSV or "columnar" for the compact format read
+        by models.reading_export.iter_columnar. Rows are streamed from the cursor, so
+        the full history is never held in memory.
+        """
+        # Imported here so the serializers (and NumPy) load on the first export
+        from models.reading_export import write_csv, write_columnar
+        if file_format not in ("csv", "columnar"):
+            raise ValueError(f"Unknown export format: {file_format}")
+        rows = self.iter_readings(user_id, start_date, end_date, regex_pattern)
+        try:
+            if file_format == "csv":
+                return write_csv(rows, out)
+            return write_columnar(rows, out, EXPORT_ROW_GROUP_SIZE)
+        finally:
+            # Returns the pooled connection even if writing failed part way
+            rows.close()
+    
+    def _stream(self, query, params, chunk_size):
+        """Yield rows of a query, holding one pooled connection until exhausted or closed."""
+        with self._pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
-            readings = cursor.fetchall()
-            
-            # Apply regex filtering if pattern provided
-            if regex_pattern and readings:
-                try:
-                    pattern = re.compile(regex_pattern, re.IGNORECASE)
-                    # Filter readings where description matches the pattern
-                    # Index 4 is the description field in the readings tuple
-                    filtered_readings = [r for r in readings if r[4] and pattern.search(r[4])]
-                    readings = filtered_readings
-                except re.error:
-                    # Re-raise with more informative message
-                    raise ValueError(f"Invalid regex pattern: {regex_pattern}")
-            
-            return readings
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
     
     def remove_last_reading(self, user_id):
         """Remove the last reading for a user."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._pool.connection() as conn:
+            # A single reverse seek on the (user_id, reading_datetime) index
+            last = conn.execute('''SELECT id, reading_datetime FROM blood_pressure_readings
+                                WHERE user_id = ? ORDER BY reading_datetime DESC LIMIT 1''',
+                                (user_id,)).fetchone()
+            if last is None:
+                return False
             cursor = conn.cursor()
-            cursor.execute('''SELECT id FROM blood_pressure_readings 
-                           WHERE user_id = ? ORDER BY reading_datetime DESC LIMIT 1''', 
-                           (user_id,))
-            last_reading = cursor.fetchone()
-            
-            if last_reading:
-                cursor.execute('DELETE FROM blood_pressure_readings WHERE id = ?', 
-                             (last_reading[0],))
-                return True
-            return False
+            cursor.execute('DELETE FROM blood_pressure_readings WHERE id = ?', (last[0],))
+            self._recompute_day(conn, user_id, last[1].date())
+        self._maybe_checkpoint()
+        return cursor.rowcount > 0
     
     def remove_readings_by_date(self, user_id, target_date):
         """Remove readings for a specific date."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''DELETE FROM blood_pressure_readings 
-                           WHERE user_id = ? AND DATE(reading_datetime) = ?''', 
-                           (user_id, target_date.strftime("%Y-%m-%d")))
-            return cursor.rowcount > 0
+                           WHERE user_id = ? AND reading_datetime >= ? AND reading_datetime < ?''', 
+                           (user_id, *day_bounds(target_date)))
+            conn.execute("DELETE FROM daily_aggregates WHERE user_id = ? AND day = ?",
+                         (user_id, f"{target_date:%Y-%m-%d}"))
+        self._maybe_checkpoint()
+        return cursor.rowcount > 0
     
     def remove_all_readings(self, user_id):
         """Remove all readings for a user."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM blood_pressure_readings WHERE user_id = ?', 
                          (user_id,))
-            return cursor.rowcount > 0
+            conn.execute("DELETE FROM daily_aggregates WHERE user_id = ?", (user_id,))
+        self._maybe_checkpoint()
+        return cursor.rowcount > 0
+    
+    @staticmethod
+    def _recompute_day(conn, user_id, day):
+        """Rebuild a user's daily_aggregates row for `day` from the readings left on it."""
+        conn.execute("DELETE FROM daily_aggregates WHERE user_id = ? AND day = ?",
+                     (user_id, f"{day:%Y-%m-%d}"))
+        conn.execute(_aggregate_days_sql(
+            "user_id = ? AND reading_datetime >= ? AND reading_datetime < ?"),
+            (user_id, *day_bounds(day)))
     
-    def _prepare_query(self, user_id, start_date=None, end_date=None):
-        """Prepare the SQL query and parameters based on date filters."""
+    def get_data_version(self, user_id):
+        """Return a number that changes whenever the user's readings are added, edited or removed."""
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT version FROM user_data_versions WHERE user_id = ?",
+                               (user_id,)).fetchone()
+            return row[0] if row else 0
+
+    def get_cache_entries(self, now, limit):
+        """Return up to `limit` unexpired (cache_key, value, expires_at) rows, newest first."""
+        with self._pool.connection() as conn:
+            cursor = conn.execute(
+                "SELECT cache_key, value, expires_at FROM advice_cache WHERE expires_at > ? "
+                "ORDER BY expires_at DESC LIMIT ?", (now, limit))
+            return cursor.fetchall()
+
+    def set_cache_entry(self, cache_key, value, expires_at):
+        """Insert or replace a persisted cache entry."""
+        with self._pool.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO advice_cache (cache_key, value, expires_at) VALUES (?, ?, ?)",
+                (cache_key, value, expires_at))
+
+    def remove_expired_cache_entries(self, now):
+        """Delete persisted cache entries that expired before `now`."""
+        with self._pool.connection() as conn:
+            cursor = conn.execute("DELETE FROM advice_cache WHERE expires_at <= ?", (now,))
+            return cursor.rowcount
+
+    def checkpoint(self, mode="PASSIVE"):
+        """Copy committed WAL pages back into the database file.
+        
+        PASSIVE never waits for readers; TRUNCATE also empties the WAL file but waits.
+        Returns SQLite's (busy, wal_pages, checkpointed_pages), or None outside WAL mode.
+        """
+        if self._pragmas["journal_mode"] != "WAL":
+            return None
+        with self._pool.connection() as conn:
+            return conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    
+    def _maybe_checkpoint(self):
+        """Checkpoint after a write if checkpoint_interval has passed since the last one.
+        
+        SQLite also checkpoints by itself whenever the WAL reaches 1000 pages; this one
+        keeps the database file current during quieter periods too.
+        """
+        if monotonic() - self._last_checkpoint < self.checkpoint_interval:
+            return
+        # One writer checkpoints while the others carry on
+        if not self._checkpoint_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_checkpoint = monotonic()
+            self.checkpoint()
+        except sqlite3.Error:
+            logger.exception("WAL checkpoint failed")
+        finally:
+            self._checkpoint_lock.release()
+    
+    def _prepare_query(self, user_id, start_date=None, end_date=None, regex_pattern=None):
+        """Prepare the SQL query and parameters based on date and description filters."""
         query = '''SELECT systolic, diastolic, heart_rate, reading_datetime, description 
                   FROM blood_pressure_readings WHERE user_id = ?'''
         params = [user_id]
         
-        if start_date and end_date:
-            query += " AND DATE(reading_datetime) BETWEEN ? AND ?"
-            params.extend([start_date.strftime("%Y-%m-%d"), 
-                         end_date.strftime("%Y-%m-%d")])
-        elif start_date:
-            query += " AND DATE(reading_datetime) = ?"
-            params.append(start_date.strftime("%Y-%m-%d"))
+        # Compare raw timestamps against a half-open range so the
+        # (user_id, reading_datetime) index can be used instead of DATE() on every row
+        if start_date:
+            query += " AND reading_datetime >= ? AND reading_datetime < ?"
+            params.extend(day_bounds(start_date, end_date))
+        
+        # Filter descriptions inside SQLite so non-matching rows never reach Python
+        if regex_pattern:
+            query += " AND description REGEXP ?"
+            params.append(regex_pattern)
         
         query += " ORDER BY reading_datetime"
         return query, params
 
-# Initialize database instance
-db = Database()
+    def close(self):
+        """Close the pooled connections."""
+        self._pool.close()
+
+# The default instance is created on first access of models.database.db
+_db_lock = threading.Lock()
+
+def __getattr__(name):
+    """Open the default database on first use instead of at import."""
+    global db
+    if name != "db":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _db_lock:
+        if "db" not in globals():
+            db = Database()
+    return db
 
 def init_db(db_path=DB_PATH):
     """Initialize the database. This function is kept for backward compatibility."""
@@ -1,8 +1,19 @@
 from datetime import datetime
 
+def to_datetime(value):
+    """Return a reading timestamp as a datetime, parsing ISO text only if needed."""
+    if isinstance(value, str):
+        # fromisoformat is implemented in C and far cheaper than strptime
+        return datetime.fromisoformat(value)
+    return value
+
 class Reading:
     """Model class for blood pressure readings."""
     
+    # No per-instance __dict__; reports create one Reading per row
+    __slots__ = ("id", "user_id", "systolic", "diastolic", "heart_rate",
+                 "reading_datetime", "description")
+    
     def __init__(self, systolic, diastolic, heart_rate=None, 
                 reading_datetime=None, description=None, id=None, user_id=None):
         self.id = id
@@ -17,11 +28,12 @@ class Reading:
     def from_tuple(cls, data_tuple):
         """Create a Reading object from a database tuple."""
         # Expected tuple format: (systolic, diastolic, heart_rate, reading_datetime, description)
+        # Database rows already carry a datetime; ISO strings are still accepted
         return cls(
             systolic=data_tuple[0],
             diastolic=data_tuple[1],
             heart_rate=data_tuple[2],
-            reading_datetime=datetime.strptime(data_tuple[3], "%Y-%m-%d %H:%M:%S"),
+            reading_datetime=to_datetime(data_tuple[3]),
             description=data_tuple[4]
         )
     
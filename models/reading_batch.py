@@ -0,0 +1,107 @@
+import calendar
+from array import array
+from datetime import datetime, timedelta
+import numpy as np
+from models.reading import Reading, to_datetime
+
+EPOCH = datetime(1970, 1, 1)
+
+# array('H') has no null, and a heart rate of 0 is never a real measurement
+MISSING_HEART_RATE = 0
+
+def to_epoch(value):
+    """Convert a naive reading datetime (or its ISO string) to integer epoch seconds."""
+    return calendar.timegm(to_datetime(value).timetuple())
+
+def from_epoch(seconds):
+    """Convert epoch seconds back to a naive datetime."""
+    return EPOCH + timedelta(seconds=int(seconds))
+
+class ReadingBatch:
+    """Columnar container for many readings.
+
+    Values are kept in typed arrays (2 bytes per pressure/heart-rate value and 8 bytes
+    per timestamp) instead of one Python object per reading, and can be viewed as
+    NumPy arrays without copying for whole-column statistics.
+    """
+
+    __slots__ = ("systolic", "diastolic", "heart_rate", "timestamps")
+
+    def __init__(self):
+        self.systolic = array("H")
+        self.diastolic = array("H")
+        self.heart_rate = array("H")
+        self.timestamps = array("q")  # epoch seconds
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a batch from database tuples (systolic, diastolic, heart_rate, reading_datetime, ...)."""
+        batch = cls()
+        for row in rows:
+            batch.append_row(row)
+        return batch
+
+    def append(self, systolic, diastolic, heart_rate=None, reading_datetime=None):
+        """Add one reading's values to the columns."""
+        self.systolic.append(systolic)
+        self.diastolic.append(diastolic)
+        self.heart_rate.append(MISSING_HEART_RATE if heart_rate is None else heart_rate)
+        self.timestamps.append(to_epoch(reading_datetime))
+
+    def append_row(self, row):
+        """Add a database tuple to the columns."""
+        self.append(row[0], row[1], row[2], row[3])
+
+    def append_reading(self, reading):
+        """Add a Reading object to the columns."""
+        self.append(reading.systolic, reading.diastolic, reading.heart_rate,
+                    reading.reading_datetime)
+
+    def __len__(self):
+        return len(self.systolic)
+
+    def __iter__(self):
+        """Yield the batch back as Reading objects."""
+        for systolic, diastolic, heart_rate, timestamp in zip(
+                self.systolic, self.diastolic, self.heart_rate, self.timestamps):
+            yield Reading(
+                systolic=systolic,
+                diastolic=diastolic,
+                heart_rate=None if heart_rate == MISSING_HEART_RATE else heart_rate,
+                reading_datetime=from_epoch(timestamp)
+            )
+
+    @property
+    def nbytes(self):
+        """Memory used by the column buffers."""
+        return sum(column.itemsize * len(column) for column in
+                   (self.systolic, self.diastolic, self.heart_rate, self.timestamps))
+
+    def datetimes(self):
+        """Yield the reading timestamps as datetimes."""
+        for timestamp in self.timestamps:
+            yield from_epoch(timestamp)
+
+    def columns(self):
+        """Return zero-copy NumPy views of the columns.
+
+        The arrays cannot grow while a view is alive, so build the batch first.
+        """
+        return {
+            "systolic": np.frombuffer(self.systolic, dtype=np.uint16),
+            "diastolic": np.frombuffer(self.diastolic, dtype=np.uint16),
+            "heart_rate": np.frombuffer(self.heart_rate, dtype=np.uint16),
+            "timestamps": np.frombuffer(self.timestamps, dtype=np.int64),
+        }
+
+    def averages(self):
+        """Return (avg_systolic, avg_diastolic, avg_heart_rate) computed over whole columns.
+
+        The heart rate average skips missing values and is None if there are none.
+        """
+        if not len(self):
+            return None, None, None
+        columns = self.columns()
+        heart_rates = columns["heart_rate"][columns["heart_rate"] != MISSING_HEART_RATE]
+        avg_heart = float(heart_rates.mean()) if heart_rates.size else None
+        return float(columns["systolic"].mean()), float(columns["diastolic"].mean()), avg_heart
@@ -0,0 +1,129 @@
+"""Serializers for exporting readings as gzipped CSV or a compact columnar file.
+
+Both write rows of (systolic, diastolic, heart_rate, reading_datetime, description)
+as they arrive, so memory use does not grow with the number of readings.
+
+The columnar format stores readings in row groups, each column compressed on its own:
+
+    MAGIC
+    per row group:  uint32 row count, then for each of COLUMNAR_COLUMNS:
+                    uint32 compressed length, zlib-compressed little-endian values
+    uint32 0        end of file
+
+Timestamps are epoch seconds stored as differences from the previous reading, which
+compress far better than the absolute values; a heart rate of 0 means none was
+recorded, and a description length of -1 means there is no description.
+"""
+import csv
+import gzip
+import io
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate, islice
+from models.reading_batch import MISSING_HEART_RATE, from_epoch, to_epoch
+
+CSV_COLUMNS = ("systolic", "diastolic", "heart_rate", "datetime", "description")
+
+MAGIC = b"BPREADINGS1\n"
+
+# (name, array typecode) in the order they are written
+COLUMNAR_COLUMNS = (
+    ("systolic", "H"),
+    ("diastolic", "H"),
+    ("heart_rate", "H"),
+    ("timestamp_deltas", "q"),
+    ("description_lengths", "i"),
+    ("descriptions", "B"),  # UTF-8 text of all descriptions, concatenated
+)
+
+_UINT32 = struct.Struct("<I")
+
+def write_csv(rows, out):
+    """Write rows to the binary file `out` as gzipped CSV and return how many there were."""
+    count = 0
+    with gzip.GzipFile(fileobj=out, mode="wb") as compressed:
+        text = io.TextIOWrapper(compressed, encoding="utf-8", newline="")
+        writer = csv.writer(text)
+        writer.writerow(CSV_COLUMNS)
+        for systolic, diastolic, heart_rate, reading_datetime, description in rows:
+            writer.writerow((systolic, diastolic, heart_rate, reading_datetime, description))
+            count += 1
+        text.flush()
+        # Leave closing `out` to the caller
+        text.detach()
+    return count
+
+def _pack(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    data = zlib.compress(values.tobytes())
+    return _UINT32.pack(len(data)) + data
+
+def _unpack(data, typecode):
+    values = array(typecode)
+    values.frombytes(zlib.decompress(data))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def write_columnar(rows, out, row_group_size):
+    """Write rows to the binary file `out` in the columnar format and return how many there were."""
+    out.write(MAGIC)
+    count = 0
+    previous = 0
+    rows = iter(rows)
+    while True:
+        group = list(islice(rows, row_group_size))
+        if not group:
+            break
+        columns = {name: array(typecode) for name, typecode in COLUMNAR_COLUMNS}
+        for systolic, diastolic, heart_rate, reading_datetime, description in group:
+            columns["systolic"].append(systolic)
+            columns["diastolic"].append(diastolic)
+            columns["heart_rate"].append(MISSING_HEART_RATE if heart_rate is None else heart_rate)
+            timestamp = to_epoch(reading_datetime)
+            columns["timestamp_deltas"].append(timestamp - previous)
+            previous = timestamp
+            if description is None:
+                columns["description_lengths"].append(-1)
+            else:
+                encoded = description.encode("utf-8")
+                columns["description_lengths"].append(len(encoded))
+                columns["descriptions"].frombytes(encoded)
+        out.write(_UINT32.pack(len(group)))
+        for name, _ in COLUMNAR_COLUMNS:
+            out.write(_pack(columns[name]))
+        count += len(group)
+    out.write(_UINT32.pack(0))
+    return count
+
+def iter_columnar(stream):
+    """Yield (systolic, diastolic, heart_rate, reading_datetime, description) rows from a columnar file."""
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a columnar readings file")
+    previous = 0
+    while True:
+        (count,) = _UINT32.unpack(stream.read(_UINT32.size))
+        if not count:
+            return
+        columns = {}
+        for name, typecode in COLUMNAR_COLUMNS:
+            (length,) = _UINT32.unpack(stream.read(_UINT32.size))
+            columns[name] = _unpack(stream.read(length), typecode)
+
+        timestamps = list(accumulate(columns["timestamp_deltas"], initial=previous))[1:]
+        previous = timestamps[-1]
+        text = columns["descriptions"].tobytes()
+        offset = 0
+        for i in range(count):
+            length = columns["description_lengths"][i]
+            description = None
+            if length >= 0:
+                description = text[offset:offset + length].decode("utf-8")
+                offset += length
+            heart_rate = columns["heart_rate"][i]
+            yield (columns["systolic"][i], columns["diastolic"][i],
+                   None if heart_rate == MISSING_HEART_RATE else heart_rate,
+                   from_epoch(timestamps[i]), description)
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from config import DB_WRITE_BATCH_SIZE, DB_WRITE_BATCH_DELAY
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindQueue:
+    """Groups writes that arrive at about the same time into one flush.
+
+    A batch is flushed `max_delay` seconds after its first item arrives, or as soon as
+    it holds `max_batch` items. `flush` is an async callable that writes a list of items
+    and returns one result per item; put() returns its item's result once the whole
+    batch has been written. Must be used from the event loop thread.
+    """
+
+    def __init__(self, flush, max_batch=DB_WRITE_BATCH_SIZE, max_delay=DB_WRITE_BATCH_DELAY):
+        self._flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []  # (item, future), oldest first
+        self._timer = None
+        self._flushing = set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def put(self, item):
+        """Queue an item and wait until the batch containing it has been written."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._start_flush)
+        # Cancelling a caller only cancels its own future; the batch is still written
+        return await future
+
+    async def drain(self):
+        """Write pending items now and wait for every flush in progress."""
+        self._start_flush()
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._write(batch))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _write(self, batch):
+        try:
+            results = await self._flush([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch[0][1], exception=e)
+                return
+            # Retry one by one so a single bad item doesn't fail the rest of its batch
+            logger.warning("Batch of %d writes failed, retrying individually: %s", len(batch), e)
+            for entry in batch:
+                await self._write([entry])
+            return
+        for (_, future), result in zip(batch, results):
+            self._resolve(future, result=result)
+
+    @staticmethod
+    def _resolve(future, result=None, exception=None):
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
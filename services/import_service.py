@@ -0,0 +1,205 @@
+import csv
+import json
+import re
+from datetime import datetime
+from itertools import islice
+from config import IMPORT_BATCH_SIZE
+
+# Plausible values; anything outside is more likely a typo or a swapped column
+SYSTOLIC_RANGE = (50, 300)
+DIASTOLIC_RANGE = (30, 200)
+HEART_RATE_RANGE = (20, 250)
+MAX_DESCRIPTION_LENGTH = 500
+
+# Invalid rows listed back to the user; the rest are only counted
+MAX_REPORTED_ERRORS = 5
+
+JSON_CHUNK_SIZE = 64 * 1024
+
+# Column names accepted for each field, after lower-casing and replacing spaces and dashes
+COLUMN_ALIASES = {
+    "systolic": ("systolic", "sys", "sbp"),
+    "diastolic": ("diastolic", "dia", "dbp"),
+    "heart_rate": ("heart_rate", "heartrate", "pulse", "hr", "bpm"),
+    "datetime": ("datetime", "date_time", "reading_datetime", "timestamp", "measured_at"),
+    "date": ("date",),
+    "time": ("time",),
+    "description": ("description", "note", "notes", "comment"),
+}
+FIELD_BY_ALIAS = {alias: field for field, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+# A seconds fraction and a trailing UTC designator, which datetime.fromisoformat
+# only accepts from Python 3.11 unless the fraction has 3 or 6 digits
+FRACTION_PATTERN = re.compile(r"(:\d{2})\.(\d+)")
+UTC_SUFFIX_PATTERN = re.compile(r"\s*[Zz]$")
+
+class ImportFormatError(ValueError):
+    """Raised when an uploaded file cannot be read as readings at all."""
+
+class ImportResult:
+    """Running totals of an import, readable while it is still in progress."""
+
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []  # (row number, message) of the first skipped rows
+
+def detect_format(file_name, mime_type=None):
+    """Return 'csv' or 'json' for an uploaded file, or None if it is neither."""
+    name = (file_name or "").lower()
+    if name.endswith(".csv") or mime_type == "text/csv":
+        return "csv"
+    if name.endswith((".json", ".jsonl", ".ndjson")) or mime_type == "application/json":
+        return "json"
+    return None
+
+def _field(column):
+    """The field a column or key name stands for, or None."""
+    return FIELD_BY_ALIAS.get(str(column).strip().lower().replace(" ", "_").replace("-", "_"))
+
+def iter_csv_records(stream):
+    """Yield (row number, record) for each line of a CSV file with a header row."""
+    reader = csv.DictReader(stream)
+    columns = {_field(name) for name in reader.fieldnames or ()}
+    if not {"systolic", "diastolic"} <= columns:
+        raise ImportFormatError("The CSV file needs a header row naming its systolic, "
+                                "diastolic and datetime columns")
+    for record in reader:
+        yield reader.line_num, record
+
+def iter_json_records(stream, chunk_size=JSON_CHUNK_SIZE):
+    """Yield (row number, record) for a JSON array of objects or JSON Lines.
+
+    The text is read `chunk_size` characters at a time and each value is decoded as
+    soon as it is complete, so memory stays bounded by the largest single record.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    in_array = None
+    number = 0
+    while True:
+        # Skip whitespace and the commas between array elements
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position == len(buffer):
+            if eof:
+                if in_array:
+                    raise ImportFormatError("The JSON array is not closed")
+                return
+            buffer, position = stream.read(chunk_size), 0
+            eof = not buffer
+            continue
+
+        if in_array is None:
+            in_array = buffer[position] == "["
+            if in_array:
+                position += 1
+                continue
+        elif in_array and buffer[position] == "]":
+            return
+
+        try:
+            value, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise ImportFormatError(f"Invalid JSON: {e.msg}")
+            # Most likely a value cut off at the end of the chunk; read on and retry
+            more = stream.read(chunk_size)
+            buffer, position, eof = buffer[position:] + more, 0, not more
+            continue
+        number += 1
+        yield number, value
+
+def _normalize_record(record):
+    """Map the record's keys to field names, ignoring unknown columns."""
+    if not isinstance(record, dict):
+        raise ValueError("expected an object with named fields")
+    fields = {}
+    for key, value in record.items():
+        if key is None:
+            continue  # Extra CSV cells beyond the header
+        if isinstance(value, str):
+            value = value.strip()
+        field = _field(key)
+        if field and value not in (None, ""):
+            fields[field] = value
+    return fields
+
+def _whole_number(fields, field, bounds, required=True):
+    value = fields.get(field)
+    if value is None:
+        if required:
+            raise ValueError(f"{field} is missing")
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} is not a number: {value!r}")
+    low, high = bounds
+    if isinstance(value, bool) or not number.is_integer() or not low <= number <= high:
+        raise ValueError(f"{field} must be a whole number from {low} to {high}")
+    return int(number)
+
+def _reading_datetime(fields):
+    if "datetime" in fields:
+        text = str(fields["datetime"]).strip()
+    elif "date" in fields:
+        text = f"{fields['date']} {fields.get('time', '00:00')}".strip()
+    else:
+        raise ValueError("datetime is missing")
+    iso_text = UTC_SUFFIX_PATTERN.sub("+00:00", text)
+    iso_text = FRACTION_PATTERN.sub(lambda m: f"{m[1]}.{m[2][:6].ljust(6, '0')}", iso_text, count=1)
+    try:
+        value = datetime.fromisoformat(iso_text)
+    except ValueError:
+        raise ValueError(f"invalid datetime {text!r}, use YYYY-MM-DD HH:MM")
+    if value.tzinfo is not None:
+        # Stored timestamps are naive local time, like those from /log
+        value = value.astimezone().replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+def parse_reading(record, user_id):
+    """Validate one record and return it as a row for Database.add_readings."""
+    fields = _normalize_record(record)
+    systolic = _whole_number(fields, "systolic", SYSTOLIC_RANGE)
+    diastolic = _whole_number(fields, "diastolic", DIASTOLIC_RANGE)
+    if diastolic >= systolic:
+        raise ValueError("diastolic must be lower than systolic")
+    heart_rate = _whole_number(fields, "heart_rate", HEART_RATE_RANGE, required=False)
+    description = str(fields.get("description", "")).strip()[:MAX_DESCRIPTION_LENGTH] or None
+    return (user_id, systolic, diastolic, heart_rate, _reading_datetime(fields), description)
+
+def validate_batch(records, user_id, result):
+    """Return the valid rows of a batch of (row number, record), counting the rest in result."""
+    rows = []
+    for number, record in records:
+        try:
+            rows.append(parse_reading(record, user_id))
+        except ValueError as e:
+            result.skipped += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append((number, str(e)))
+    return rows
+
+def read_import_batches(path, file_format, user_id, result, batch_size=IMPORT_BATCH_SIZE):
+    """Yield validated rows of an uploaded file in batches of up to `batch_size` records.
+
+    The file is streamed rather than loaded, and `result` is updated as each batch is
+    consumed. Raises ImportFormatError if the file is not UTF-8 CSV or JSON.
+    """
+    iter_records = iter_csv_records if file_format == "csv" else iter_json_records
+    # utf-8-sig drops the byte order mark spreadsheet programs put at the start
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        records = iter_records(stream)
+        try:
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    return
+                rows = validate_batch(batch, user_id, result)
+                yield rows
+                result.imported += len(rows)
+        except UnicodeDecodeError:
+            raise ImportFormatError("The file must be UTF-8 text")
+        except csv.Error as e:
+            raise ImportFormatError(f"Invalid CSV: {e}")
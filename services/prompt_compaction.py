@@ -0,0 +1,289 @@
+import logging
+from datetime import timedelta
+from functools import lru_cache
+import numpy as np
+from models.database import DAILY_AGGREGATE_FIELDS
+from models.reading_batch import MISSING_HEART_RATE, from_epoch
+from config import AI_MODEL, PROMPT_TOKEN_BUDGET, PROMPT_RECENT_READINGS
+
+try:
+    import tiktoken
+except ImportError:  # In requirements.txt; token counts are only estimated without it
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+
+# Rough English average, used when the tokenizer can't be loaded
+CHARS_PER_TOKEN = 4
+
+# Encoding of current OpenAI chat models, for model names tiktoken doesn't know
+DEFAULT_ENCODING = "o200k_base"
+
+# Periods older readings are averaged over, finest first
+PERIODS = ("day", "week", "month")
+
+MAX_NOTE_LENGTH = 200
+
+# Notes referenced by one averaged line; further distinct notes are only counted
+MAX_NOTES_PER_LINE = 5
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(AI_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        # tiktoken downloads its encoding files on first use
+        logger.warning("Could not load the tokenizer, estimating token counts: %s", e)
+        return None
+
+def count_tokens(text):
+    """Count the tokens of text for AI_MODEL, estimating from its length without a tokenizer."""
+    encoding = _encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _period_keys(timestamps, period):
+    """Integer key of the day, week (starting Monday) or month of each timestamp."""
+    days = timestamps // SECONDS_PER_DAY
+    if period == "day":
+        return days
+    if period == "week":
+        # 1970-01-01 was a Thursday
+        return (days + 3) // 7
+    return timestamps.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+
+def _period_label(key, period):
+    if period == "day":
+        return f"{from_epoch(int(key) * SECONDS_PER_DAY):%Y-%m-%d}"
+    if period == "week":
+        return f"Week of {from_epoch((int(key) * 7 - 3) * SECONDS_PER_DAY):%Y-%m-%d}"
+    return str(np.datetime64(int(key), "M"))
+
+class _Notes:
+    """Numbers each distinct description once so repeats are referenced, not repeated."""
+
+    def __init__(self):
+        self.numbers = {}
+
+    @staticmethod
+    def key(description):
+        """The key two descriptions share if they are the same note, or None if empty."""
+        note = (description or "").strip()
+        return note.casefold() if note else None
+
+    def ref(self, description):
+        key = self.key(description)
+        if key is None:
+            return None
+        note = description.strip()
+        if key not in self.numbers:
+            self.numbers[key] = (len(self.numbers) + 1, note[:MAX_NOTE_LENGTH])
+        return self.numbers[key][0]
+
+    def render(self):
+        if not self.numbers:
+            return ""
+        lines = "".join(f"{number}. {note}\n" for number, note in self.numbers.values())
+        return f"Notes referenced above:\n{lines}"
+
+def _aggregate_line(label, count, systolic_sum, systolic_min, systolic_max, diastolic_sum,
+                    diastolic_min, diastolic_max, heart_count, heart_sum):
+    plural = "s" if count > 1 else ""
+    line = (f"{label}: {count} reading{plural}, average "
+            f"{systolic_sum / count:.0f}/{diastolic_sum / count:.0f} "
+            f"(systolic {systolic_min}-{systolic_max}, diastolic {diastolic_min}-{diastolic_max})")
+    if heart_count:
+        line += f", heart rate {heart_sum / heart_count:.0f}"
+    return line
+
+def _render_aggregates(out, columns, descriptions, indices, period, notes):
+    """Write one line per period for readings `indices`, which are sorted by time."""
+    systolic = columns["systolic"][indices].astype(np.int64)
+    diastolic = columns["diastolic"][indices].astype(np.int64)
+    heart_rate = columns["heart_rate"][indices].astype(np.int64)
+    has_heart_rate = heart_rate != MISSING_HEART_RATE
+
+    keys, starts, counts = np.unique(_period_keys(columns["timestamps"][indices], period),
+                                     return_index=True, return_counts=True)
+    systolic_sums = np.add.reduceat(systolic, starts)
+    diastolic_sums = np.add.reduceat(diastolic, starts)
+    systolic_min = np.minimum.reduceat(systolic, starts)
+    systolic_max = np.maximum.reduceat(systolic, starts)
+    diastolic_min = np.minimum.reduceat(diastolic, starts)
+    diastolic_max = np.maximum.reduceat(diastolic, starts)
+    heart_counts = np.add.reduceat(has_heart_rate.astype(np.int64), starts)
+    heart_sums = np.add.reduceat(np.where(has_heart_rate, heart_rate, 0), starts)
+
+    for i, key in enumerate(keys):
+        line = _aggregate_line(_period_label(key, period), counts[i], systolic_sums[i],
+                               systolic_min[i], systolic_max[i], diastolic_sums[i],
+                               diastolic_min[i], diastolic_max[i], heart_counts[i], heart_sums[i])
+        # Distinct notes of the period in time order, without numbering them yet
+        period_notes = {}
+        for index in indices[starts[i]:starts[i] + counts[i]]:
+            key = notes.key(descriptions[index])
+            if key is not None:
+                period_notes.setdefault(key, descriptions[index])
+        if period_notes:
+            shown = list(period_notes.values())[:MAX_NOTES_PER_LINE]
+            line += ", notes " + ", ".join(str(notes.ref(note)) for note in shown)
+            if len(period_notes) > len(shown):
+                line += f" and {len(period_notes) - len(shown)} others"
+        out.append(line + "\n")
+
+def _render_recent(out, columns, descriptions, indices, notes):
+    """Write readings `indices`, which are sorted by time, one per line."""
+    if not len(indices):
+        return
+    out.append(f"Most recent {len(indices)} readings:\n")
+    for index in indices:
+        heart_rate = columns["heart_rate"][index]
+        ref = notes.ref(descriptions[index])
+        out.append(
+            f"Systolic: {columns['systolic'][index]}, Diastolic: {columns['diastolic'][index]}, "
+            f"Heart Rate: {'N/A' if heart_rate == MISSING_HEART_RATE else heart_rate}, "
+            f"Date: {from_epoch(columns['timestamps'][index])}, "
+            f"{'No description' if ref is None else f'Note: {ref}'}\n")
+
+def _render(columns, descriptions, order, recent, period, omitted_before=None):
+    """Render readings `order` (sorted by time) with the last `recent` of them kept raw."""
+    notes = _Notes()
+    out = []
+    older, newest = order[:len(order) - recent], order[len(order) - recent:]
+    if omitted_before is not None:
+        out.append(f"Readings before {omitted_before:%Y-%m-%d} are left out here but are "
+                   "included in the summary statistics.\n")
+    if len(older):
+        out.append(f"Older readings averaged per {period}:\n")
+        _render_aggregates(out, columns, descriptions, older, period, notes)
+    _render_recent(out, columns, descriptions, newest, notes)
+    out.append(notes.render())
+    return "".join(out)
+
+def _fits(text, budget):
+    return count_tokens(text) <= budget
+
+def _fewest_dropped(candidates, render, budget):
+    """Render with the first of `candidates` (in order of dropping more) that fits.
+
+    Rendering shrinks as more is dropped, so the first fit is found by binary search.
+    Returns the rendering of the last candidate if none fits.
+    """
+    low, high = 0, len(candidates) - 1
+    while low < high:
+        middle = (low + high) // 2
+        if _fits(render(candidates[middle]), budget):
+            high = middle
+        else:
+            low = middle + 1
+    return render(candidates[low])
+
+def compact_readings(batch, descriptions, budget=PROMPT_TOKEN_BUDGET,
+                     recent=PROMPT_RECENT_READINGS):
+    """Describe a long reading history within about `budget` tokens.
+
+    The newest `recent` readings are kept as they are and older ones are averaged per
+    day, then per week or month if that is still too long. If even monthly averages
+    don't fit, the oldest months are left out, as few as possible; only once all of
+    them are gone are fewer recent readings kept. Repeated descriptions are listed
+    once and referenced by number.
+    `descriptions` holds the description of each reading in the batch, in batch order.
+    """
+    columns = batch.columns()
+    order = np.argsort(columns["timestamps"], kind="stable")
+    recent = min(recent, len(order))
+    for period in PERIODS:
+        text = _render(columns, descriptions, order, recent, period)
+        if _fits(text, budget):
+            return text
+
+    def render_from(start):
+        kept = order[start:]
+        omitted_before = from_epoch(columns["timestamps"][kept[0]]) if start else None
+        return _render(columns, descriptions, kept, min(recent, len(kept)), "month",
+                       omitted_before)
+
+    # Cut points at the start of each older month, then within the recent readings
+    older = len(order) - recent
+    months = _period_keys(columns["timestamps"][order[:older]], "month")
+    month_starts = np.flatnonzero(np.diff(months, prepend=months[:1] - 1)).tolist()
+    cuts = month_starts[1:] + list(range(older, len(order)))
+    return _fewest_dropped(cuts or [0], render_from, budget)
+
+def _day_period_label(day, period):
+    """Label of the day, week or month containing a date, as _period_label() writes it."""
+    if period == "day":
+        return f"{day:%Y-%m-%d}"
+    if period == "week":
+        return f"Week of {day - timedelta(days=day.weekday()):%Y-%m-%d}"
+    return f"{day:%Y-%m}"
+
+def _render_days(days, period, omitted_before=None):
+    """Render daily totals (dicts of DAILY_AGGREGATE_FIELDS, in date order) per period."""
+    out = []
+    if omitted_before is not None:
+        out.append(f"Readings before {omitted_before:%Y-%m-%d} are left out here but are "
+                   "included in the summary statistics.\n")
+    if not days:
+        return out
+    out.append(f"Older readings averaged per {period}:\n")
+    groups = {}
+    for day in days:
+        groups.setdefault(_day_period_label(day["date"], period), []).append(day)
+    for label, group in groups.items():
+        out.append(_aggregate_line(
+            label, sum(day["count"] for day in group),
+            sum(day["systolic_sum"] for day in group),
+            min(day["systolic_min"] for day in group), max(day["systolic_max"] for day in group),
+            sum(day["diastolic_sum"] for day in group),
+            min(day["diastolic_min"] for day in group), max(day["diastolic_max"] for day in group),
+            sum(day["heart_rate_count"] for day in group),
+            sum(day["heart_rate_sum"] for day in group)) + "\n")
+    return out
+
+def compact_aggregates(daily_aggregates, batch, descriptions, budget=PROMPT_TOKEN_BUDGET):
+    """Describe a long history from its daily totals and its newest readings.
+
+    `daily_aggregates` are Database.get_daily_aggregates() rows and `batch` holds the
+    newest readings, with their descriptions in batch order. Days before the newest
+    readings are averaged per day, week or month, whichever fits `budget` first; if
+    even monthly averages don't fit, as few of the oldest months as possible are left
+    out. Descriptions of the older readings are not available from the totals, so
+    only the newest are noted.
+    """
+    columns = batch.columns()
+    order = np.argsort(columns["timestamps"], kind="stable")
+    days = [dict(zip(DAILY_AGGREGATE_FIELDS, row)) for row in daily_aggregates]
+    first_recent = None
+    if len(order):
+        first_recent = from_epoch(columns["timestamps"][order[0]]).date()
+        days = [day for day in days if day["date"] < first_recent]
+
+    def render(days, period, omitted_before=None):
+        notes = _Notes()
+        out = _render_days(days, period, omitted_before)
+        _render_recent(out, columns, descriptions, order, notes)
+        out.append(notes.render())
+        return "".join(out)
+
+    for period in PERIODS:
+        text = render(days, period)
+        if count_tokens(text) <= budget:
+            return text
+
+    def render_from(start):
+        kept = days[start:]
+        return render(kept, "month", omitted_before=kept[0]["date"] if kept else first_recent)
+
+    # Cut points at the start of each month after the first, then all of them
+    cuts = [i for i in range(1, len(days))
+            if days[i]["date"].replace(day=1) != days[i - 1]["date"].replace(day=1)]
+    return _fewest_dropped(cuts + [len(days)], render_from, budget)
@@ -1,4 +1,7 @@
+import io
 from datetime import datetime
+from functools import lru_cache
+from itertools import chain
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
@@ -7,47 +10,55 @@ from reportlab.graphics.charts.lineplots import LinePlot
 from reportlab.graphics import renderPDF
 from reportlab.lib.utils import simpleSplit
 from models.reading import Reading
-from models.database import db
-from services.analysis_service import analyze_readings
+from models.reading_batch import ReadingBatch
+import models.database as database_module
+from services.stats_service import compute_stats, format_categories
 
 class ReportGenerator:
     """Service for generating PDF reports of blood pressure readings."""
     
-    def __init__(self, user_id, readings, advice):
+    def __init__(self, user_id, readings, advice, in_memory=False):
         self.user_id = user_id
         self.readings = readings
         self.advice = advice
         self.filename = f'{user_id}_blood_pressure_report.pdf'
-        self.pdf_canvas = canvas.Canvas(self.filename, pagesize=letter)
+        # In memory mode renders into a buffer and generate() returns the PDF bytes
+        self.buffer = io.BytesIO() if in_memory else None
+        self.pdf_canvas = canvas.Canvas(self.buffer or self.filename, pagesize=letter)
         self.y_position = 750  # Start position on the first page
     
     def generate(self, start_date=None, end_date=None, regex_pattern=None):
-        """Generate a PDF report of the readings."""
+        """Generate a PDF report of the readings.
+        
+        The readings are consumed in a single pass, so a stream such as
+        Database.iter_readings() is never materialized as a list.
+        """
         # Create header
         self.y_position = self._create_pdf_header(self.pdf_canvas, self.y_position)
         
+        readings = iter(self.readings)
+        first_reading = next(readings, None)
+        
         # If no readings, display a message
-        if not self.readings:
+        if first_reading is None:
             self.pdf_canvas.setFont("Helvetica", 12)
             self.pdf_canvas.drawString(40, self.y_position, 
                                      "No blood pressure readings found matching your criteria.")
             self.pdf_canvas.save()
-            return self.filename
-        
-        # Calculate averages
-        reading_objs = [Reading.from_tuple(r) for r in self.readings]
-        avg_systolic = sum(r.systolic for r in reading_objs) / len(reading_objs)
-        avg_diastolic = sum(r.diastolic for r in reading_objs) / len(reading_objs)
-        
-        # Calculate average heart rate (excluding None values)
-        heart_rates = [r.heart_rate for r in reading_objs if r.heart_rate is not None]
-        avg_heart = sum(heart_rates) / len(heart_rates) if heart_rates else None
+            return self._output()
         
         # Add filter information
         self._add_filter_info(start_date, end_date, regex_pattern)
         
-        # Process readings
-        self._add_readings(reading_objs)
+        # Process readings, collecting their values into compact columns on the way
+        reading_objs = (Reading.from_tuple(r) for r in chain([first_reading], readings))
+        batch = self._add_readings(reading_objs)
+        
+        # Calculate statistics in vectorized passes (heart rate excludes missing values)
+        stats = compute_stats(batch)
+        avg_systolic = stats["systolic"]["mean"]
+        avg_diastolic = stats["diastolic"]["mean"]
+        avg_heart = stats["heart_rate"]["mean"] if stats["heart_rate"] else None
         
         # Add averages
         self.y_position = self._check_add_new_page(self.pdf_canvas, self.y_position)
@@ -59,17 +70,31 @@ class ReportGenerator:
                    f"Heart Rate: {round(avg_heart, 2) if avg_heart else 'N/A'}")
         self.pdf_canvas.setFont("Helvetica-Bold", 12)
         self.pdf_canvas.drawString(40, self.y_position, avg_line)
+        self.y_position -= 20
+        
+        # Display ranges and category counts
+        range_line = (f"Range: Systolic {stats['systolic']['min']}-{stats['systolic']['max']}, "
+                      f"Diastolic {stats['diastolic']['min']}-{stats['diastolic']['max']}")
+        self.y_position = self._add_reading_entry(range_line, self.y_position)
+        self.y_position = self._add_reading_entry(
+            f"Categories: {format_categories(stats)}", self.y_position)
         
         # Add graph if we have enough data
-        if len(reading_objs) > 1:
+        if len(batch) > 1:
             graph_space_required = 250
             self.y_position = self._check_add_new_page(
                 self.pdf_canvas, self.y_position, graph_space_required)
             
-            self._add_blood_pressure_graph(reading_objs)
+            self._add_blood_pressure_graph(batch)
             self.y_position -= graph_space_required
         
         self.pdf_canvas.save()
+        return self._output()
+    
+    def _output(self):
+        """The generated PDF: its bytes in memory mode, otherwise its filename."""
+        if self.buffer is not None:
+            return self.buffer.getvalue()
         return self.filename
     
     def _create_pdf_header(self, pdf_canvas, y_position):
@@ -125,7 +150,8 @@ class ReportGenerator:
             self.y_position -= 20  # Add some space after filters
     
     def _add_readings(self, readings):
-        """Add readings to the report, grouped by date."""
+        """Add readings to the report, grouped by date, and return them as a ReadingBatch."""
+        batch = ReadingBatch()
         current_date = None
         for reading in readings:
             self.y_position = self._check_add_new_page(self.pdf_canvas, self.y_position)
@@ -145,6 +171,10 @@ class ReportGenerator:
                 current_date = reading_date
             
             self.y_position = self._add_reading_entry(str(reading), self.y_position)
+            
+            # Only the values are kept, not the Reading objects themselves
+            batch.append_reading(reading)
+        return batch
 
     def _add_ai_recommendations(self):
         """Add AI medical recommendations to the report."""
@@ -166,19 +196,19 @@ class ReportGenerator:
         else:
             self.y_position = self._add_reading_entry("No specific recommendations available.", self.y_position)
     
-    def _add_blood_pressure_graph(self, readings):
-        """Add a blood pressure graph to the report."""
+    def _add_blood_pressure_graph(self, batch):
+        """Add a blood pressure graph of a ReadingBatch to the report."""
         # Prepare data for the plot
         data = []
         dates = []
         
-        for reading in readings:
-            reading_date = reading.reading_datetime
+        for reading_date, systolic, diastolic in zip(batch.datetimes(), batch.systolic,
+                                                     batch.diastolic):
             dates.append(reading_date.strftime("%d-%b"))  # Format date as 'DD-MMM'
             
             # Convert readings into a (position, value) format
-            data.append((len(dates) - 1, reading.systolic))  # Systolic
-            data.append((len(dates) - 1, reading.diastolic))  # Diastolic
+            data.append((len(dates) - 1, systolic))  # Systolic
+            data.append((len(dates) - 1, diastolic))  # Diastolic
         
         # Drawing setup
         drawing = Drawing(400, 200)
@@ -225,14 +255,45 @@ class ReportGenerator:
         self.y_position -= 270  # Adjust position for recommendations
         self._add_ai_recommendations()
 
+def render_report(user_id, readings, advice, start_date=None, end_date=None, regex_pattern=None,
+                  in_memory=False):
+    """
+    Render a PDF report from already fetched readings and advice.
+    Returns the PDF bytes if in_memory is set, otherwise the filename it was written to.
+    Module-level so it can be pickled and run in a report worker process.
+    """
+    report_generator = ReportGenerator(user_id, readings, advice, in_memory=in_memory)
+    return report_generator.generate(start_date, end_date, regex_pattern)
+
+@lru_cache(maxsize=None)
+def _worker_database(db_path):
+    """The Database a report worker process reads from, opened on its first report."""
+    return database_module.Database(db_path, pool_size=1)
+
+def render_report_from_db(user_id, advice, db_path, start_date=None, end_date=None,
+                          regex_pattern=None, in_memory=False):
+    """
+    Render a PDF report, streaming the readings from the database at db_path.
+    Only the filters are sent to the report worker process, not the readings themselves.
+    """
+    readings = _worker_database(db_path).iter_readings(user_id, start_date, end_date,
+                                                        regex_pattern)
+    return render_report(user_id, readings, advice, start_date, end_date, regex_pattern,
+                         in_memory=in_memory)
+
 def generate_pdf(user_id, db_path='blood_pressure.db', start_date=None, end_date=None, regex_pattern=None):
     """
     Generate a PDF report of blood pressure readings.
     This function is kept for backward compatibility.
     """
-    # Get readings from the database
-    readings = db.get_readings(user_id, start_date, end_date, regex_pattern)
-    advice = analyze_readings(readings, user_id, start_date, end_date, regex_pattern)
+    # Imported here so report worker processes never load the OpenAI client
+    from services.analysis_service import analyze_readings
+    
+    # Stream readings from the database; the analysis and the report each take one pass
+    db = database_module.db
+    data_version = db.get_data_version(user_id)
+    advice = analyze_readings(db.iter_readings(user_id, start_date, end_date, regex_pattern),
+                              user_id, start_date, end_date, regex_pattern, data_version)
     # Generate the report
-    report_generator = ReportGenerator(user_id, readings, advice)
-    return report_generator.generate(start_date, end_date, regex_pattern)
\ No newline at end of file
+    readings = db.iter_readings(user_id, start_date, end_date, regex_pattern)
+    return render_report(user_id, readings, advice, start_date, end_date, regex_pattern)
\ No newline at end of file
@@ -0,0 +1,133 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from config import REPORT_WORKERS, REPORT_QUEUE_SIZE
+
+class ReportQueueFull(Exception):
+    """Raised when too many reports are already waiting to be rendered."""
+
+class ReportCancelled(Exception):
+    """Raised when waiting on a report that was cancelled."""
+
+def _create_process_pool(workers):
+    # Spawned workers start clean instead of forking a copy of the bot's
+    # threads, event loop and open SQLite connections
+    return ProcessPoolExecutor(max_workers=workers,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+class ReportJob:
+    """A report waiting for, or being rendered by, a worker process."""
+
+    def __init__(self, user_id, call, future):
+        self.user_id = user_id
+        self.call = call
+        self.future = future
+
+    def __await__(self):
+        return self.future.__await__()
+
+class ReportQueue:
+    """Bounded queue that renders reports in parallel on a pool of worker processes.
+
+    Jobs beyond the number of workers wait in FIFO order; once `max_pending` jobs are
+    waiting, submit() raises ReportQueueFull so callers can push back on the user.
+    Must be used from the event loop thread.
+    """
+
+    def __init__(self, workers=REPORT_WORKERS, max_pending=REPORT_QUEUE_SIZE,
+                 executor_factory=_create_process_pool):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor_factory = executor_factory
+        self._executor = None
+        self._waiting = []  # oldest first
+        self._running = []
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = self._executor_factory(self.workers)
+        return self._executor
+
+    def check_capacity(self):
+        """Raise ReportQueueFull if a report submitted now would be refused."""
+        if len(self._waiting) >= self.max_pending:
+            raise ReportQueueFull("Too many reports are waiting to be generated")
+
+    def submit(self, user_id, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) for a worker process and return its ReportJob.
+
+        func and its arguments must be picklable.
+        """
+        self.check_capacity()
+
+        job = ReportJob(user_id, partial(func, *args, **kwargs),
+                        asyncio.get_running_loop().create_future())
+        self._waiting.append(job)
+        self._dispatch()
+        return job
+
+    def position(self, job):
+        """1-based position of a job among those waiting, or 0 once it is rendering."""
+        try:
+            return self._waiting.index(job) + 1
+        except ValueError:
+            return 0
+
+    def cancel(self, user_id):
+        """Cancel every queued or rendering report of a user and return how many there were.
+
+        A report that is already rendering finishes in its worker, but its result is discarded.
+        """
+        jobs = [job for job in self._waiting + self._running
+                if job.user_id == user_id and not job.future.done()]
+        for job in jobs:
+            if job in self._waiting:
+                self._waiting.remove(job)
+            job.future.set_exception(ReportCancelled("The report was cancelled"))
+        return len(jobs)
+
+    def _dispatch(self):
+        """Start waiting jobs while workers are free."""
+        while self._waiting and len(self._running) < self.workers:
+            job = self._waiting.pop(0)
+            self._running.append(job)
+            try:
+                work = asyncio.wrap_future(self._get_executor().submit(job.call))
+            except Exception as e:
+                self._finish_job(job, exception=e)
+                continue
+            work.add_done_callback(partial(self._on_done, job))
+
+    def _on_done(self, job, work):
+        if work.cancelled():
+            self._finish_job(job, exception=ReportCancelled("The report was cancelled"))
+        elif work.exception() is not None:
+            self._finish_job(job, exception=work.exception())
+        else:
+            self._finish_job(job, result=work.result())
+
+    def _finish_job(self, job, result=None, exception=None):
+        self._running.remove(job)
+        if isinstance(exception, BrokenProcessPool):
+            # A worker died; start a fresh pool for the next job
+            self._executor = None
+        if not job.future.done():
+            if exception is not None:
+                job.future.set_exception(exception)
+            else:
+                job.future.set_result(result)
+        self._dispatch()
+
+    def shutdown(self):
+        """Cancel waiting jobs and stop the worker processes."""
+        for job in self._waiting:
+            job.future.set_exception(ReportCancelled("The report queue was shut down"))
+        self._waiting.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Initialize the report queue
+report_queue = ReportQueue()
@@ -0,0 +1,155 @@
+import numpy as np
+from models.reading_batch import MISSING_HEART_RATE, from_epoch
+from models.database import DAILY_AGGREGATE_FIELDS
+
+SECONDS_PER_DAY = 86400
+
+# AHA categories from least to most severe. Each reading is counted once, in the most
+# severe category it meets, so the counts add up to the number of readings.
+CATEGORIES = ("normal", "elevated", "stage1", "stage2", "crisis")
+
+CATEGORY_LABELS = {
+    "normal": "Normal",
+    "elevated": "Elevated",
+    "stage1": "Stage 1",
+    "stage2": "Stage 2",
+    "crisis": "Crisis",
+}
+
+PERCENTILES = (25, 50, 75)
+
+def _describe(values):
+    """Summary statistics for one column, or None if it is empty."""
+    if not values.size:
+        return None
+    p25, median, p75 = np.percentile(values, PERCENTILES)
+    return {
+        "mean": float(values.mean()),
+        "min": int(values.min()),
+        "max": int(values.max()),
+        "std": float(values.std()),
+        "p25": float(p25),
+        "median": float(median),
+        "p75": float(p75),
+    }
+
+def categorize(systolic, diastolic):
+    """Return the index into CATEGORIES of each reading, vectorized over whole columns."""
+    systolic = np.asarray(systolic, dtype=np.int32)
+    diastolic = np.asarray(diastolic, dtype=np.int32)
+    # np.select picks the first matching condition, so the most severe comes first
+    conditions = [
+        (systolic > 180) | (diastolic > 120),
+        (systolic >= 140) | (diastolic >= 90),
+        ((systolic >= 130) & (systolic <= 139)) | ((diastolic >= 80) & (diastolic <= 89)),
+        (systolic >= 120) & (systolic <= 129) & (diastolic < 80),
+    ]
+    return np.select(conditions, [4, 3, 2, 1], default=0)
+
+def _split_stats(mask, systolic, diastolic):
+    count = int(mask.sum())
+    if not count:
+        return {"count": 0, "systolic_mean": None, "diastolic_mean": None}
+    return {
+        "count": count,
+        "systolic_mean": float(systolic[mask].mean()),
+        "diastolic_mean": float(diastolic[mask].mean()),
+    }
+
+def compute_stats(batch):
+    """Compute summary statistics for a ReadingBatch in vectorized passes over its columns.
+
+    Returns None for an empty batch.
+    """
+    if not len(batch):
+        return None
+
+    columns = batch.columns()
+    systolic = columns["systolic"]
+    diastolic = columns["diastolic"]
+    heart_rate = columns["heart_rate"]
+    timestamps = columns["timestamps"]
+    has_heart_rate = heart_rate != MISSING_HEART_RATE
+
+    days = timestamps // SECONDS_PER_DAY
+    morning = (timestamps % SECONDS_PER_DAY) < 12 * 3600
+    category_counts = np.bincount(categorize(systolic, diastolic), minlength=len(CATEGORIES))
+
+    return {
+        "count": len(batch),
+        "first": from_epoch(int(timestamps.min())),
+        "last": from_epoch(int(timestamps.max())),
+        "systolic": _describe(systolic),
+        "diastolic": _describe(diastolic),
+        "heart_rate": _describe(heart_rate[has_heart_rate]),
+        "morning": _split_stats(morning, systolic, diastolic),
+        "evening": _split_stats(~morning, systolic, diastolic),
+        "days": int(np.unique(days).size),
+        "categories": {name: int(category_counts[i]) for i, name in enumerate(CATEGORIES)},
+    }
+
+def _column_from_aggregates(totals, key):
+    """Mean, min and max of a column from per-day totals, or None if it has no values."""
+    counts = totals["heart_rate_count" if key == "heart_rate" else "count"]
+    has_values = counts > 0
+    if not has_values.any():
+        return None
+    return {
+        "mean": float(totals[f"{key}_sum"].sum() / counts.sum()),
+        "min": int(totals[f"{key}_min"][has_values].min()),
+        "max": int(totals[f"{key}_max"][has_values].max()),
+    }
+
+def aggregate_stats(rows):
+    """Compute statistics from Database.get_daily_aggregates() rows instead of readings.
+
+    Returns the same structure as compute_stats() without the percentiles, standard
+    deviations and morning/evening split, which need the individual readings. Returns
+    None if there are no rows.
+    """
+    if not rows:
+        return None
+    # A day without heart rates has None as its minimum and maximum, which become NaN
+    values = np.array([row[1:] for row in rows], dtype=np.float64)
+    totals = dict(zip(DAILY_AGGREGATE_FIELDS[1:], values.T))
+
+    return {
+        "count": int(totals["count"].sum()),
+        "first": rows[0][0],
+        "last": rows[-1][0],
+        "systolic": _column_from_aggregates(totals, "systolic"),
+        "diastolic": _column_from_aggregates(totals, "diastolic"),
+        "heart_rate": _column_from_aggregates(totals, "heart_rate"),
+        "days": len(rows),
+        "categories": {name: int(totals[name].sum()) for name in CATEGORIES},
+    }
+
+def format_categories(stats):
+    """Render the category counts as one line, e.g. 'Normal: 3, Elevated: 1, ...'."""
+    return ", ".join(f"{CATEGORY_LABELS[name]}: {stats['categories'][name]}"
+                     for name in CATEGORIES)
+
+def format_stats(stats):
+    """Render statistics as plain text lines for the AI prompt."""
+    lines = [
+        f"Number of readings: {stats['count']} "
+        f"({stats['first']:%Y-%m-%d} to {stats['last']:%Y-%m-%d}, {stats['days']} days)",
+    ]
+    for key, label in (("systolic", "Systolic"), ("diastolic", "Diastolic"),
+                       ("heart_rate", "Heart Rate")):
+        column = stats[key]
+        if column is None:
+            lines.append(f"{label}: N/A")
+            continue
+        line = f"{label}: mean {column['mean']:.1f}, min {column['min']}, max {column['max']}"
+        if "std" in column:
+            line += (f", std {column['std']:.1f}, median {column['median']:.1f}, "
+                     f"25th-75th percentile {column['p25']:.1f}-{column['p75']:.1f}")
+        lines.append(line)
+    for key, label in (("morning", "Morning (before 12:00)"), ("evening", "Afternoon/evening")):
+        split = stats.get(key)
+        if split and split["count"]:
+            lines.append(f"{label}: {split['count']} readings, average "
+                         f"{split['systolic_mean']:.1f}/{split['diastolic_mean']:.1f}")
+    lines.append(f"Blood pressure categories: {format_categories(stats)}")
+    return "\n".join(lines)
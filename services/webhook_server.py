@@ -0,0 +1,100 @@
+import asyncio
+import hmac
+import json
+import logging
+import secrets
+import signal
+from aiohttp import web
+from telegram import Update
+from config import WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = "/healthz"
+
+# Header Telegram sends with the secret_token given to setWebhook
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def create_webhook_app(application, path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET):
+    """Build the aiohttp app that receives updates for a python-telegram-bot Application.
+
+    POSTed updates are put on the application's update queue and acknowledged at once,
+    so Telegram never waits for a slow handler; the application processes them with its
+    own concurrency limit. GET /healthz reports whether updates are being processed.
+
+    Only requests carrying `secret_token` are accepted; without one anybody who can
+    reach the port could post updates in any user's name, so it is required.
+    """
+    if not secret_token:
+        raise ValueError("The webhook needs a secret token")
+
+    async def receive_update(request):
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret_token):
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            return web.Response(status=400, text="Body must be JSON")
+        if not isinstance(data, dict):
+            return web.Response(status=400, text="Body must be an update")
+        try:
+            update = Update.de_json(data, application.bot)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            # Valid JSON, but not shaped like an update
+            update = None
+        if update is None:
+            return web.Response(status=400, text="Body must be an update")
+        await application.update_queue.put(update)
+        return web.Response()
+
+    async def health(request):
+        running = application.running
+        return web.json_response(
+            {"status": "ok" if running else "unavailable",
+             "pending_updates": application.update_queue.qsize()},
+            status=200 if running else 503)
+
+    app = web.Application()
+    app.router.add_post(path, receive_update)
+    app.router.add_get(HEALTH_PATH, health)
+    return app
+
+async def serve_webhook(application, host=WEBHOOK_HOST, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                        url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET, stop_event=None):
+    """Run the application behind the webhook server until stop_event is set or SIGINT/SIGTERM.
+
+    The application must be built with updater(None). If `url` is given, Telegram is
+    told to deliver updates to url + path, with a random secret token if none is set.
+    Without `url` the webhook is registered elsewhere, so `secret_token` is required.
+    """
+    if not secret_token:
+        if not url:
+            raise ValueError("Set WEBHOOK_SECRET, or WEBHOOK_URL to register the webhook "
+                             "with a generated secret")
+        secret_token = secrets.token_urlsafe(32)
+
+    if stop_event is None:
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+
+    runner = web.AppRunner(create_webhook_app(application, path, secret_token))
+    await runner.setup()
+    async with application:
+        await application.start()
+        try:
+            if url:
+                await application.bot.set_webhook(url=url.rstrip("/") + path,
+                                                  secret_token=secret_token,
+                                                  allowed_updates=Update.ALL_TYPES)
+            await web.TCPSite(runner, host, port).start()
+            logger.info("Serving webhook on %s:%s%s", host, port, path)
+            await stop_event.wait()
+        finally:
+            await runner.cleanup()
+            await application.stop()
+
+def run_webhook(application):
+    """Blocking entry point, the webhook counterpart of Application.run_polling()."""
+    asyncio.run(serve_webhook(application))
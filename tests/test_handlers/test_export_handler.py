@@ -0,0 +1,95 @@
+import pytest
+import gzip
+from datetime import date, datetime
+from unittest.mock import AsyncMock, patch
+from handlers.export_handler import export
+from models.database import Database
+from models.async_database import AsyncDatabase
+from models.reading_export import iter_columnar
+
+@pytest.fixture
+def database(tmp_path):
+    """A real database with a few readings behind the handler's async_db."""
+    db = Database(str(tmp_path / "export.db"))
+    db.add_readings([
+        (12345, 120, 80, 70, datetime(2023, 1, 1, 8, 0), "Morning"),
+        (12345, 130, 85, None, datetime(2023, 1, 2, 8, 0), "Stressed"),
+        (12345, 125, 82, 72, datetime(2023, 1, 3, 8, 0), None),
+        (67890, 140, 90, 75, datetime(2023, 1, 1, 9, 0), None),
+    ])
+    async_database = AsyncDatabase(db)
+    with patch('handlers.export_handler.async_db', async_database):
+        yield db
+    async_database.close()
+    db.close()
+
+@pytest.fixture
+def sent_document(mock_update):
+    """Capture the bytes of the document the handler sends."""
+    sent = {}
+    
+    async def reply_document(document, filename, caption):
+        sent.update(content=document.read(), filename=filename, caption=caption)
+    
+    mock_update.message.reply_document = AsyncMock(side_effect=reply_document)
+    return sent
+
+@pytest.mark.asyncio
+async def test_export_csv_by_default(database, mock_update, mock_context, sent_document):
+    """Test that /export sends all of the user's readings as gzipped CSV."""
+    # Setup
+    mock_update.message.text = "/export"
+    
+    # Execute
+    await export(mock_update, mock_context)
+    
+    # Check
+    assert sent_document["filename"] == "blood_pressure_readings.csv.gz"
+    assert sent_document["caption"] == "Exported 3 readings."
+    lines = gzip.decompress(sent_document["content"]).decode().splitlines()
+    assert lines[0] == "systolic,diastolic,heart_rate,datetime,description"
+    assert lines[1] == "120,80,70,2023-01-01 08:00:00,Morning"
+    assert len(lines) == 4
+
+@pytest.mark.asyncio
+async def test_export_columnar_with_filters(database, mock_update, mock_context, sent_document, tmp_path):
+    """Test the columnar format with a date range and description pattern."""
+    # Setup
+    mock_update.message.text = '/export columnar 2023-01-01 2023-01-02 pattern:"stress"'
+    
+    # Execute
+    await export(mock_update, mock_context)
+    
+    # Check
+    assert sent_document["filename"] == "blood_pressure_readings.bpr"
+    path = tmp_path / "export.bpr"
+    path.write_bytes(sent_document["content"])
+    with open(path, "rb") as f:
+        assert list(iter_columnar(f)) == [(130, 85, None, datetime(2023, 1, 2, 8, 0), "Stressed")]
+
+@pytest.mark.asyncio
+@patch('handlers.export_handler.async_db', new_callable=AsyncMock)
+async def test_export_single_date_runs_until_today(mock_db, mock_update, mock_context):
+    """Test that one date exports from that date to today."""
+    mock_update.message.text = "/export CSV 2023-01-02"
+    mock_db.export_readings.return_value = 0
+    
+    await export(mock_update, mock_context)
+    
+    args = mock_db.export_readings.call_args[0]
+    assert args[0] == 12345
+    assert args[2:] == ("csv", date(2023, 1, 2), datetime.now().date(), None)
+    assert "No readings found" in mock_update.message.reply_text.call_args[0][0]
+    mock_update.message.reply_document.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_export_invalid_arguments(database, mock_update, mock_context):
+    """Test that bad dates and patterns are reported instead of exporting."""
+    mock_update.message.text = "/export 01-01-2023"
+    await export(mock_update, mock_context)
+    assert "Invalid date format" in mock_update.message.reply_text.call_args[0][0]
+    
+    mock_update.message.text = '/export pattern:"[unclosed"'
+    await export(mock_update, mock_context)
+    assert "Invalid regex pattern" in mock_update.message.reply_text.call_args[0][0]
+    mock_update.message.reply_document.assert_not_called()
@@ -20,4 +20,6 @@ async def test_help_command(mock_update, mock_context):
     assert "/removebydate" in help_message
     assert "/removeall" in help_message
     assert "/summarize" in help_message
+    assert "/import" in help_message
+    assert "/export" in help_message
     assert "/help" in help_message
\ No newline at end of file
@@ -0,0 +1,171 @@
+import pytest
+import sqlite3
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+from handlers.import_handler import import_readings
+from models.database import Database
+from models.async_database import AsyncDatabase
+from services.import_service import MAX_REPORTED_ERRORS
+
+@pytest.fixture
+def database(tmp_path):
+    """A real database behind the handler's async_db."""
+    db = Database(str(tmp_path / "import.db"))
+    async_database = AsyncDatabase(db)
+    with patch('handlers.import_handler.async_db', async_database):
+        yield db
+    async_database.close()
+    db.close()
+
+def upload(mock_update, name, content, mime_type=None, file_size=None):
+    """Attach a document to the message whose download writes `content`."""
+    async def download_to_drive(path):
+        with open(path, "wb") as f:
+            f.write(content.encode() if isinstance(content, str) else content)
+    
+    telegram_file = MagicMock()
+    telegram_file.download_to_drive = AsyncMock(side_effect=download_to_drive)
+    document = MagicMock()
+    document.file_name = name
+    document.mime_type = mime_type
+    document.file_size = file_size if file_size is not None else len(content)
+    document.get_file = AsyncMock(return_value=telegram_file)
+    mock_update.message.document = document
+    status = MagicMock()
+    status.edit_text = AsyncMock()
+    mock_update.message.reply_text = AsyncMock(return_value=status)
+    return status
+
+@pytest.mark.asyncio
+async def test_import_csv(database, mock_update, mock_context):
+    """Test importing a CSV file sent with /import as its caption."""
+    # Setup
+    status = upload(mock_update, "readings.csv",
+                    "systolic,diastolic,pulse,datetime,notes\n"
+                    "120,80,70,2024-01-01 08:00,morning\n"
+                    "130,85,,2024-01-01 20:00,\n"
+                    "abc,85,,2024-01-02 20:00,\n")
+    
+    # Execute
+    await import_readings(mock_update, mock_context)
+    
+    # Check
+    readings = database.get_readings(12345)
+    assert [reading[:3] for reading in readings] == [(120, 80, 70), (130, 85, None)]
+    assert readings[0][4] == "morning"
+    summary = status.edit_text.call_args[0][0]
+    assert "Imported 2 readings" in summary
+    assert "Skipped 1 invalid rows" in summary
+    assert "Row 4: systolic is not a number" in summary
+
+@pytest.mark.asyncio
+async def test_import_json_from_replied_document(database, mock_update, mock_context):
+    """Test that /import sent as a reply imports the replied-to file."""
+    # Setup
+    status = upload(mock_update, "export.json",
+                    '[{"systolic": 118, "diastolic": 76, "datetime": "2024-02-01T07:00:00"}]')
+    mock_update.message.reply_to_message.document = mock_update.message.document
+    mock_update.message.document = None
+    
+    # Execute
+    await import_readings(mock_update, mock_context)
+    
+    # Check
+    assert [reading[:2] for reading in database.get_readings(12345)] == [(118, 76)]
+    assert "Imported 1 readings" in status.edit_text.call_args[0][0]
+
+@pytest.mark.asyncio
+async def test_import_is_all_or_nothing_on_format_errors(database, mock_update, mock_context):
+    """Test that a file broken part way through imports nothing."""
+    # Setup; the first records are valid but the JSON is cut off later
+    rows = ",".join('{"systolic": 120, "diastolic": 80, "datetime": "2024-01-01 08:00"}'
+                    for _ in range(5))
+    status = upload(mock_update, "readings.json", f"[{rows}, {{\"systolic\": ")
+    
+    # Execute
+    await import_readings(mock_update, mock_context)
+    
+    # Check
+    assert database.get_readings(12345) == []
+    assert "Nothing was imported" in status.edit_text.call_args[0][0]
+
+@pytest.mark.asyncio
+async def test_import_lists_only_the_first_invalid_rows(database, mock_update, mock_context):
+    """Test that the summary lists MAX_REPORTED_ERRORS invalid rows and elides the rest."""
+    status = upload(mock_update, "readings.csv", "systolic,diastolic,datetime\n" +
+                    "abc,80,2024-01-01 08:00\n" * (MAX_REPORTED_ERRORS + 2))
+    
+    await import_readings(mock_update, mock_context)
+    
+    summary = status.edit_text.call_args[0][0]
+    assert f"Skipped {MAX_REPORTED_ERRORS + 2} invalid rows" in summary
+    assert summary.count("\nRow ") == MAX_REPORTED_ERRORS
+    assert summary.endswith("\n...")
+
+@pytest.mark.asyncio
+async def test_import_reports_database_and_download_failures(database, mock_update,
+                                                             mock_context):
+    """Test that unexpected failures replace the progress message instead of escaping."""
+    # Setup; the database is locked by another writer
+    status = upload(mock_update, "readings.csv", "systolic,diastolic,datetime\n"
+                    "120,80,2024-01-01 08:00\n")
+    
+    # Execute
+    with patch.object(database, "import_readings",
+                      side_effect=sqlite3.OperationalError("database is locked")):
+        await import_readings(mock_update, mock_context)
+    
+    # Check
+    status.edit_text.assert_called_with("Nothing was imported: database is locked")
+    
+    # The file can't be downloaded
+    status = upload(mock_update, "readings.csv", "")
+    mock_update.message.document.get_file.side_effect = TimeoutError("download timed out")
+    await import_readings(mock_update, mock_context)
+    status.edit_text.assert_called_with("Nothing was imported: download timed out")
+    assert database.get_readings(12345) == []
+
+@pytest.mark.asyncio
+async def test_import_reports_progress(database, mock_update, mock_context):
+    """Test that the status message is updated while a long import runs."""
+    # Setup
+    status = upload(mock_update, "readings.json",
+                    '[{"systolic": 120, "diastolic": 80, "datetime": "2024-01-01 08:00"}]')
+    original = database.import_readings
+    
+    def slow_import(batches):
+        time.sleep(0.1)
+        return original(batches)
+    
+    # Execute
+    with patch.object(database, 'import_readings', side_effect=slow_import), \
+         patch('handlers.import_handler.IMPORT_PROGRESS_INTERVAL', 0.02):
+        await import_readings(mock_update, mock_context)
+    
+    # Check
+    texts = [call[0][0] for call in status.edit_text.call_args_list]
+    assert texts[0].startswith("Importing readings...")
+    assert texts[-1] == "Imported 1 readings."
+
+@pytest.mark.asyncio
+async def test_import_without_file_shows_usage(mock_update, mock_context):
+    """Test that /import with no document explains how to use it."""
+    mock_update.message.document = None
+    mock_update.message.reply_to_message = None
+    
+    await import_readings(mock_update, mock_context)
+    
+    assert "caption /import" in mock_update.message.reply_text.call_args[0][0]
+
+@pytest.mark.asyncio
+async def test_import_rejects_unsupported_and_large_files(mock_update, mock_context):
+    """Test that unknown formats and oversized files are refused before downloading."""
+    upload(mock_update, "readings.xlsx", "data")
+    await import_readings(mock_update, mock_context)
+    assert "Only .csv and .json" in mock_update.message.reply_text.call_args[0][0]
+    mock_update.message.document.get_file.assert_not_called()
+    
+    upload(mock_update, "readings.csv", "data", file_size=100 * 1024 * 1024)
+    await import_readings(mock_update, mock_context)
+    assert "too large" in mock_update.message.reply_text.call_args[0][0]
+    mock_update.message.document.get_file.assert_not_called()
@@ -4,7 +4,7 @@ from handlers.log_handler import log
 from datetime import datetime
 
 @pytest.mark.asyncio
-@patch('handlers.log_handler.db')
+@patch('handlers.log_handler.async_db', new_callable=AsyncMock)
 async def test_log_handler_basic(mock_db, mock_update, mock_context):
     """Test basic blood pressure logging without optional parameters."""
     # Setup
@@ -30,7 +30,7 @@ async def test_log_handler_basic(mock_db, mock_update, mock_context):
     assert "logged successfully" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.log_handler.db')
+@patch('handlers.log_handler.async_db', new_callable=AsyncMock)
 async def test_log_handler_with_heart_rate(mock_db, mock_update, mock_context):
     """Test logging with heart rate."""
     # Setup
@@ -50,7 +50,7 @@ async def test_log_handler_with_heart_rate(mock_db, mock_update, mock_context):
     assert "logged successfully" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.log_handler.db')
+@patch('handlers.log_handler.async_db', new_callable=AsyncMock)
 async def test_log_handler_with_description(mock_db, mock_update, mock_context):
     """Test logging with description."""
     # Setup
@@ -70,7 +70,7 @@ async def test_log_handler_with_description(mock_db, mock_update, mock_context):
     assert "logged successfully" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.log_handler.db')
+@patch('handlers.log_handler.async_db', new_callable=AsyncMock)
 async def test_log_handler_with_datetime(mock_db, mock_update, mock_context):
     """Test logging with custom datetime."""
     # Setup
@@ -94,7 +94,7 @@ async def test_log_handler_with_datetime(mock_db, mock_update, mock_context):
     assert "logged successfully" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.log_handler.db')
+@patch('handlers.log_handler.async_db', new_callable=AsyncMock)
 async def test_log_handler_invalid_format(mock_db, mock_update, mock_context):
     """Test response when command format is invalid."""
     # Setup
@@ -111,7 +111,7 @@ async def test_log_handler_invalid_format(mock_db, mock_update, mock_context):
     assert "Usage:" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.log_handler.db')
+@patch('handlers.log_handler.async_db', new_callable=AsyncMock)
 async def test_log_handler_invalid_datetime(mock_db, mock_update, mock_context):
     """Test handling of invalid datetime format."""
     # Setup 
@@ -128,4 +128,21 @@ async def test_log_handler_invalid_datetime(mock_db, mock_update, mock_context):
     mock_update.message.reply_text.assert_called_once()
     # The handler should report a datetime format error, not the usage message
     assert "Invalid date" in mock_update.message.reply_text.call_args[0][0] or \
-           "Invalid datetime" in mock_update.message.reply_text.call_args[0][0]
\ No newline at end of file
+           "Invalid datetime" in mock_update.message.reply_text.call_args[0][0]
+
+@pytest.mark.asyncio
+@patch('handlers.log_handler.async_db', new_callable=AsyncMock)
+async def test_log_handler_rejects_implausible_values(mock_db, mock_update, mock_context):
+    """Test that values outside the plausible ranges are not stored."""
+    for text, message in (("/log 1200 80", "Systolic must be from 50 to 300."),
+                          ("/log 120 80 70000", "Heart rate must be from 20 to 250.")):
+        # Setup
+        mock_update.message.reply_text.reset_mock()
+        mock_update.message.text = text
+        
+        # Execute the handler
+        await log(mock_update, mock_context)
+        
+        # Check nothing was stored and the user was told why
+        mock_db.add_reading.assert_not_called()
+        mock_update.message.reply_text.assert_called_once_with(message)
@@ -4,7 +4,7 @@ from handlers.remove_handler import remove_last, remove_by_date, remove_all
 from datetime import date
 
 @pytest.mark.asyncio
-@patch('handlers.remove_handler.db')
+@patch('handlers.remove_handler.async_db', new_callable=AsyncMock)
 async def test_remove_last_success(mock_db, mock_update, mock_context):
     """Test successful removal of last reading."""
     # Setup
@@ -21,7 +21,7 @@ async def test_remove_last_success(mock_db, mock_update, mock_context):
     assert "has been removed" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.remove_handler.db')
+@patch('handlers.remove_handler.async_db', new_callable=AsyncMock)
 async def test_remove_last_no_readings(mock_db, mock_update, mock_context):
     """Test response when there are no readings to remove."""
     # Setup
@@ -35,7 +35,7 @@ async def test_remove_last_no_readings(mock_db, mock_update, mock_context):
     assert "don't have any" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.remove_handler.db')
+@patch('handlers.remove_handler.async_db', new_callable=AsyncMock)
 async def test_remove_by_date_success(mock_db, mock_update, mock_context):
     """Test successful removal of readings by date."""
     # Setup
@@ -56,7 +56,7 @@ async def test_remove_by_date_success(mock_db, mock_update, mock_context):
     assert "have been removed" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.remove_handler.db')
+@patch('handlers.remove_handler.async_db', new_callable=AsyncMock)
 async def test_remove_by_date_no_readings(mock_db, mock_update, mock_context):
     """Test response when no readings exist for the specified date."""
     # Setup
@@ -71,7 +71,7 @@ async def test_remove_by_date_no_readings(mock_db, mock_update, mock_context):
     assert "No readings found" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.remove_handler.db')
+@patch('handlers.remove_handler.async_db', new_callable=AsyncMock)
 async def test_remove_by_date_missing_date(mock_db, mock_update, mock_context):
     """Test response when date is not provided."""
     # Setup
@@ -85,7 +85,7 @@ async def test_remove_by_date_missing_date(mock_db, mock_update, mock_context):
     assert "Please specify the date" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.remove_handler.db')
+@patch('handlers.remove_handler.async_db', new_callable=AsyncMock)
 async def test_remove_by_date_invalid_date(mock_db, mock_update, mock_context):
     """Test response when invalid date format is provided."""
     # Setup
@@ -99,7 +99,7 @@ async def test_remove_by_date_invalid_date(mock_db, mock_update, mock_context):
     assert "Invalid date format" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.remove_handler.db')
+@patch('handlers.remove_handler.async_db', new_callable=AsyncMock)
 async def test_remove_all_success(mock_db, mock_update, mock_context):
     """Test successful removal of all readings."""
     # Setup
@@ -116,7 +116,7 @@ async def test_remove_all_success(mock_db, mock_update, mock_context):
     assert "have been removed" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.remove_handler.db')
+@patch('handlers.remove_handler.async_db', new_callable=AsyncMock)
 async def test_remove_all_no_readings(mock_db, mock_update, mock_context):
     """Test response when there are no readings to remove."""
     # Setup
@@ -1,20 +1,45 @@
 import pytest
-import os
-from unittest.mock import AsyncMock, patch, MagicMock, mock_open
-from handlers.report_handler import report
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, patch, MagicMock
+from handlers.report_handler import report, cancel_report
+from services.report_queue import ReportQueue
 from datetime import date
 
+READINGS = [(120, 80, 70, "2023-01-01 12:00:00", "Normal reading")]
+
+@pytest.fixture
+def report_queue():
+    """A report queue backed by threads so patched render functions can run in it."""
+    queue = ReportQueue(workers=1, max_pending=1, executor_factory=ThreadPoolExecutor)
+    with patch('handlers.report_handler.report_queue', queue):
+        yield queue
+    queue.shutdown()
+
+@pytest.fixture
+def mock_db():
+    """Patch the async database used by the report handler."""
+    with patch('handlers.report_handler.async_db', new_callable=AsyncMock) as mock_db:
+        mock_db.database = MagicMock(db_path="test.db")
+        mock_db.database.iter_readings.return_value = READINGS
+        mock_db.get_data_version.return_value = 7
+        yield mock_db
+
+@pytest.fixture
+def mock_analyze():
+    """Patch the analysis used by the report handler."""
+    with patch('services.analysis_service.analyze_readings_async', new_callable=AsyncMock,
+               return_value="Test advice") as mock_analyze:
+        yield mock_analyze
+
 @pytest.mark.asyncio
-@patch('handlers.report_handler.generate_pdf')
-@patch('builtins.open', new_callable=mock_open, read_data=b'test pdf content')
-@patch('os.path.exists', return_value=True)
-@patch('os.remove')
-async def test_report_handler_basic(mock_remove, mock_exists, mock_file, mock_generate_pdf, 
-                                  mock_update, mock_context):
+@patch('services.report_generator.render_report_from_db', return_value=b'%PDF test content')
+async def test_report_handler_basic(mock_render,
+                                  mock_update, mock_context, report_queue, mock_db, mock_analyze):
     """Test basic report generation without filters."""
     # Setup
     mock_update.message.text = "/report"
-    mock_generate_pdf.return_value = "test_report.pdf"
     
     # Execute the handler
     await report(mock_update, mock_context)
@@ -24,29 +49,40 @@ async def test_report_handler_basic(mock_remove, mock_exists, mock_file, mock_ge
     first_call = mock_update.message.reply_text.call_args_list[0]
     assert "Generating your blood pressure report" in first_call[0][0]
     
-    # Check that generate_pdf was called with correct parameters
-    mock_generate_pdf.assert_called_once_with(
-        12345, start_date=None, end_date=None, regex_pattern=None
-    )
+    # Check that readings were streamed into the analysis and the worker reads its own
+    mock_db.database.iter_readings.assert_called_once_with(12345, None, None, None)
+    mock_db.get_data_version.assert_awaited_once_with(12345)
+    mock_analyze.assert_called_once_with(READINGS, 12345, None, None, None, 7)
+    mock_render.assert_called_once_with(12345, "Test advice", "test.db", None, None, None,
+                                        in_memory=True)
     
-    # Check that the file was opened and sent
-    mock_file.assert_called_once_with("test_report.pdf", 'rb')
+    # Check that the PDF bytes were sent directly
     mock_update.message.reply_document.assert_called_once()
+    document_kwargs = mock_update.message.reply_document.call_args[1]
+    assert document_kwargs['document'] == b'%PDF test content'
+    assert document_kwargs['filename'] == 'blood_pressure_report.pdf'
+
+@pytest.mark.asyncio
+@patch('services.report_generator.render_report_from_db', return_value=b'%PDF test content')
+async def test_report_handler_does_not_touch_filesystem(mock_render, mock_update, mock_context,
+                                                        report_queue, mock_db, mock_analyze):
+    """Test that no file is opened or removed when sending a report."""
+    mock_update.message.text = "/report"
+    
+    with patch('builtins.open') as mock_file, patch('os.remove') as mock_remove:
+        await report(mock_update, mock_context)
     
-    # Check that the file was removed after sending
-    mock_remove.assert_called_once_with("test_report.pdf")
+    mock_file.assert_not_called()
+    mock_remove.assert_not_called()
+    mock_update.message.reply_document.assert_called_once()
 
 @pytest.mark.asyncio
-@patch('handlers.report_handler.generate_pdf')
-@patch('builtins.open', new_callable=mock_open, read_data=b'test pdf content')
-@patch('os.path.exists', return_value=True)
-@patch('os.remove')
-async def test_report_handler_with_date(mock_remove, mock_exists, mock_file, mock_generate_pdf, 
-                                     mock_update, mock_context):
+@patch('services.report_generator.render_report_from_db', return_value=b'%PDF test content')
+async def test_report_handler_with_date(mock_render,
+                                     mock_update, mock_context, report_queue, mock_db, mock_analyze):
     """Test report generation with specific date."""
     # Setup
     mock_update.message.text = "/report 2023-01-01"
-    mock_generate_pdf.return_value = "test_report.pdf"
     
     # Execute the handler
     await report(mock_update, mock_context)
@@ -54,66 +90,47 @@ async def test_report_handler_with_date(mock_remove, mock_exists, mock_file, moc
     # Check for initial notification
     assert "Generating your blood pressure report" in mock_update.message.reply_text.call_args_list[0][0][0]
     
-    # Check that generate_pdf was called with correct date parameters
-    mock_generate_pdf.assert_called_once()
-    call_args = mock_generate_pdf.call_args[1]
-    assert call_args['start_date'] == date(2023, 1, 1)
-    assert call_args['end_date'] == date(2023, 1, 1)
+    # Check that the readings were fetched with correct date parameters
+    mock_db.database.iter_readings.assert_called_once_with(12345, date(2023, 1, 1), date(2023, 1, 1), None)
     
-    # Check that the file was sent and removed
+    # Check that the report was sent
     mock_update.message.reply_document.assert_called_once()
-    mock_remove.assert_called_once()
 
 @pytest.mark.asyncio
-@patch('handlers.report_handler.generate_pdf')
-@patch('builtins.open', new_callable=mock_open, read_data=b'test pdf content')
-@patch('os.path.exists', return_value=True)
-@patch('os.remove')
-async def test_report_handler_with_date_range(mock_remove, mock_exists, mock_file, mock_generate_pdf, 
-                                           mock_update, mock_context):
+@patch('services.report_generator.render_report_from_db', return_value=b'%PDF test content')
+async def test_report_handler_with_date_range(mock_render,
+                                           mock_update, mock_context, report_queue, mock_db, mock_analyze):
     """Test report generation with date range."""
     # Setup
     mock_update.message.text = "/report 2023-01-01 2023-01-31"
-    mock_generate_pdf.return_value = "test_report.pdf"
     
     # Execute the handler
     await report(mock_update, mock_context)
     
-    # Check for initial notification
-    assert "Generating your blood pressure report" in mock_update.message.reply_text.call_args_list[0][0][0]
-    
-    # Check that generate_pdf was called with correct date parameters
-    mock_generate_pdf.assert_called_once()
-    call_args = mock_generate_pdf.call_args[1]
-    assert call_args['start_date'] == date(2023, 1, 1)
-    assert call_args['end_date'] == date(2023, 1, 31)
+    # Check that the date range reaches the query and the renderer
+    mock_db.database.iter_readings.assert_called_once_with(12345, date(2023, 1, 1), date(2023, 1, 31), None)
+    render_args = mock_render.call_args[0]
+    assert render_args[3] == date(2023, 1, 1)
+    assert render_args[4] == date(2023, 1, 31)
 
 @pytest.mark.asyncio
-@patch('handlers.report_handler.generate_pdf')
-@patch('builtins.open', new_callable=mock_open, read_data=b'test pdf content')
-@patch('os.path.exists', return_value=True)
-@patch('os.remove')
-async def test_report_handler_with_regex(mock_remove, mock_exists, mock_file, mock_generate_pdf, 
-                                      mock_update, mock_context):
+@patch('services.report_generator.render_report_from_db', return_value=b'%PDF test content')
+async def test_report_handler_with_regex(mock_render,
+                                      mock_update, mock_context, report_queue, mock_db, mock_analyze):
     """Test report generation with regex pattern."""
     # Setup
     mock_update.message.text = '/report pattern:"exercise"'
-    mock_generate_pdf.return_value = "test_report.pdf"
     
     # Execute the handler
     await report(mock_update, mock_context)
     
-    # Check for initial notification
-    assert "Generating your blood pressure report" in mock_update.message.reply_text.call_args_list[0][0][0]
-    
-    # Check that generate_pdf was called with correct regex parameter
-    mock_generate_pdf.assert_called_once()
-    call_args = mock_generate_pdf.call_args[1]
-    assert call_args['regex_pattern'] == "exercise"
+    # Check that the regex pattern reaches the query and the renderer
+    mock_db.database.iter_readings.assert_called_once_with(12345, None, None, "exercise")
+    assert mock_render.call_args[0][5] == "exercise"
 
 @pytest.mark.asyncio
-@patch('handlers.report_handler.generate_pdf')
-async def test_report_handler_invalid_date(mock_generate_pdf, mock_update, mock_context):
+@patch('services.report_generator.render_report_from_db')
+async def test_report_handler_invalid_date(mock_render, mock_update, mock_context, mock_db):
     """Test report generation with invalid date format."""
     # Setup
     mock_update.message.text = "/report invalid-date"
@@ -121,8 +138,9 @@ async def test_report_handler_invalid_date(mock_generate_pdf, mock_update, mock_
     # Execute the handler
     await report(mock_update, mock_context)
     
-    # Check that generate_pdf was not called
-    mock_generate_pdf.assert_not_called()
+    # Check that nothing was fetched or rendered
+    mock_db.database.iter_readings.assert_not_called()
+    mock_render.assert_not_called()
     
     # Check that initial notification was sent, followed by error message
     assert mock_update.message.reply_text.call_count >= 2
@@ -130,8 +148,8 @@ async def test_report_handler_invalid_date(mock_generate_pdf, mock_update, mock_
     assert "Invalid date format" in mock_update.message.reply_text.call_args_list[1][0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.report_handler.generate_pdf')
-async def test_report_handler_invalid_regex(mock_generate_pdf, mock_update, mock_context):
+@patch('services.report_generator.render_report_from_db')
+async def test_report_handler_invalid_regex(mock_render, mock_update, mock_context, mock_db):
     """Test report generation with invalid regex pattern."""
     # Setup
     mock_update.message.text = '/report pattern:"[invalid"'
@@ -139,8 +157,9 @@ async def test_report_handler_invalid_regex(mock_generate_pdf, mock_update, mock
     # Execute the handler
     await report(mock_update, mock_context)
     
-    # Check that generate_pdf was not called
-    mock_generate_pdf.assert_not_called()
+    # Check that nothing was fetched or rendered
+    mock_db.database.iter_readings.assert_not_called()
+    mock_render.assert_not_called()
     
     # Check for initial notification followed by error message
     assert mock_update.message.reply_text.call_count >= 2
@@ -148,12 +167,12 @@ async def test_report_handler_invalid_regex(mock_generate_pdf, mock_update, mock
     assert "Invalid regex pattern" in mock_update.message.reply_text.call_args_list[1][0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.report_handler.generate_pdf')
-async def test_report_handler_pdf_error(mock_generate_pdf, mock_update, mock_context):
+@patch('services.report_generator.render_report_from_db', side_effect=Exception("Test error"))
+async def test_report_handler_pdf_error(mock_render, mock_update, mock_context,
+                                        report_queue, mock_db, mock_analyze):
     """Test handling of errors during PDF generation."""
     # Setup
     mock_update.message.text = "/report"
-    mock_generate_pdf.side_effect = Exception("Test error")
     
     # Execute the handler
     await report(mock_update, mock_context)
@@ -161,4 +180,57 @@ async def test_report_handler_pdf_error(mock_generate_pdf, mock_update, mock_con
     # Check for initial notification followed by error message
     assert mock_update.message.reply_text.call_count >= 2
     assert "Generating your blood pressure report" in mock_update.message.reply_text.call_args_list[0][0][0]
-    assert "An error occurred" in mock_update.message.reply_text.call_args_list[1][0][0]
\ No newline at end of file
+    assert "An error occurred" in mock_update.message.reply_text.call_args_list[1][0][0]
+
+@pytest.mark.asyncio
+async def test_report_handler_queue_full(mock_update, mock_context, report_queue, mock_db, mock_analyze):
+    """Test backpressure when the queue is full."""
+    # Setup: one report rendering and one waiting fill the queue
+    release = threading.Event()
+    report_queue.submit(1, release.wait, 5)
+    report_queue.submit(2, release.wait, 5)
+    mock_update.message.text = "/report"
+    
+    # Execute the handler
+    await report(mock_update, mock_context)
+    release.set()
+    
+    # The user is told to retry later before any readings are read or analyzed
+    assert "Too many reports" in mock_update.message.reply_text.call_args_list[-1][0][0]
+    mock_db.database.iter_readings.assert_not_called()
+    mock_analyze.assert_not_called()
+    mock_update.message.reply_document.assert_not_called()
+
+@pytest.mark.asyncio
+@patch('services.report_generator.render_report_from_db', return_value=b'%PDF test content')
+async def test_report_handler_queued_then_cancelled(mock_render, mock_update, mock_context,
+                                                    report_queue, mock_db, mock_analyze):
+    """Test the queue position message and cancelling a waiting report."""
+    # Setup: another user's report occupies the only worker
+    release = threading.Event()
+    report_queue.submit(1, release.wait, 5)
+    mock_update.message.text = "/report"
+    
+    task = asyncio.create_task(report(mock_update, mock_context))
+    while not any("queued" in call[0][0] for call in mock_update.message.reply_text.call_args_list):
+        await asyncio.sleep(0.01)
+    
+    # Cancel through the command handler
+    await cancel_report(mock_update, mock_context)
+    await task
+    release.set()
+    
+    messages = [call[0][0] for call in mock_update.message.reply_text.call_args_list]
+    assert "Your report is queued, position 1. Send /cancelreport to cancel it." in messages
+    # Only /cancelreport confirms the cancellation
+    assert messages.count("Your pending report has been cancelled.") == 1
+    assert "Your report has been cancelled." not in messages
+    mock_render.assert_not_called()
+    mock_update.message.reply_document.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_cancel_report_without_reports(mock_update, mock_context, report_queue):
+    """Test cancelling when there is nothing to cancel."""
+    await cancel_report(mock_update, mock_context)
+    
+    mock_update.message.reply_text.assert_called_once_with("You don't have a report in progress.")
@@ -1,16 +1,26 @@
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
+from telegram.error import BadRequest, RetryAfter
 from handlers.summarize_handler import summarize
+from services.analysis_service import ANALYSIS_ERROR_PREFIX, NO_READINGS_MESSAGE
 from datetime import date
 
+@pytest.fixture(autouse=True)
+def non_streaming():
+    """Most tests cover the single-reply path; streaming tests patch it back on."""
+    with patch('handlers.summarize_handler.STREAM_SUMMARIES', False):
+        yield
+
 @pytest.mark.asyncio
-@patch('handlers.summarize_handler.analyze_readings')
-@patch('handlers.summarize_handler.db')
+@patch('services.analysis_service.analyze_readings_async', new_callable=AsyncMock)
+@patch('handlers.summarize_handler.async_db')
 async def test_summarize_basic(mock_db, mock_analyze, mock_update, mock_context):
     """Test basic summarization without filters."""
     # Setup
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
     mock_update.message.text = "/summarize"
-    mock_db.get_readings.return_value = [
+    mock_db.database.iter_readings.return_value = [
         (120, 80, 70, "2023-01-01 12:00:00", "Normal reading")
     ]
     mock_analyze.return_value = "Test medical advice"
@@ -19,12 +29,14 @@ async def test_summarize_basic(mock_db, mock_analyze, mock_update, mock_context)
     await summarize(mock_update, mock_context)
     
     # Check that get_readings was called with correct parameters
-    mock_db.get_readings.assert_called_once_with(
+    mock_db.database.iter_readings.assert_called_once_with(
         12345, None, None, None
     )
     
-    # Check that analyze_readings was called
+    # Check that analyze_readings was keyed on the data version
     mock_analyze.assert_called_once()
+    mock_db.get_data_version.assert_awaited_once_with(12345)
+    assert mock_analyze.call_args[0][5] == 7
     
     # Check that response messages were sent
     assert mock_update.message.reply_text.call_count == 2
@@ -34,13 +46,15 @@ async def test_summarize_basic(mock_db, mock_analyze, mock_update, mock_context)
     assert "Medical Advice" in second_call[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.summarize_handler.analyze_readings')
-@patch('handlers.summarize_handler.db')
+@patch('services.analysis_service.analyze_readings_async', new_callable=AsyncMock)
+@patch('handlers.summarize_handler.async_db')
 async def test_summarize_with_date(mock_db, mock_analyze, mock_update, mock_context):
     """Test summarization with specific date."""
     # Setup
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
     mock_update.message.text = "/summarize 2023-01-01"
-    mock_db.get_readings.return_value = [
+    mock_db.database.iter_readings.return_value = [
         (120, 80, 70, "2023-01-01 12:00:00", "Normal reading")
     ]
     mock_analyze.return_value = "Test medical advice"
@@ -49,8 +63,8 @@ async def test_summarize_with_date(mock_db, mock_analyze, mock_update, mock_cont
     await summarize(mock_update, mock_context)
     
     # Check that get_readings was called with correct date parameters
-    mock_db.get_readings.assert_called_once()
-    call_args = mock_db.get_readings.call_args[0]
+    mock_db.database.iter_readings.assert_called_once()
+    call_args = mock_db.database.iter_readings.call_args[0]
     assert call_args[0] == 12345  # user_id
     assert call_args[1] == date(2023, 1, 1)  # start_date
     
@@ -58,13 +72,15 @@ async def test_summarize_with_date(mock_db, mock_analyze, mock_update, mock_cont
     assert "Medical Advice" in mock_update.message.reply_text.call_args_list[1][0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.summarize_handler.analyze_readings')
-@patch('handlers.summarize_handler.db')
+@patch('services.analysis_service.analyze_readings_async', new_callable=AsyncMock)
+@patch('handlers.summarize_handler.async_db')
 async def test_summarize_with_date_range(mock_db, mock_analyze, mock_update, mock_context):
     """Test summarization with date range."""
     # Setup
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
     mock_update.message.text = "/summarize 2023-01-01 2023-01-31"
-    mock_db.get_readings.return_value = [
+    mock_db.database.iter_readings.return_value = [
         (120, 80, 70, "2023-01-01 12:00:00", "Normal reading"),
         (130, 85, 75, "2023-01-15 12:00:00", "Slightly elevated")
     ]
@@ -74,20 +90,22 @@ async def test_summarize_with_date_range(mock_db, mock_analyze, mock_update, moc
     await summarize(mock_update, mock_context)
     
     # Check that get_readings was called with correct date parameters
-    mock_db.get_readings.assert_called_once()
-    call_args = mock_db.get_readings.call_args[0]
+    mock_db.database.iter_readings.assert_called_once()
+    call_args = mock_db.database.iter_readings.call_args[0]
     assert call_args[0] == 12345  # user_id
     assert call_args[1] == date(2023, 1, 1)  # start_date
     assert call_args[2] == date(2023, 1, 31)  # end_date
 
 @pytest.mark.asyncio
-@patch('handlers.summarize_handler.analyze_readings')
-@patch('handlers.summarize_handler.db')
+@patch('services.analysis_service.analyze_readings_async', new_callable=AsyncMock)
+@patch('handlers.summarize_handler.async_db')
 async def test_summarize_with_regex(mock_db, mock_analyze, mock_update, mock_context):
     """Test summarization with regex pattern."""
     # Setup
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
     mock_update.message.text = '/summarize pattern:"elevated"'
-    mock_db.get_readings.return_value = [
+    mock_db.database.iter_readings.return_value = [
         (130, 85, 75, "2023-01-15 12:00:00", "Slightly elevated")
     ]
     mock_analyze.return_value = "Test medical advice for elevated readings"
@@ -96,44 +114,66 @@ async def test_summarize_with_regex(mock_db, mock_analyze, mock_update, mock_con
     await summarize(mock_update, mock_context)
     
     # Check that get_readings was called with correct regex parameter
-    mock_db.get_readings.assert_called_once()
-    call_args = mock_db.get_readings.call_args[0]
+    mock_db.database.iter_readings.assert_called_once()
+    call_args = mock_db.database.iter_readings.call_args[0]
     assert call_args[3] == "elevated"  # regex_pattern
 
 @pytest.mark.asyncio
-@patch('handlers.summarize_handler.analyze_readings')
-@patch('handlers.summarize_handler.db')
+@patch('services.analysis_service.analyze_readings_async', new_callable=AsyncMock)
+@patch('handlers.summarize_handler.async_db')
 async def test_summarize_no_readings(mock_db, mock_analyze, mock_update, mock_context):
     """Test response when no readings are found."""
     # Setup
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
     mock_update.message.text = "/summarize"
-    mock_db.get_readings.return_value = []
+    mock_db.database.iter_readings.return_value = iter([])
+    mock_analyze.return_value = NO_READINGS_MESSAGE
     
     # Execute the handler
     await summarize(mock_update, mock_context)
     
-    # Check that analyze_readings was not called
-    mock_analyze.assert_not_called()
-    
-    # Check appropriate message was sent
+    # Check appropriate message was sent without a "Medical Advice" prefix
     # First message is "Please wait"
     assert mock_update.message.reply_text.call_count == 2
     second_call = mock_update.message.reply_text.call_args_list[1][0][0]
     assert "No blood pressure readings found" in second_call
+    assert "Medical Advice" not in second_call
+
+@pytest.mark.asyncio
+@patch('services.analysis_service.analyze_readings_async', new_callable=AsyncMock)
+@patch('handlers.summarize_handler.async_db')
+async def test_summarize_streams_readings(mock_db, mock_analyze, mock_update, mock_context):
+    """Test that the readings stream is handed to the analysis unconsumed."""
+    # Setup
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
+    mock_update.message.text = "/summarize"
+    stream = iter([(120, 80, 70, "2023-01-01 12:00:00", "Normal reading")])
+    mock_db.database.iter_readings.return_value = stream
+    mock_analyze.return_value = "Test medical advice"
+    
+    # Execute the handler
+    await summarize(mock_update, mock_context)
+    
+    # The handler passes the iterator through rather than building a list
+    assert mock_analyze.call_args[0][0] is stream
 
 @pytest.mark.asyncio
-@patch('handlers.summarize_handler.analyze_readings')
-@patch('handlers.summarize_handler.db')
+@patch('services.analysis_service.analyze_readings_async', new_callable=AsyncMock)
+@patch('handlers.summarize_handler.async_db')
 async def test_summarize_invalid_date(mock_db, mock_analyze, mock_update, mock_context):
     """Test response with invalid date format."""
     # Setup
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
     mock_update.message.text = "/summarize invalid-date"
     
     # Execute the handler
     await summarize(mock_update, mock_context)
     
     # Check that get_readings was not called
-    mock_db.get_readings.assert_not_called()
+    mock_db.database.iter_readings.assert_not_called()
     
     # Check that analyze_readings was not called
     mock_analyze.assert_not_called()
@@ -143,15 +183,17 @@ async def test_summarize_invalid_date(mock_db, mock_analyze, mock_update, mock_c
     assert "Invalid date format" in mock_update.message.reply_text.call_args[0][0]
 
 @pytest.mark.asyncio
-@patch('handlers.summarize_handler.analyze_readings')
-@patch('handlers.summarize_handler.db')
+@patch('services.analysis_service.analyze_readings_async', new_callable=AsyncMock)
+@patch('handlers.summarize_handler.async_db')
 async def test_summarize_invalid_regex(mock_db, mock_analyze, mock_update, mock_context):
     """Test response with invalid regex pattern."""
     # Setup
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
     mock_update.message.text = '/summarize pattern:"[invalid"'
     
     # Mock the get_readings to raise an exception with invalid regex
-    mock_db.get_readings.side_effect = ValueError("Invalid regex pattern: [invalid")
+    mock_db.database.iter_readings.side_effect = ValueError("Invalid regex pattern: [invalid")
     
     # Execute the handler
     await summarize(mock_update, mock_context)
@@ -169,4 +211,196 @@ async def test_summarize_invalid_regex(mock_db, mock_analyze, mock_update, mock_
     
     # Second message should indicate an error
     second_call = mock_update.message.reply_text.call_args_list[1][0][0]
-    assert "error" in second_call.lower() or "invalid" in second_call.lower()
\ No newline at end of file
+    assert "error" in second_call.lower() or "invalid" in second_call.lower()
+
+def fake_stream(*updates):
+    """Stand-in for analyze_readings_stream yielding the given advice snapshots."""
+    def stream(*args, **kwargs):
+        async def generate():
+            for update in updates:
+                yield update
+        stream.args = args
+        return generate()
+    return stream
+
+@pytest.fixture
+def streaming(mock_update):
+    """Enable streaming and return the 'Please wait' message that gets edited."""
+    status = MagicMock()
+    status.edit_text = AsyncMock()
+    status.reply_text = AsyncMock()
+    mock_update.message.reply_text.return_value = status
+    with patch('handlers.summarize_handler.STREAM_SUMMARIES', True), \
+         patch('handlers.summarize_handler.STREAM_EDIT_INTERVAL', 0):
+        yield status
+
+@pytest.mark.asyncio
+@patch('handlers.summarize_handler.async_db')
+async def test_summarize_streams_advice_into_one_message(mock_db, mock_update, mock_context, streaming):
+    """Test that the waiting message is edited as the advice is written."""
+    # Setup
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
+    mock_update.message.text = "/summarize"
+    stream = fake_stream("Your", "Your blood", "Your blood pressure is normal.")
+    
+    # Execute
+    with patch('services.analysis_service.analyze_readings_stream', stream):
+        await summarize(mock_update, mock_context)
+    
+    # Check
+    edits = [call[0][0] for call in streaming.edit_text.call_args_list]
+    assert edits == ["Medical Advice:\nYour", "Medical Advice:\nYour blood",
+                     "Medical Advice:\nYour blood pressure is normal."]
+    assert stream.args[1] == 12345
+    assert stream.args[5] == 7
+    # Only the "Please wait" message was sent; everything else is an edit
+    mock_update.message.reply_text.assert_called_once()
+
+@pytest.mark.asyncio
+@patch('handlers.summarize_handler.async_db')
+async def test_summarize_stream_throttles_edits(mock_db, mock_update, mock_context, streaming):
+    """Test that fast updates are coalesced but the final text is always shown."""
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
+    mock_update.message.text = "/summarize"
+    stream = fake_stream(*[f"word{i}" for i in range(20)])
+    
+    with patch('services.analysis_service.analyze_readings_stream', stream), \
+         patch('handlers.summarize_handler.STREAM_EDIT_INTERVAL', 0.05):
+        await summarize(mock_update, mock_context)
+    
+    edits = [call[0][0] for call in streaming.edit_text.call_args_list]
+    assert edits == ["Medical Advice:\nword0", "Medical Advice:\nword19"]
+
+@pytest.mark.asyncio
+@patch('handlers.summarize_handler.async_db')
+async def test_summarize_stream_backs_off_on_retry_after(mock_db, mock_update, mock_context, streaming):
+    """Test that a flood-control error delays edits instead of failing the reply."""
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
+    mock_update.message.text = "/summarize"
+    streaming.edit_text.side_effect = [RetryAfter(0), None, None]
+    
+    with patch('services.analysis_service.analyze_readings_stream', fake_stream("Partial", "Done")):
+        await summarize(mock_update, mock_context)
+    
+    assert streaming.edit_text.call_args[0][0] == "Medical Advice:\nDone"
+
+@pytest.mark.asyncio
+@patch('handlers.summarize_handler.async_db')
+async def test_summarize_stream_retries_final_edit(mock_db, mock_update, mock_context, streaming):
+    """Test that the final edit is retried until it succeeds, however often it is throttled."""
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
+    mock_update.message.text = "/summarize"
+    streaming.edit_text.side_effect = [None, RetryAfter(0), RetryAfter(0), RetryAfter(0), None]
+    
+    with patch('services.analysis_service.analyze_readings_stream', fake_stream("Partial", "Done")):
+        await summarize(mock_update, mock_context)
+    
+    assert streaming.edit_text.call_count == 5
+    assert streaming.edit_text.call_args[0][0] == "Medical Advice:\nDone"
+
+@pytest.mark.asyncio
+@patch('handlers.summarize_handler.async_db')
+async def test_summarize_stream_shows_errors_without_prefix(mock_db, mock_update, mock_context,
+                                                            streaming):
+    """Test that a failed analysis is not presented as medical advice."""
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
+    mock_update.message.text = "/summarize"
+    error = f"{ANALYSIS_ERROR_PREFIX} API down"
+    
+    with patch('services.analysis_service.analyze_readings_stream', fake_stream("Partial", error)):
+        await summarize(mock_update, mock_context)
+    
+    assert streaming.edit_text.call_args[0][0] == error
+
+@pytest.mark.asyncio
+@patch('handlers.summarize_handler.async_db')
+async def test_summarize_stream_ignores_not_modified(mock_db, mock_update, mock_context, streaming):
+    """Test that Telegram's 'message is not modified' error is harmless."""
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
+    mock_update.message.text = "/summarize"
+    streaming.edit_text.side_effect = [None, BadRequest("Message is not modified")]
+    
+    with patch('services.analysis_service.analyze_readings_stream', fake_stream("A", "AB")):
+        await summarize(mock_update, mock_context)
+    
+    assert streaming.edit_text.call_count == 2
+    mock_update.message.reply_text.assert_called_once()
+
+@pytest.mark.asyncio
+@patch('handlers.summarize_handler.async_db')
+async def test_summarize_stream_splits_long_advice(mock_db, mock_update, mock_context, streaming):
+    """Test that advice longer than one Telegram message continues in a new message."""
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
+    mock_update.message.text = "/summarize"
+    advice = "x" * 5000
+    
+    with patch('services.analysis_service.analyze_readings_stream', fake_stream(advice)):
+        await summarize(mock_update, mock_context)
+    
+    first = streaming.edit_text.call_args[0][0]
+    rest = streaming.reply_text.call_args[0][0]
+    assert len(first) == 4096
+    assert first + rest == f"Medical Advice:\n{advice}"
+
+@pytest.mark.asyncio
+@patch('handlers.summarize_handler.async_db')
+async def test_summarize_stream_no_readings(mock_db, mock_update, mock_context, streaming):
+    """Test that the no-readings message is shown without a prefix."""
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=[])
+    mock_update.message.text = "/summarize"
+    
+    with patch('services.analysis_service.analyze_readings_stream', fake_stream(NO_READINGS_MESSAGE)):
+        await summarize(mock_update, mock_context)
+    
+    streaming.edit_text.assert_called_once_with(NO_READINGS_MESSAGE)
+
+@pytest.mark.asyncio
+@patch('services.analysis_service.analyze_readings_async', new_callable=AsyncMock)
+@patch('handlers.summarize_handler.async_db')
+async def test_summarize_long_history_uses_daily_aggregates(mock_db, mock_analyze, mock_update,
+                                                            mock_context):
+    """Test that a long history is summarized from daily totals and its newest readings."""
+    # Setup
+    days = [(date(2023, 1, 1), 1500) + (0,) * 15, (date(2023, 1, 2), 1000) + (0,) * 15]
+    recent = [(120, 80, 70, "2023-01-02 12:00:00", None)]
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock(return_value=days)
+    mock_db.get_recent_readings = AsyncMock(return_value=recent)
+    mock_update.message.text = "/summarize 2023-01-01 2023-01-02"
+    mock_analyze.return_value = "Test medical advice"
+    
+    # Execute
+    with patch('handlers.summarize_handler.SUMMARY_AGGREGATE_THRESHOLD', 2000):
+        await summarize(mock_update, mock_context)
+    
+    # Check
+    mock_db.get_daily_aggregates.assert_awaited_once_with(12345, date(2023, 1, 1), date(2023, 1, 2))
+    mock_db.get_recent_readings.assert_awaited_once()
+    args = mock_analyze.call_args[0]
+    assert args[0] == recent
+    assert args[6] == days
+
+@pytest.mark.asyncio
+@patch('services.analysis_service.analyze_readings_async', new_callable=AsyncMock)
+@patch('handlers.summarize_handler.async_db')
+async def test_summarize_filtered_history_reads_rows(mock_db, mock_analyze, mock_update,
+                                                     mock_context):
+    """Test that a description filter always reads the matching readings themselves."""
+    mock_db.get_data_version = AsyncMock(return_value=7)
+    mock_db.get_daily_aggregates = AsyncMock()
+    mock_update.message.text = "/summarize pattern:\"coffee\""
+    mock_analyze.return_value = "Test medical advice"
+    
+    await summarize(mock_update, mock_context)
+    
+    mock_db.get_daily_aggregates.assert_not_awaited()
+    assert mock_analyze.call_args[0][0] is mock_db.database.iter_readings.return_value
+    assert mock_analyze.call_args[0][6] is None
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def imported_modules(statement):
+    """Run statement in a fresh interpreter and return the top-level modules it loaded."""
+    code = f"{statement}; import sys; print(' '.join(sorted({{m.split('.')[0] for m in sys.modules}})))"
+    env = dict(os.environ, TELEGRAM_BOT_TOKEN="test_token", OPENAI_API_KEY="test_key")
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT, env=env, text=True)
+    return set(output.split())
+
+def test_import_main_defers_heavy_dependencies():
+    """Test that starting the bot does not load the report or analysis stacks."""
+    modules = imported_modules("import main")
+    
+    assert "telegram" in modules
+    for heavy in ("reportlab", "openai", "numpy", "markdown", "bs4"):
+        assert heavy not in modules
+
+def test_import_database_does_not_open_it():
+    """Test that the default Database is only created on first access."""
+    code = ("import models.database as database; "
+            "assert 'db' not in vars(database); "
+            "database.db; assert 'db' in vars(database)")
+    imported_modules(code)
@@ -0,0 +1,127 @@
+import pytest
+import asyncio
+import os
+import threading
+from datetime import datetime, date
+from unittest.mock import MagicMock, patch
+from models.database import Database
+from models.async_database import AsyncDatabase
+
+TEST_DB_PATH = 'test_async_blood_pressure.db'
+
+@pytest.fixture
+def async_database():
+    """Provide an AsyncDatabase over a fresh database file."""
+    if os.path.exists(TEST_DB_PATH):
+        os.remove(TEST_DB_PATH)
+
+    database = Database(TEST_DB_PATH)
+    async_database = AsyncDatabase(database)
+
+    yield async_database
+
+    async_database.close()
+    database.close()
+    if os.path.exists(TEST_DB_PATH):
+        os.remove(TEST_DB_PATH)
+
+@pytest.mark.asyncio
+async def test_add_and_get_readings(async_database):
+    """Test round-tripping a reading through the async API."""
+    reading_id = await async_database.add_reading(
+        12345, 120, 80, 70, datetime(2023, 1, 1, 12, 0), "Normal reading")
+
+    readings = await async_database.get_readings(12345)
+
+    assert reading_id is not None
+    assert len(readings) == 1
+    assert readings[0][0] == 120
+
+@pytest.mark.asyncio
+async def test_remove_methods(async_database):
+    """Test the async removal methods."""
+    await async_database.add_reading(12345, 120, 80, 70, datetime(2023, 1, 1, 12, 0))
+    await async_database.add_reading(12345, 130, 85, 70, datetime(2023, 1, 2, 12, 0))
+    await async_database.add_reading(12345, 140, 90, 70, datetime(2023, 1, 3, 12, 0))
+
+    assert await async_database.remove_last_reading(12345) is True
+    assert await async_database.remove_readings_by_date(12345, date(2023, 1, 2)) is True
+    assert await async_database.remove_all_readings(12345) is True
+    assert await async_database.remove_all_readings(12345) is False
+
+@pytest.mark.asyncio
+async def test_daily_aggregates_and_recent_readings(async_database):
+    """Test the async wrappers used to summarize long histories."""
+    await async_database.add_readings([
+        (12345, 120 + i, 80, None, datetime(2023, 1, 1 + i // 2, 8 + i, 0), None) for i in range(4)])
+
+    days = await async_database.get_daily_aggregates(12345)
+    recent = await async_database.get_recent_readings(12345, 3, date(2023, 1, 1))
+
+    assert [(day[0], day[1]) for day in days] == [(date(2023, 1, 1), 2), (date(2023, 1, 2), 2)]
+    assert [r[0] for r in recent] == [120, 121]
+
+@pytest.mark.asyncio
+async def test_concurrent_add_reading_commits_one_batch(async_database):
+    """Test that readings logged together share one add_readings transaction."""
+    database = async_database.database
+    calls = []
+    original = database.add_readings
+
+    def add_readings(readings):
+        calls.append(len(readings))
+        return original(readings)
+
+    with patch.object(database, 'add_readings', side_effect=add_readings):
+        ids = await asyncio.gather(*(
+            async_database.add_reading(12345, 120 + i, 80, None, datetime(2023, 1, 1, 8, i))
+            for i in range(10)))
+
+    assert calls == [10]
+    assert len(set(ids)) == 10
+    # Every reading is readable once add_reading has returned
+    readings = await async_database.get_readings(12345)
+    assert [reading[0] for reading in readings] == [120 + i for i in range(10)]
+
+@pytest.mark.asyncio
+async def test_queries_run_off_the_event_loop(async_database):
+    """Test that blocking calls run on a worker thread, not the loop thread."""
+    loop_thread = threading.get_ident()
+
+    worker_thread = await async_database.run(threading.get_ident)
+
+    assert worker_thread != loop_thread
+
+@pytest.mark.asyncio
+async def test_slow_query_does_not_block_loop(async_database):
+    """Test that other coroutines make progress while a query is running."""
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_query():
+        started.set()
+        release.wait(timeout=5)
+        return "done"
+
+    task = asyncio.create_task(async_database.run(slow_query))
+    await asyncio.to_thread(started.wait, 5)
+
+    # The loop is still responsive while the query is blocked
+    await asyncio.sleep(0)
+    assert not task.done()
+
+    release.set()
+    assert await task == "done"
+
+@pytest.mark.asyncio
+async def test_default_uses_module_singleton():
+    """Test that the default instance follows the current db singleton."""
+    mock_db = MagicMock()
+    mock_db.get_readings.return_value = []
+    async_database = AsyncDatabase()
+
+    with patch('models.database.db', mock_db):
+        assert await async_database.get_readings(12345) == []
+
+    mock_db.get_readings.assert_called_once_with(12345, None, None, None)
+    async_database.close()
@@ -0,0 +1,93 @@
+import pytest
+import os
+import threading
+from models.connection_pool import ConnectionPool
+
+TEST_DB_PATH = 'test_connection_pool.db'
+
+@pytest.fixture
+def pool():
+    """Provide a small pool on a fresh database file."""
+    if os.path.exists(TEST_DB_PATH):
+        os.remove(TEST_DB_PATH)
+
+    pool = ConnectionPool(TEST_DB_PATH, size=2, timeout=0.1)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (value INTEGER)")
+
+    yield pool
+
+    pool.close()
+    if os.path.exists(TEST_DB_PATH):
+        os.remove(TEST_DB_PATH)
+
+def test_connection_is_reused(pool):
+    """Test that a released connection is handed out again."""
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+
+def test_pool_commits_on_success(pool):
+    """Test that changes are committed when the block exits normally."""
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO items VALUES (1)")
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+
+def test_pool_rolls_back_on_error(pool):
+    """Test that changes are rolled back when the block raises."""
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO items VALUES (1)")
+            raise RuntimeError("boom")
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+def test_pool_size_is_bounded(pool):
+    """Test that the pool never opens more connections than its size."""
+    first = pool.acquire()
+    second = pool.acquire()
+
+    # The pool is exhausted, so the next acquire times out
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+
+    pool.release(first)
+    assert pool.acquire() is first
+    pool.release(first)
+    pool.release(second)
+
+def test_pool_shared_between_threads(pool):
+    """Test that pooled connections can be used from worker threads."""
+    errors = []
+    pool.timeout = 5
+
+    def worker():
+        try:
+            for _ in range(20):
+                with pool.connection() as conn:
+                    conn.execute("INSERT INTO items VALUES (1)")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 80
+
+def test_closed_pool_rejects_acquire(pool):
+    """Test that a closed pool cannot hand out connections."""
+    pool.close()
+
+    with pytest.raises(RuntimeError):
+        pool.acquire()
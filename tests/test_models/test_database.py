@@ -1,32 +1,38 @@
 import pytest
+import gzip
+import io
 import sqlite3
 from datetime import datetime, date
 import re
 import os
-from models.database import Database
+from unittest.mock import patch
+from models.database import Database, MIGRATIONS, STORAGE_PROFILES, day_bounds
 
 # Use a physical file for tests to avoid in-memory DB issues
 TEST_DB_PATH = 'test_blood_pressure.db'
 
+def remove_db_files(path):
+    """Delete a database file along with its WAL and shared-memory files."""
+    for name in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(name):
+            os.remove(name)
+
 @pytest.fixture(scope="module")
 def db_path():
     """Return a test database path and clean up after tests."""
     # Make sure we start with a fresh DB
-    if os.path.exists(TEST_DB_PATH):
-        os.remove(TEST_DB_PATH)
+    remove_db_files(TEST_DB_PATH)
     
     yield TEST_DB_PATH
     
     # Clean up after tests
-    if os.path.exists(TEST_DB_PATH):
-        os.remove(TEST_DB_PATH)
+    remove_db_files(TEST_DB_PATH)
 
 @pytest.fixture
 def clean_db(db_path):
     """Provide a clean database for each test."""
     # Create a fresh DB
-    if os.path.exists(db_path):
-        os.remove(db_path)
+    remove_db_files(db_path)
     
     # Initialize the database
     db = Database(db_path)
@@ -36,8 +42,7 @@ def clean_db(db_path):
 def populated_db(db_path):
     """Create a database with sample readings."""
     # Start with a clean DB
-    if os.path.exists(db_path):
-        os.remove(db_path)
+    remove_db_files(db_path)
     
     # Initialize the database
     db = Database(db_path)
@@ -73,8 +78,7 @@ def populated_db(db_path):
 def test_init_db(db_path):
     """Test database initialization creates the expected table."""
     # Make sure we start with a clean slate
-    if os.path.exists(db_path):
-        os.remove(db_path)
+    remove_db_files(db_path)
     
     # Create a new database
     db = Database(db_path)
@@ -124,9 +128,9 @@ def test_get_readings_all(populated_db):
     assert len(readings) == 3
     
     # Check that readings are sorted by datetime
-    assert "2023-01-01" in readings[0][3]
-    assert "2023-01-02" in readings[1][3]
-    assert "2023-01-03" in readings[2][3]
+    assert readings[0][3].date() == date(2023, 1, 1)
+    assert readings[1][3].date() == date(2023, 1, 2)
+    assert readings[2][3].date() == date(2023, 1, 3)
 
 def test_get_readings_by_date(populated_db):
     """Test retrieving readings for a specific date."""
@@ -138,7 +142,7 @@ def test_get_readings_by_date(populated_db):
     
     # Verify we got only the readings for that date
     assert len(readings) == 1
-    assert "2023-01-02" in readings[0][3]
+    assert readings[0][3].date() == date(2023, 1, 2)
     assert readings[0][0] == 140  # systolic for the elevated reading
 
 def test_get_readings_by_date_range(populated_db):
@@ -152,8 +156,8 @@ def test_get_readings_by_date_range(populated_db):
     
     # Verify we got only the readings in that range
     assert len(readings) == 2
-    assert "2023-01-01" in readings[0][3]
-    assert "2023-01-02" in readings[1][3]
+    assert readings[0][3].date() == date(2023, 1, 1)
+    assert readings[1][3].date() == date(2023, 1, 2)
 
 def test_get_readings_with_regex(populated_db):
     """Test retrieving readings filtered by regex pattern."""
@@ -194,7 +198,7 @@ def test_remove_last_reading(populated_db):
     
     # The most recent reading (Low reading from Jan 3) should be gone
     dates = [reading[3] for reading in readings]
-    assert all("2023-01-03" not in date for date in dates)
+    assert all(reading_datetime.date() != date(2023, 1, 3) for reading_datetime in dates)
 
 def test_remove_readings_by_date(populated_db):
     """Test removing readings for a specific date."""
@@ -213,7 +217,7 @@ def test_remove_readings_by_date(populated_db):
     
     # The Jan 2 reading (Elevated reading) should be gone
     dates = [reading[3] for reading in readings]
-    assert all("2023-01-02" not in date for date in dates)
+    assert all(reading_datetime.date() != date(2023, 1, 2) for reading_datetime in dates)
 
 def test_remove_all_readings(populated_db):
     """Test removing all readings for a user."""
@@ -244,4 +248,386 @@ def test_remove_readings_nonexistent_date(populated_db):
     )
     
     # Verify the operation failed
-    assert result is False
\ No newline at end of file
+    assert result is False
+
+def test_init_db_creates_user_datetime_index(clean_db):
+    """Test that the (user_id, reading_datetime) index is created."""
+    with sqlite3.connect(clean_db.db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_readings_user_datetime'")
+        index_exists = cursor.fetchone() is not None
+    
+    assert index_exists is True
+
+def test_init_db_migrates_existing_database(db_path):
+    """Test that a database created before migrations is upgraded in place."""
+    remove_db_files(db_path)
+    
+    # Create the original schema without any index or user_version
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('''CREATE TABLE blood_pressure_readings (
+                     id INTEGER PRIMARY KEY,
+                     user_id INTEGER NOT NULL,
+                     systolic INTEGER NOT NULL,
+                     diastolic INTEGER NOT NULL,
+                     heart_rate INTEGER NULL,
+                     reading_datetime DATETIME NOT NULL,
+                     description TEXT NULL)''')
+        conn.execute('''INSERT INTO blood_pressure_readings
+                     (user_id, systolic, diastolic, heart_rate, reading_datetime, description)
+                     VALUES (12345, 120, 80, 70, '2023-01-01 12:00:00', 'Existing reading')''')
+    
+    db = Database(db_path)
+    
+    # Existing data is kept and the schema is now at the latest version
+    assert len(db.get_readings(user_id=12345)) == 1
+    with sqlite3.connect(db_path) as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        index = conn.execute(
+            "SELECT name FROM sqlite_master WHERE name='idx_readings_user_datetime'").fetchone()
+    assert version == len(MIGRATIONS)
+    assert index is not None
+
+def test_date_range_query_uses_index(populated_db):
+    """Test that date-filtered queries are served by the composite index."""
+    query, params = populated_db._prepare_query(12345, date(2023, 1, 1), date(2023, 1, 2))
+    
+    with sqlite3.connect(populated_db.db_path) as conn:
+        plan = " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+    
+    assert "idx_readings_user_datetime" in plan
+    assert "TEMP B-TREE" not in plan  # ORDER BY is satisfied by the index
+
+def test_get_readings_date_range_includes_end_of_day(populated_db):
+    """Test that the half-open range still includes the whole end date."""
+    populated_db.add_reading(
+        user_id=12345,
+        systolic=125,
+        diastolic=82,
+        reading_datetime=datetime(2023, 1, 2, 23, 59),
+        description="Late reading"
+    )
+    
+    readings = populated_db.get_readings(
+        user_id=12345,
+        start_date=date(2023, 1, 2),
+        end_date=date(2023, 1, 2)
+    )
+    
+    assert len(readings) == 2
+    assert readings[-1][4] == "Late reading"
+
+def test_day_bounds():
+    """Test the half-open day range helper."""
+    assert day_bounds(date(2023, 1, 31)) == ("2023-01-31 00:00:00", "2023-02-01 00:00:00")
+    assert day_bounds(date(2023, 1, 1), date(2023, 1, 3)) == ("2023-01-01 00:00:00", "2023-01-04 00:00:00")
+
+def test_get_readings_regex_filtered_in_sql(populated_db):
+    """Test that the regex filter is part of the SQL query."""
+    query, params = populated_db._prepare_query(12345, regex_pattern="elevated")
+    
+    assert "REGEXP" in query
+    assert params[-1] == "elevated"
+
+def test_get_readings_regex_skips_missing_descriptions(populated_db):
+    """Test that readings without a description never match a pattern."""
+    populated_db.add_reading(
+        user_id=12345,
+        systolic=150,
+        diastolic=95,
+        reading_datetime=datetime(2023, 1, 4, 12, 0)
+    )
+    
+    readings = populated_db.get_readings(user_id=12345, regex_pattern=".*")
+    
+    assert len(readings) == 3
+    assert all(reading[4] for reading in readings)
+
+def test_get_readings_regex_with_date_range(populated_db):
+    """Test combining the regex filter with a date range."""
+    readings = populated_db.get_readings(
+        user_id=12345,
+        start_date=date(2023, 1, 2),
+        end_date=date(2023, 1, 3),
+        regex_pattern="^(normal|low)"
+    )
+    
+    assert len(readings) == 1
+    assert readings[0][4] == "Low reading"
+
+def test_iter_readings_streams_in_chunks(populated_db):
+    """Test that iter_readings yields every row when fetching in small chunks."""
+    readings = populated_db.iter_readings(user_id=12345, chunk_size=2)
+    
+    # A generator, not a list
+    assert not isinstance(readings, list)
+    assert [reading[0] for reading in readings] == [120, 140, 110]
+
+def test_iter_readings_validates_regex_eagerly(populated_db):
+    """Test that an invalid pattern fails before iteration starts."""
+    with pytest.raises(ValueError) as excinfo:
+        populated_db.iter_readings(user_id=12345, regex_pattern="[invalid")
+    
+    assert "Invalid regex pattern" in str(excinfo.value)
+
+def test_iter_readings_releases_connection_when_closed(populated_db):
+    """Test that abandoning a stream early returns its connection to the pool."""
+    readings = populated_db.iter_readings(user_id=12345, chunk_size=1)
+    next(readings)
+    readings.close()
+    
+    # Every pooled connection is available again
+    connections = [populated_db._pool.acquire() for _ in range(populated_db._pool.size)]
+    for conn in connections:
+        populated_db._pool.release(conn)
+
+def test_get_readings_returns_datetimes(populated_db):
+    """Test that reading_datetime arrives already converted to a datetime."""
+    readings = populated_db.get_readings(user_id=12345)
+    
+    assert readings[0][3] == datetime(2023, 1, 1, 12, 0)
+
+def test_init_db_normalizes_legacy_timestamps(db_path):
+    """Test that non-canonical TEXT timestamps are rewritten by the migration."""
+    remove_db_files(db_path)
+    
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(MIGRATIONS[0])
+        conn.executemany('''INSERT INTO blood_pressure_readings
+                         (user_id, systolic, diastolic, reading_datetime)
+                         VALUES (12345, 120, 80, ?)''',
+                         [("2023-01-01T08:30:00",), ("2023-01-02 09:15",), ("2023-01-03 10:00:00",)])
+    
+    db = Database(db_path)
+    
+    with sqlite3.connect(db_path) as conn:
+        stored = [row[0] for row in conn.execute(
+            "SELECT reading_datetime FROM blood_pressure_readings ORDER BY id")]
+    assert stored == ["2023-01-01 08:30:00", "2023-01-02 09:15:00", "2023-01-03 10:00:00"]
+    assert db.get_readings(user_id=12345)[1][3] == datetime(2023, 1, 2, 9, 15)
+
+def test_data_version_changes_on_every_write(clean_db):
+    """Test that inserts, deletes and updates bump only the affected user's version."""
+    db = clean_db
+    assert db.get_data_version(12345) == 0
+    
+    db.add_reading(12345, 120, 80, reading_datetime=datetime(2023, 1, 2, 8, 0))
+    db.add_reading(12345, 125, 82, reading_datetime=datetime(2023, 1, 1, 8, 0))
+    after_insert = db.get_data_version(12345)
+    assert after_insert > 0
+    
+    # Removing an older reading leaves the newest timestamp unchanged but bumps the version
+    db.remove_readings_by_date(12345, date(2023, 1, 1))
+    after_delete = db.get_data_version(12345)
+    assert after_delete > after_insert
+    
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE blood_pressure_readings SET systolic = 130 WHERE user_id = 12345")
+    assert db.get_data_version(12345) > after_delete
+    
+    # Other users are unaffected
+    assert db.get_data_version(67890) == 0
+
+def test_database_uses_wal(clean_db):
+    """Test that the default profile switches the database to write-ahead logging."""
+    with sqlite3.connect(clean_db.db_path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_wal_profile_configures_each_connection(clean_db):
+    """Test that pooled connections get the profile's per-connection pragmas."""
+    with clean_db._pool.connection() as conn:
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == STORAGE_PROFILES["wal"]["cache_size"]
+        assert conn.execute("PRAGMA mmap_size").fetchone()[0] == STORAGE_PROFILES["wal"]["mmap_size"]
+
+def test_rollback_profile(db_path):
+    """Test that the rollback profile restores SQLite's default journal."""
+    remove_db_files(db_path)
+    Database(db_path).close()
+    
+    db = Database(db_path, profile="rollback")
+    db.add_reading(12345, 120, 80, reading_datetime=datetime(2023, 1, 1, 8, 0))
+    
+    with db._pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+    assert db.checkpoint() is None
+    assert len(db.get_readings(12345)) == 1
+    db.close()
+
+def test_unknown_profile_is_rejected(db_path):
+    """Test that a misspelt profile fails at startup rather than silently using defaults."""
+    with pytest.raises(ValueError, match="Unknown storage profile"):
+        Database(db_path, profile="fast")
+
+def test_writes_checkpoint_after_interval(db_path):
+    """Test that a write checkpoints the WAL once checkpoint_interval has passed."""
+    remove_db_files(db_path)
+    db = Database(db_path, checkpoint_interval=3600)
+    db.add_reading(12345, 120, 80, reading_datetime=datetime(2023, 1, 1, 8, 0))
+    assert os.path.getsize(db_path + "-wal") > 0
+    
+    # Interval not reached yet
+    with patch.object(db, "checkpoint", wraps=db.checkpoint) as checkpoint:
+        db.add_reading(12345, 121, 80, reading_datetime=datetime(2023, 1, 1, 9, 0))
+        checkpoint.assert_not_called()
+        
+        db.checkpoint_interval = 0
+        db.remove_last_reading(12345)
+        checkpoint.assert_called_once_with()
+    
+    busy, wal_pages, checkpointed = db.checkpoint("TRUNCATE")
+    assert busy == 0
+    assert os.path.getsize(db_path + "-wal") == 0
+    assert len(db.get_readings(12345)) == 1
+    db.close()
+
+def test_add_readings_inserts_in_one_call(clean_db):
+    """Test that add_readings stores every row and returns their ids in order."""
+    db = clean_db
+    first_id = db.add_reading(12345, 118, 78, reading_datetime=datetime(2023, 1, 1, 8, 0))
+    
+    ids = db.add_readings([
+        (12345, 120, 80, 70, datetime(2023, 1, 2, 8, 0), "Morning"),
+        (67890, 130, 85, None, datetime(2023, 1, 2, 9, 0), None),
+        (12345, 125, 82, 72, None, "Evening"),
+    ])
+    
+    assert ids == [first_id + 1, first_id + 2, first_id + 3]
+    with sqlite3.connect(db.db_path) as conn:
+        rows = conn.execute("SELECT id, user_id, systolic FROM blood_pressure_readings "
+                            "WHERE id > ? ORDER BY id", (first_id,)).fetchall()
+    assert rows == [(ids[0], 12345, 120), (ids[1], 67890, 130), (ids[2], 12345, 125)]
+    # A missing datetime defaults to now
+    assert db.get_readings(12345)[-1][3].date() == datetime.now().date()
+    assert db.add_readings([]) == []
+
+def test_import_readings_is_one_transaction(clean_db):
+    """Test that import_readings inserts every batch, or none if one fails."""
+    db = clean_db
+    rows = [(12345, 120 + i, 80, None, datetime(2023, 1, 1, 8, i), None) for i in range(4)]
+    
+    assert db.import_readings(iter([rows[:2], rows[2:]])) == 4
+    assert len(db.get_readings(12345)) == 4
+    
+    def failing_batches():
+        yield rows
+        raise ValueError("broken file")
+    
+    with pytest.raises(ValueError):
+        db.import_readings(failing_batches())
+    assert len(db.get_readings(12345)) == 4
+
+def test_import_readings_lets_other_writers_in_while_parsing(clean_db):
+    """Test that readings can be added while an import is still parsing its file."""
+    db = clean_db
+    rows = [(12345, 120 + i, 80, None, datetime(2023, 1, 1, 8, i), None) for i in range(4)]
+    added = []
+    
+    def batches():
+        yield rows[:2]
+        # Runs on another pooled connection; it would time out on a held write lock
+        added.append(db.add_reading(67890, 130, 85, reading_datetime=datetime(2023, 1, 2)))
+        yield rows[2:]
+    
+    assert db.import_readings(batches()) == 4
+    assert added and len(db.get_readings(67890)) == 1
+    assert [r[0] for r in db.get_readings(12345)] == [120, 121, 122, 123]
+
+def test_export_readings_streams_filtered_rows(populated_db):
+    """Test that export_readings applies the filters and releases its connection."""
+    out = io.BytesIO()
+    
+    count = populated_db.export_readings(12345, out, "csv", date(2023, 1, 2), date(2023, 1, 3),
+                                         "reading")
+    
+    assert count == 2
+    lines = gzip.decompress(out.getvalue()).decode().splitlines()
+    assert lines[1:] == ["140,90,75,2023-01-02 12:00:00,Elevated reading",
+                         "110,70,65,2023-01-03 12:00:00,Low reading"]
+    assert populated_db._pool._idle.qsize() == populated_db._pool._created
+    
+    with pytest.raises(ValueError, match="Unknown export format"):
+        populated_db.export_readings(12345, io.BytesIO(), "xlsx")
+
+def test_daily_aggregates_follow_inserts(clean_db):
+    """Test that add_reading and add_readings keep the daily totals up to date."""
+    db = clean_db
+    db.add_reading(12345, 120, 80, 70, datetime(2023, 1, 1, 8, 0))
+    db.add_readings([
+        (12345, 150, 95, None, datetime(2023, 1, 1, 20, 0), None),
+        (12345, 185, 125, 90, datetime(2023, 1, 2, 8, 0), None),
+        (67890, 110, 70, 60, datetime(2023, 1, 1, 8, 0), None),
+    ])
+    
+    days = db.get_daily_aggregates(12345)
+    
+    assert days == [
+        (date(2023, 1, 1), 2, 270, 120, 150, 175, 80, 95, 1, 70, 70, 70, 0, 0, 1, 1, 0),
+        (date(2023, 1, 2), 1, 185, 185, 185, 125, 125, 125, 1, 90, 90, 90, 0, 0, 0, 0, 1),
+    ]
+    assert db.get_daily_aggregates(12345, date(2023, 1, 2), date(2023, 1, 2)) == days[1:]
+    assert db.get_daily_aggregates(12345, date(2023, 1, 1)) == days[:1]
+
+def test_daily_aggregates_follow_removals(populated_db):
+    """Test that removing readings recomputes or drops the affected days."""
+    db = populated_db
+    db.add_reading(12345, 160, 100, 80, datetime(2023, 1, 3, 20, 0))
+    assert db.get_daily_aggregates(12345, date(2023, 1, 3))[0][1:5] == (2, 270, 110, 160)
+    
+    # The removed reading was the day's maximum, so it is recomputed from what remains
+    db.remove_last_reading(12345)
+    assert db.get_daily_aggregates(12345, date(2023, 1, 3))[0][1:5] == (1, 110, 110, 110)
+    
+    db.remove_readings_by_date(12345, date(2023, 1, 2))
+    assert [day[0] for day in db.get_daily_aggregates(12345)] == [date(2023, 1, 1),
+                                                                   date(2023, 1, 3)]
+    db.remove_all_readings(12345)
+    assert db.get_daily_aggregates(12345) == []
+
+def test_daily_aggregates_backfilled_on_migration(db_path):
+    """Test that readings stored before the aggregates existed are totalled on upgrade."""
+    remove_db_files(db_path)
+    db = Database(db_path)
+    db.add_readings([(12345, 120 + i, 80, None, datetime(2023, 1, 1 + i % 2, 8, i), None)
+                     for i in range(4)])
+    expected = db.get_daily_aggregates(12345)
+    db.close()
+    
+    # Roll back to the schema before the aggregate table
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DROP TRIGGER trg_readings_insert_aggregate")
+        conn.execute("DROP TABLE daily_aggregates")
+        first = next(i for i, m in enumerate(MIGRATIONS) if "daily_aggregates" in m)
+        conn.execute(f"PRAGMA user_version = {first}")
+    
+    db = Database(db_path)
+    assert db.get_daily_aggregates(12345) == expected
+
+def test_get_recent_readings(populated_db):
+    """Test that get_recent_readings returns the newest readings in time order."""
+    readings = populated_db.get_recent_readings(12345, 2)
+    assert [r[3] for r in readings] == [datetime(2023, 1, 2, 12, 0), datetime(2023, 1, 3, 12, 0)]
+    
+    readings = populated_db.get_recent_readings(12345, 5, date(2023, 1, 1), date(2023, 1, 2))
+    assert [r[0] for r in readings] == [120, 140]
+
+def test_removals_update_aggregates_once_per_call(db_path):
+    """Test that removing many readings doesn't rebuild their day once per reading."""
+    remove_db_files(db_path)
+    db = Database(db_path)
+    db.add_readings([(12345, 120, 80, None, datetime(2023, 1, 1, i // 60, i % 60), None)
+                     for i in range(1440)] +
+                    [(12345, 130, 85, None, datetime(2023, 1, 2, 8, 0), None)])
+    
+    with sqlite3.connect(db_path) as conn:
+        triggers = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%aggregate'")]
+    assert triggers == ["trg_readings_insert_aggregate"]
+    
+    assert db.remove_readings_by_date(12345, date(2023, 1, 1)) is True
+    assert [day[:2] for day in db.get_daily_aggregates(12345)] == [(date(2023, 1, 2), 1)]
+    assert db.remove_all_readings(12345) is True
+    assert db.get_daily_aggregates(12345) == []
+    assert db.remove_last_reading(12345) is False
@@ -154,4 +154,19 @@ def test_reading_str_representation():
     # Verify string representation without optional fields
     reading_str = str(reading)
     assert "Heart Rate" not in reading_str
-    assert "Description" not in reading_str
\ No newline at end of file
+    assert "Description" not in reading_str
+
+def test_reading_has_no_instance_dict():
+    """Test that Reading uses __slots__ instead of a per-instance __dict__."""
+    reading = Reading(systolic=120, diastolic=80)
+    
+    assert not hasattr(reading, "__dict__")
+    with pytest.raises(AttributeError):
+        reading.unexpected_attribute = 1
+
+def test_reading_from_tuple_with_datetime():
+    """Test that an already converted datetime is used without parsing."""
+    moment = datetime(2023, 1, 1, 12, 0)
+    reading = Reading.from_tuple((120, 80, 70, moment, "Test reading"))
+    
+    assert reading.reading_datetime is moment
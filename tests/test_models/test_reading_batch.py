@@ -0,0 +1,81 @@
+import pytest
+from datetime import datetime
+from models.reading import Reading
+from models.reading_batch import ReadingBatch, to_epoch, from_epoch
+
+ROWS = [
+    (120, 80, 70, "2023-01-01 08:00:00", "Morning"),
+    (140, 90, None, "2023-01-01 20:00:00", "Evening"),
+    (110, 70, 60, "2023-01-02 08:00:00", None),
+]
+
+def test_epoch_round_trip():
+    """Test converting reading datetimes to epoch seconds and back."""
+    moment = datetime(2023, 1, 1, 12, 30)
+    
+    assert to_epoch(moment) == 1672576200
+    assert to_epoch("2023-01-01 12:30:00") == 1672576200
+    assert from_epoch(to_epoch(moment)) == moment
+
+def test_batch_from_rows():
+    """Test building a batch from database tuples."""
+    batch = ReadingBatch.from_rows(ROWS)
+    
+    assert len(batch) == 3
+    assert list(batch.systolic) == [120, 140, 110]
+    assert list(batch.diastolic) == [80, 90, 70]
+    assert list(batch.datetimes())[1] == datetime(2023, 1, 1, 20, 0)
+
+def test_batch_iterates_as_readings():
+    """Test that a batch yields equivalent Reading objects."""
+    batch = ReadingBatch.from_rows(ROWS)
+    
+    readings = list(batch)
+    
+    assert all(isinstance(reading, Reading) for reading in readings)
+    assert readings[0].heart_rate == 70
+    assert readings[1].heart_rate is None  # Missing heart rate survives the round trip
+    assert readings[2].reading_datetime == datetime(2023, 1, 2, 8, 0)
+
+def test_batch_append_reading():
+    """Test appending Reading objects."""
+    batch = ReadingBatch()
+    batch.append_reading(Reading(systolic=125, diastolic=82, heart_rate=72,
+                                 reading_datetime=datetime(2023, 1, 1, 9, 0)))
+    
+    assert len(batch) == 1
+    assert batch.heart_rate[0] == 72
+
+def test_batch_averages():
+    """Test column averages, skipping missing heart rates."""
+    batch = ReadingBatch.from_rows(ROWS)
+    
+    avg_systolic, avg_diastolic, avg_heart = batch.averages()
+    
+    assert avg_systolic == pytest.approx(123.333, rel=1e-3)
+    assert avg_diastolic == pytest.approx(80.0)
+    assert avg_heart == pytest.approx(65.0)
+
+def test_batch_averages_without_heart_rate():
+    """Test that the heart rate average is None when no reading has one."""
+    batch = ReadingBatch.from_rows([(120, 80, None, "2023-01-01 08:00:00", None)])
+    
+    assert batch.averages() == (120.0, 80.0, None)
+
+def test_empty_batch():
+    """Test an empty batch."""
+    batch = ReadingBatch()
+    
+    assert len(batch) == 0
+    assert batch.averages() == (None, None, None)
+    assert batch.columns()["systolic"].size == 0
+
+def test_batch_columns_are_zero_copy():
+    """Test that NumPy views share memory with the arrays."""
+    batch = ReadingBatch.from_rows(ROWS)
+    
+    columns = batch.columns()
+    batch.systolic[0] = 200
+    
+    assert columns["systolic"][0] == 200
+    assert batch.nbytes == 3 * (2 + 2 + 2 + 8)
@@ -0,0 +1,69 @@
+import pytest
+import csv
+import gzip
+import io
+from datetime import datetime
+from models.reading_export import (CSV_COLUMNS, MAGIC, iter_columnar, write_columnar,
+                                   write_csv)
+
+ROWS = [
+    (120, 80, 70, datetime(2023, 1, 1, 8, 0), "Morning, after coffee"),
+    (135, 88, None, datetime(2023, 1, 1, 20, 30), None),
+    (118, 76, 64, datetime(2023, 1, 2, 7, 45), "Ünïcode ✓"),
+    (140, 90, 80, datetime(1969, 12, 31, 23, 0), ""),
+]
+
+def test_write_csv_round_trip():
+    """Test that the gzipped CSV holds a header and every row."""
+    out = io.BytesIO()
+    
+    # Execute
+    count = write_csv(iter(ROWS), out)
+    
+    # Check
+    assert count == 4
+    assert not out.closed
+    text = gzip.decompress(out.getvalue()).decode("utf-8")
+    rows = list(csv.reader(io.StringIO(text)))
+    assert tuple(rows[0]) == CSV_COLUMNS
+    assert rows[1] == ["120", "80", "70", "2023-01-01 08:00:00", "Morning, after coffee"]
+    assert rows[2] == ["135", "88", "", "2023-01-01 20:30:00", ""]
+    assert len(rows) == 5
+
+@pytest.mark.parametrize("row_group_size", [1, 3, 100])
+def test_write_columnar_round_trip(row_group_size):
+    """Test that every value survives the columnar format, across row group boundaries."""
+    out = io.BytesIO()
+    
+    # Execute
+    count = write_columnar(iter(ROWS), out, row_group_size)
+    
+    # Check
+    assert count == 4
+    assert out.getvalue().startswith(MAGIC)
+    out.seek(0)
+    assert list(iter_columnar(out)) == ROWS
+
+def test_columnar_is_compact():
+    """Test that a long regular history takes far less space than CSV."""
+    rows = [(120 + i % 20, 80 + i % 10, 70, datetime(2023, 1, 1, 8, 0).replace(
+        day=1 + i % 28, hour=i % 24), None) for i in range(5000)]
+    columnar, text = io.BytesIO(), io.BytesIO()
+    
+    write_columnar(rows, columnar, 10000)
+    write_csv(rows, text)
+    
+    assert len(columnar.getvalue()) < len(text.getvalue())
+
+def test_empty_columnar_export():
+    """Test that an export without readings is still a valid file."""
+    out = io.BytesIO()
+    
+    assert write_columnar([], out, 100) == 0
+    out.seek(0)
+    assert list(iter_columnar(out)) == []
+
+def test_iter_columnar_rejects_other_files():
+    """Test that reading a file in another format fails clearly."""
+    with pytest.raises(ValueError, match="Not a columnar"):
+        list(iter_columnar(io.BytesIO(b"systolic,diastolic\n")))
@@ -0,0 +1,102 @@
+import pytest
+import asyncio
+from models.write_queue import WriteBehindQueue
+
+class RecordingFlush:
+    """Async flush callable that records each batch and returns item * 10."""
+    
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+    
+    async def __call__(self, items):
+        self.batches.append(list(items))
+        await asyncio.sleep(0)
+        if self.fail_on in items:
+            raise ValueError("bad item")
+        return [item * 10 for item in items]
+
+@pytest.mark.asyncio
+async def test_concurrent_puts_share_one_flush():
+    """Test that items put within the delay are written as one batch."""
+    flush = RecordingFlush()
+    queue = WriteBehindQueue(flush, max_batch=100, max_delay=0.01)
+    
+    # Execute
+    results = await asyncio.gather(*(queue.put(i) for i in range(5)))
+    
+    # Check
+    assert results == [0, 10, 20, 30, 40]
+    assert flush.batches == [[0, 1, 2, 3, 4]]
+    assert len(queue) == 0
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting():
+    """Test that reaching max_batch flushes immediately and starts a new batch."""
+    flush = RecordingFlush()
+    queue = WriteBehindQueue(flush, max_batch=2, max_delay=60)
+    
+    # Execute; with a 60 s delay only full batches can complete in time
+    results = await asyncio.wait_for(asyncio.gather(*(queue.put(i) for i in range(4))), 1)
+    
+    # Check
+    assert results == [0, 10, 20, 30]
+    assert flush.batches == [[0, 1], [2, 3]]
+
+@pytest.mark.asyncio
+async def test_put_waits_for_its_batch():
+    """Test that put() does not return before the batch has been written."""
+    release = asyncio.Event()
+    
+    async def slow_flush(items):
+        await release.wait()
+        return items
+    
+    queue = WriteBehindQueue(slow_flush, max_batch=100, max_delay=0)
+    task = asyncio.create_task(queue.put("reading"))
+    await asyncio.sleep(0.01)
+    assert not task.done()
+    
+    release.set()
+    assert await task == "reading"
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_per_item():
+    """Test that one bad item only fails its own put()."""
+    flush = RecordingFlush(fail_on=2)
+    queue = WriteBehindQueue(flush, max_batch=100, max_delay=0.01)
+    
+    # Execute
+    results = await asyncio.gather(*(queue.put(i) for i in range(3)), return_exceptions=True)
+    
+    # Check
+    assert results[:2] == [0, 10]
+    assert isinstance(results[2], ValueError)
+    assert flush.batches == [[0, 1, 2], [0], [1], [2]]
+
+@pytest.mark.asyncio
+async def test_cancelled_put_still_writes_the_batch():
+    """Test that cancelling one caller does not drop the other items."""
+    flush = RecordingFlush()
+    queue = WriteBehindQueue(flush, max_batch=100, max_delay=0.01)
+    cancelled = asyncio.create_task(queue.put(1))
+    kept = asyncio.create_task(queue.put(2))
+    await asyncio.sleep(0)
+    
+    cancelled.cancel()
+    
+    assert await kept == 20
+    assert flush.batches == [[1, 2]]
+
+@pytest.mark.asyncio
+async def test_drain_flushes_pending_items():
+    """Test that drain() writes queued items without waiting for the delay."""
+    flush = RecordingFlush()
+    queue = WriteBehindQueue(flush, max_batch=100, max_delay=60)
+    task = asyncio.create_task(queue.put(7))
+    await asyncio.sleep(0)
+    
+    await asyncio.wait_for(queue.drain(), 1)
+    
+    assert await task == 70
+    assert flush.batches == [[7]]
@@ -1,7 +1,15 @@
 import pytest
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch, MagicMock
 from datetime import datetime, date
-from services.analysis_service import analyze_readings
+from openai import AsyncOpenAI
+from services.analysis_service import (analyze_readings, analyze_readings_async,
+                                       analyze_readings_stream, NO_READINGS_MESSAGE)
+from utils.cache import cache
 
 @patch('services.analysis_service.client')
 def test_analyze_readings_basic(mock_client, mock_openai_client):
@@ -135,4 +143,297 @@ def test_analyze_readings_api_error(mock_client, mock_openai_client):
     # Instead of asserting specific text, let's just verify the function returns something
     # and doesn't crash when OpenAI API has an error
     assert isinstance(advice, str)
-    assert len(advice) > 0
\ No newline at end of file
+    assert len(advice) > 0
+
+@patch('services.analysis_service.client')
+def test_analyze_readings_consumes_stream(mock_client, mock_openai_client):
+    """Test that readings can be passed as a one-shot iterator."""
+    # Setup mock OpenAI client
+    mock_client.chat.completions.create = mock_openai_client.chat.completions.create
+    
+    # A generator can only be consumed once
+    readings = (r for r in [
+        (125, 82, 70, "2023-03-01 08:00:00", "Morning"),
+        (135, 88, 75, "2023-03-01 20:00:00", "Evening")
+    ])
+    
+    advice = analyze_readings(readings, 54321)
+    
+    prompt = mock_client.chat.completions.create.call_args[1]['messages'][1]['content']
+    assert advice == "Test medical advice"
+    assert "Systolic: 125" in prompt
+    assert "Systolic: 135" in prompt
+    assert "Summary statistics" in prompt
+    assert "Systolic: mean 130.0" in prompt
+
+@patch('services.analysis_service.client')
+def test_analyze_readings_empty_stream(mock_client):
+    """Test analysis of an empty iterator."""
+    advice = analyze_readings(iter([]), 12345)
+    
+    mock_client.chat.completions.create.assert_not_called()
+    assert advice == NO_READINGS_MESSAGE
+
+@patch('services.analysis_service.client')
+def test_analyze_readings_backfill_invalidates_cache(mock_client, mock_openai_client):
+    """Test that adding an older reading misses the cache though the newest is unchanged."""
+    mock_client.chat.completions.create = mock_openai_client.chat.completions.create
+    cache.clear()
+    readings = [(120, 80, 70, "2023-02-01 12:00:00", "Normal reading")]
+    analyze_readings(readings, 777)
+    
+    # Backfill a reading older than the newest one
+    backfilled = [(150, 95, 80, "2023-01-15 09:00:00", "Backfilled")] + readings
+    analyze_readings(backfilled, 777)
+    
+    assert mock_client.chat.completions.create.call_count == 2
+
+@patch('services.analysis_service.client')
+def test_analyze_readings_data_version_hit_skips_readings(mock_client, mock_openai_client):
+    """Test that a cached data version is answered without consuming the readings."""
+    mock_client.chat.completions.create = mock_openai_client.chat.completions.create
+    cache.clear()
+    analyze_readings([(120, 80, 70, "2023-01-01 12:00:00", None)], 888, data_version=3)
+    
+    readings = MagicMock()
+    advice = analyze_readings(readings, 888, data_version=3)
+    
+    assert advice == "Test medical advice"
+    readings.__iter__.assert_not_called()
+    assert mock_client.chat.completions.create.call_count == 1
+    
+    # A new version asks again
+    analyze_readings([(130, 85, 70, "2023-01-01 12:00:00", None)], 888, data_version=4)
+    assert mock_client.chat.completions.create.call_count == 2
+
+class StubOpenAIServer:
+    """Local HTTP server imitating the chat completions endpoint."""
+    
+    def __init__(self):
+        self.script = []  # (status, delay) per request; the default is an immediate 200
+        self.requests = 0
+        self.stream_words = ["Stub ", "streamed ", "**advice**"]
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stub.lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    status, delay = stub.script.pop(0) if stub.script else (200, 0)
+                time.sleep(delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+                if status == 200 and request.get("stream"):
+                    self.send_stream()
+                    return
+                body = json.dumps({
+                    "id": "chatcmpl-stub", "object": "chat.completion", "created": 0,
+                    "model": "gpt-4o",
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "Stub advice"}}]
+                } if status == 200 else {"error": {"message": "stub error"}}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up (timeout test)
+            
+            def send_stream(self):
+                """Send the advice as server-sent events, one word per chunk."""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for word in stub.stream_words:
+                    chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk",
+                             "created": 0, "model": "gpt-4o",
+                             "choices": [{"index": 0, "delta": {"content": word},
+                                          "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub_server():
+    """Point the async analysis path at a local stub server."""
+    server = StubOpenAIServer()
+    client = AsyncOpenAI(api_key="test_key", base_url=server.base_url, max_retries=0)
+    cache.clear()
+    with patch('services.analysis_service.async_client', client), \
+         patch('services.analysis_service.OPENAI_BACKOFF_BASE', 0.01):
+        yield server
+    cache.clear()
+    server.close()
+
+READING = [(120, 80, 70, "2023-01-01 12:00:00", "Normal reading")]
+
+@pytest.mark.asyncio
+async def test_analyze_readings_async_against_stub(stub_server):
+    """Test the async path end to end against the stub server."""
+    advice = await analyze_readings_async(READING, 12345)
+    
+    assert advice.strip() == "Stub advice"
+    assert stub_server.requests == 1
+    
+    # A second call is served from the cache
+    assert (await analyze_readings_async(READING, 12345)).strip() == "Stub advice"
+    assert stub_server.requests == 1
+
+@pytest.mark.asyncio
+async def test_analyze_readings_async_retries_server_errors(stub_server):
+    """Test that 5xx responses are retried with backoff."""
+    stub_server.script = [(500, 0), (503, 0)]
+    
+    advice = await analyze_readings_async(READING, 12345)
+    
+    assert advice.strip() == "Stub advice"
+    assert stub_server.requests == 3
+
+@pytest.mark.asyncio
+async def test_analyze_readings_async_gives_up_after_retries(stub_server):
+    """Test that persistent failures are reported after the last retry."""
+    stub_server.script = [(500, 0)] * 10
+    
+    with patch('services.analysis_service.OPENAI_MAX_RETRIES', 2):
+        advice = await analyze_readings_async(READING, 12345)
+    
+    assert "An error occurred" in advice
+    assert stub_server.requests == 3
+
+@pytest.mark.asyncio
+async def test_analyze_readings_async_does_not_retry_client_errors(stub_server):
+    """Test that a 400 response fails without retrying."""
+    stub_server.script = [(400, 0)]
+    
+    advice = await analyze_readings_async(READING, 12345)
+    
+    assert "An error occurred" in advice
+    assert stub_server.requests == 1
+
+@pytest.mark.asyncio
+async def test_analyze_readings_async_times_out(stub_server):
+    """Test the per-request timeout, which is retried like other transient errors."""
+    stub_server.script = [(200, 1), (200, 1)]
+    
+    with patch('services.analysis_service.OPENAI_TIMEOUT', 0.2), \
+         patch('services.analysis_service.OPENAI_MAX_RETRIES', 1):
+        advice = await analyze_readings_async(READING, 12345)
+    
+    assert "An error occurred" in advice
+    assert stub_server.requests == 2
+
+@pytest.mark.asyncio
+async def test_analyze_readings_async_limits_concurrency(stub_server):
+    """Test that the semaphore caps completions in flight."""
+    stub_server.script = [(200, 0.2)] * 6
+    
+    with patch('services.analysis_service.OPENAI_MAX_CONCURRENCY', 2):
+        results = await asyncio.gather(*[
+            analyze_readings_async(READING, user_id) for user_id in range(6)
+        ])
+    
+    assert all(advice.strip() == "Stub advice" for advice in results)
+    assert stub_server.requests == 6
+    assert stub_server.max_in_flight == 2
+
+@pytest.mark.asyncio
+async def test_analyze_readings_async_empty(stub_server):
+    """Test that no request is made without readings."""
+    assert await analyze_readings_async(iter([]), 12345) == NO_READINGS_MESSAGE
+    assert stub_server.requests == 0
+
+@pytest.mark.asyncio
+async def test_analyze_readings_async_coalesces_identical_requests(stub_server):
+    """Test that concurrent requests for the same readings share one completion."""
+    stub_server.script = [(200, 0.2)]
+    
+    results = await asyncio.gather(*[analyze_readings_async(READING, 12345) for _ in range(3)])
+    
+    assert all(advice.strip() == "Stub advice" for advice in results)
+    assert stub_server.requests == 1
+
+@pytest.mark.asyncio
+async def test_analyze_readings_async_coalesced_failure(stub_server):
+    """Test that a shared failing completion is reported to every caller once."""
+    stub_server.script = [(400, 0.1)]
+    
+    results = await asyncio.gather(*[analyze_readings_async(READING, 12345) for _ in range(2)])
+    
+    assert all("An error occurred" in advice for advice in results)
+    assert stub_server.requests == 1
+
+async def collect(updates):
+    return [update async for update in updates]
+
+@pytest.mark.asyncio
+async def test_analyze_readings_stream_yields_growing_advice(stub_server):
+    """Test that streamed advice grows chunk by chunk and ends as cached plain text."""
+    updates = await collect(analyze_readings_stream(READING, 12345))
+    
+    assert updates[:3] == ["Stub ", "Stub streamed ", "Stub streamed **advice**"]
+    # The final update is the markdown-free text that was cached
+    assert updates[-1].strip() == "Stub streamed advice"
+    assert stub_server.requests == 1
+    
+    # A second call is served from the cache in one piece
+    cached = await collect(analyze_readings_stream(READING, 12345))
+    assert cached == [updates[-1]]
+    assert stub_server.requests == 1
+
+@pytest.mark.asyncio
+async def test_analyze_readings_stream_shares_one_completion(stub_server):
+    """Test that concurrent streamed and non-streamed requests make one request."""
+    stub_server.script = [(200, 0.2)]
+    
+    first, second, advice = await asyncio.gather(
+        collect(analyze_readings_stream(READING, 12345)),
+        collect(analyze_readings_stream(READING, 12345)),
+        analyze_readings_async(READING, 12345))
+    
+    assert first[-1].strip() == second[-1].strip() == advice.strip() == "Stub streamed advice"
+    assert stub_server.requests == 1
+
+@pytest.mark.asyncio
+async def test_analyze_readings_stream_retries_before_first_chunk(stub_server):
+    """Test that a failure before any text arrives is retried."""
+    stub_server.script = [(503, 0)]
+    
+    updates = await collect(analyze_readings_stream(READING, 12345))
+    
+    assert updates[-1].strip() == "Stub streamed advice"
+    assert stub_server.requests == 2
+
+@pytest.mark.asyncio
+async def test_analyze_readings_stream_reports_errors(stub_server):
+    """Test that a failed stream yields an error message instead of raising."""
+    stub_server.script = [(400, 0)]
+    
+    updates = await collect(analyze_readings_stream(READING, 12345))
+    
+    assert len(updates) == 1
+    assert "An error occurred" in updates[0]
+
+@pytest.mark.asyncio
+async def test_analyze_readings_stream_empty(stub_server):
+    """Test that no request is made without readings."""
+    assert await collect(analyze_readings_stream(iter([]), 12345)) == [NO_READINGS_MESSAGE]
+    assert stub_server.requests == 0
@@ -0,0 +1,124 @@
+import pytest
+import io
+import json
+from datetime import datetime
+from services.import_service import (ImportFormatError, ImportResult, detect_format,
+                                     iter_json_records, parse_reading, read_import_batches,
+                                     MAX_REPORTED_ERRORS)
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def test_detect_format():
+    """Test that files are recognized by extension or MIME type."""
+    assert detect_format("readings.CSV") == "csv"
+    assert detect_format("export", "text/csv") == "csv"
+    assert detect_format("readings.json") == "json"
+    assert detect_format("readings.jsonl") == "json"
+    assert detect_format("data", "application/json") == "json"
+    assert detect_format("readings.xlsx") is None
+    assert detect_format(None) is None
+
+def test_parse_reading_accepts_aliases_and_optional_fields():
+    """Test that common column names and text numbers are understood."""
+    row = parse_reading({"SYS": "121", "Dia": 79.0, "Pulse": "", "Date": "2024-03-01",
+                         "Time": "07:30", "Notes": "  after coffee ", "device": "X"}, 12345)
+    
+    assert row == (12345, 121, 79, None, datetime(2024, 3, 1, 7, 30), "after coffee")
+
+@pytest.mark.parametrize("text", [
+    "2024-03-01T07:30:15.5+00:00",
+    "2024-03-01T07:30:15Z",
+    "2024-03-01T07:30:15.1234567z",
+])
+def test_parse_reading_converts_aware_datetimes_to_local_time(text):
+    """Test that timestamps with an offset or a Z suffix are stored as naive local time."""
+    row = parse_reading({"systolic": 120, "diastolic": 80, "datetime": text}, 1)
+    
+    expected = datetime.fromisoformat("2024-03-01T07:30:15+00:00").astimezone().replace(tzinfo=None)
+    assert row[4] == expected
+
+@pytest.mark.parametrize("record, message", [
+    ({"diastolic": 80, "datetime": "2024-01-01 08:00"}, "systolic is missing"),
+    ({"systolic": "high", "diastolic": 80, "datetime": "2024-01-01 08:00"}, "not a number"),
+    ({"systolic": 120.5, "diastolic": 80, "datetime": "2024-01-01 08:00"}, "whole number"),
+    ({"systolic": 900, "diastolic": 80, "datetime": "2024-01-01 08:00"}, "whole number"),
+    ({"systolic": 80, "diastolic": 120, "datetime": "2024-01-01 08:00"}, "lower than systolic"),
+    ({"systolic": 120, "diastolic": 80, "heart_rate": 5, "datetime": "2024-01-01 08:00"}, "heart_rate"),
+    ({"systolic": 120, "diastolic": 80}, "datetime is missing"),
+    ({"systolic": 120, "diastolic": 80, "datetime": "01/02/2024"}, "invalid datetime"),
+    ([120, 80], "expected an object"),
+])
+def test_parse_reading_rejects_invalid_records(record, message):
+    """Test that invalid rows are rejected with a readable reason."""
+    with pytest.raises(ValueError, match=message):
+        parse_reading(record, 12345)
+
+@pytest.mark.parametrize("text", [
+    '[{"a": 1}, {"a": 2}, {"a": "x]"}]',
+    ' [\n {"a": 1} ,\n{"a": 2},{"a": "x]"}\n]\n',
+    '{"a": 1}\n{"a": 2}\n\n{"a": "x]"}\n',
+])
+def test_iter_json_records_streams_arrays_and_lines(text):
+    """Test that arrays and JSON Lines decode the same, even across tiny chunks."""
+    records = list(iter_json_records(io.StringIO(text), chunk_size=3))
+    
+    assert records == [(1, {"a": 1}), (2, {"a": 2}), (3, {"a": "x]"})]
+
+def test_iter_json_records_reads_in_chunks():
+    """Test that records are yielded before the whole file has been read."""
+    stream = io.StringIO("[" + ",".join(json.dumps({"n": i}) for i in range(1000)) + "]")
+    records = iter_json_records(stream, chunk_size=64)
+    
+    assert next(records) == (1, {"n": 0})
+    assert stream.tell() < 200
+
+@pytest.mark.parametrize("text", ['[{"a": 1}, {"a": 2}', '[{"a": 1}, {"a": ]'])
+def test_iter_json_records_rejects_broken_json(text):
+    """Test that truncated or malformed JSON is a format error."""
+    with pytest.raises(ImportFormatError):
+        list(iter_json_records(io.StringIO(text), chunk_size=4))
+
+def test_read_import_batches_csv(tmp_path):
+    """Test that CSV rows are validated in batches and invalid ones counted."""
+    lines = ["﻿Systolic,Diastolic,Heart Rate,DateTime,Description"]
+    lines += [f"{120 + i},80,70,2024-01-01 08:{i:02d},reading {i}" for i in range(5)]
+    lines.append("bad,80,70,2024-01-01 09:00,")
+    path = write(tmp_path, "readings.csv", "\n".join(lines) + "\n")
+    result = ImportResult()
+    
+    # Execute
+    batches = list(read_import_batches(path, "csv", 12345, result, batch_size=2))
+    
+    # Check
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][0] == (12345, 120, 80, 70, datetime(2024, 1, 1, 8, 0), "reading 0")
+    assert (result.imported, result.skipped) == (5, 1)
+    assert result.errors == [(7, "systolic is not a number: 'bad'")]
+
+def test_read_import_batches_limits_reported_errors(tmp_path):
+    """Test that only the first few invalid rows are listed."""
+    path = write(tmp_path, "readings.json",
+                 json.dumps([{"systolic": 1, "diastolic": 1}] * (MAX_REPORTED_ERRORS + 3)))
+    result = ImportResult()
+    
+    assert list(read_import_batches(path, "json", 1, result)) == [[]]
+    assert result.skipped == MAX_REPORTED_ERRORS + 3
+    assert len(result.errors) == MAX_REPORTED_ERRORS
+
+def test_read_import_batches_requires_csv_header(tmp_path):
+    """Test that a CSV without recognizable columns is a format error."""
+    path = write(tmp_path, "readings.csv", "120,80,2024-01-01 08:00\n")
+    
+    with pytest.raises(ImportFormatError, match="header row"):
+        list(read_import_batches(path, "csv", 1, ImportResult()))
+
+def test_read_import_batches_requires_utf8(tmp_path):
+    """Test that undecodable files are a format error."""
+    path = tmp_path / "readings.csv"
+    path.write_bytes(b"systolic,diastolic,datetime\n120,80,\xff\xfe\n")
+    
+    with pytest.raises(ImportFormatError, match="UTF-8"):
+        list(read_import_batches(str(path), "csv", 1, ImportResult()))
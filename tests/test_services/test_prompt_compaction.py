@@ -0,0 +1,213 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from models.reading_batch import ReadingBatch
+from models.database import Database
+from services.analysis_service import _prepare_analysis, analyze_readings
+from services import prompt_compaction
+from services.prompt_compaction import compact_aggregates, compact_readings, count_tokens
+from utils.cache import cache
+
+def make_history(count, start=datetime(2022, 1, 3, 8, 0), step=timedelta(hours=12),
+                 descriptions=("after coffee", None)):
+    """Build a batch of `count` readings and their descriptions, oldest first."""
+    rows = [(120 + i % 20, 80 + i % 10, 70 if i % 3 else None, start + i * step,
+             descriptions[i % len(descriptions)]) for i in range(count)]
+    return ReadingBatch.from_rows(rows), [row[4] for row in rows]
+
+def daily_totals(tmp_path, batch, descriptions):
+    """Store a history and return its Database.get_daily_aggregates() rows."""
+    db = Database(str(tmp_path / "aggregates.db"), pool_size=1)
+    db.add_readings([(1, int(s), int(d), h, when, note) for s, d, h, when, note in
+                     zip(batch.systolic, batch.diastolic, batch.heart_rate, batch.datetimes(),
+                         descriptions)])
+    days = db.get_daily_aggregates(1)
+    db.close()
+    return days
+
+def test_count_tokens_estimate_without_tiktoken():
+    """Test the length-based estimate used when tiktoken is not installed."""
+    with patch('services.prompt_compaction._encoding', return_value=None):
+        assert count_tokens("") == 0
+        assert count_tokens("abcd") == 1
+        assert count_tokens("abcde") == 2
+
+def test_encoding_falls_back_for_unknown_models_and_failed_downloads():
+    """Test that unknown models get the default encoding and a failed load the estimate."""
+    fake_tiktoken = MagicMock()
+    fake_tiktoken.encoding_for_model.side_effect = KeyError("model")
+    with patch('services.prompt_compaction.tiktoken', fake_tiktoken):
+        prompt_compaction._encoding.cache_clear()
+        assert prompt_compaction._encoding() is fake_tiktoken.get_encoding.return_value
+        fake_tiktoken.get_encoding.assert_called_once_with(prompt_compaction.DEFAULT_ENCODING)
+        
+        fake_tiktoken.get_encoding.side_effect = ConnectionError("offline")
+        prompt_compaction._encoding.cache_clear()
+        assert prompt_compaction._encoding() is None
+    prompt_compaction._encoding.cache_clear()
+
+def test_compact_keeps_recent_readings_raw():
+    """Test that the newest readings stay verbatim and older ones are averaged per day."""
+    # Setup
+    batch, descriptions = make_history(40)
+    
+    # Execute
+    text = compact_readings(batch, descriptions, budget=10_000, recent=5)
+    
+    # Check
+    assert "Most recent 5 readings:" in text
+    assert text.count("Systolic: ") == 5
+    assert "Older readings averaged per day:" in text
+    assert "2022-01-03: 2 readings, average 120/80" in text
+
+def test_compact_dedupes_descriptions():
+    """Test that a repeated description is listed once and referenced by number."""
+    batch, descriptions = make_history(30, descriptions=("After coffee", "after coffee ", "Took meds"))
+    
+    text = compact_readings(batch, descriptions, budget=10_000, recent=6)
+    
+    assert text.count("coffee") == 1
+    assert text.count("Took meds") == 1
+    assert "Notes referenced above:" in text
+    assert "Note: 1" in text
+
+def test_compact_coarsens_periods_to_fit_budget():
+    """Test that older readings move to weekly or monthly averages under a tight budget."""
+    batch, descriptions = make_history(2000)
+    
+    text = compact_readings(batch, descriptions, budget=1500, recent=20)
+    
+    assert count_tokens(text) <= 1500
+    assert "averaged per day" not in text
+    assert "averaged per week" in text or "averaged per month" in text
+
+def test_compact_drops_oldest_months_before_recent_readings():
+    """Test that old months are left out, as few as possible, before any recent reading."""
+    # Setup: twenty years of readings
+    batch, descriptions = make_history(30_000, step=timedelta(hours=6))
+    
+    # Execute
+    text = compact_readings(batch, descriptions, budget=6000, recent=50)
+    
+    # Check
+    assert count_tokens(text) <= 6000
+    assert count_tokens(text) > 5500  # the budget is used rather than halved away
+    assert "are left out here" in text
+    assert "Most recent 50 readings:" in text
+
+def test_compact_trims_recent_readings_as_last_resort():
+    """Test that fewer recent readings are kept only once all older months are gone."""
+    batch, descriptions = make_history(2000, step=timedelta(days=2))
+    
+    text = compact_readings(batch, descriptions, budget=150, recent=20)
+    
+    assert count_tokens(text) <= 150
+    assert "are left out here" in text
+    assert "averaged per" not in text
+    assert "Most recent " in text
+
+def test_compact_caps_notes_per_line():
+    """Test that a period with many distinct notes references only the first few."""
+    batch, descriptions = make_history(60, descriptions=[f"note {i}" for i in range(60)])
+    
+    text = compact_readings(batch, descriptions, budget=400, recent=1)
+    
+    assert "averaged per week" in text
+    assert "Week of 2022-01-03: 14 readings" in text
+    assert "notes 1, 2, 3, 4, 5 and 9 others" in text
+    assert "note 10" not in text  # unreferenced notes are not listed
+
+def test_compact_handles_unsorted_input():
+    """Test that readings are ordered by time before the newest are picked."""
+    batch, descriptions = make_history(10)
+    rows = list(zip(batch.systolic, batch.diastolic, batch.heart_rate, batch.datetimes(), descriptions))
+    shuffled = ReadingBatch.from_rows(rows[::-1])
+    
+    text = compact_readings(shuffled, descriptions[::-1], budget=10_000, recent=1)
+    
+    assert f"Date: {rows[-1][3]}" in text
+
+@patch('services.analysis_service.client')
+def test_analysis_prompt_is_compacted_over_budget(mock_client, mock_openai_client):
+    """Test that analyze_readings compacts a prompt that exceeds the budget."""
+    mock_client.chat.completions.create = mock_openai_client.chat.completions.create
+    cache.clear()
+    batch, descriptions = make_history(500)
+    rows = list(zip(batch.systolic, batch.diastolic, batch.heart_rate, batch.datetimes(), descriptions))
+    
+    with patch('services.analysis_service.PROMPT_TOKEN_BUDGET', 2000):
+        analyze_readings(rows, 4242)
+    
+    prompt = mock_client.chat.completions.create.call_args[1]['messages'][1]['content']
+    assert "Older readings averaged per" in prompt
+    assert "Summary statistics" in prompt
+    assert "Number of readings: 500" in prompt
+
+def test_analysis_stops_formatting_readings_over_budget():
+    """Test that readings are only formatted until the prompt is known to be over budget."""
+    batch, descriptions = make_history(500)
+    rows = list(zip(batch.systolic, batch.diastolic, batch.heart_rate, batch.datetimes(), descriptions))
+    
+    with patch('services.analysis_service.PROMPT_TOKEN_BUDGET', 2000), \
+         patch('services.analysis_service.count_tokens', wraps=count_tokens) as mock_count:
+        _, prompt = _prepare_analysis(rows, 4242, data_version=1)
+    
+    assert mock_count.call_count < 100
+    assert "Older readings averaged per" in prompt
+    assert "Number of readings: 500" in prompt
+
+def test_analysis_skips_formatting_with_daily_aggregates(tmp_path):
+    """Test that no reading is formatted when the prompt is built from daily totals."""
+    batch, descriptions = make_history(100)
+    days = daily_totals(tmp_path, batch, descriptions)
+    rows = list(zip(batch.systolic, batch.diastolic, batch.heart_rate, batch.datetimes(), descriptions))
+    
+    with patch('services.analysis_service.count_tokens') as mock_count:
+        _prepare_analysis(rows[-5:], 4242, data_version=3, daily_aggregates=days)
+    
+    mock_count.assert_not_called()
+
+def test_compact_aggregates_before_recent_readings(tmp_path):
+    """Test that days before the newest readings are described from their totals."""
+    # Setup
+    batch, descriptions = make_history(40)
+    days = daily_totals(tmp_path, batch, descriptions)
+    recent, recent_descriptions = make_history(3, start=datetime(2022, 1, 22, 8, 0))
+    
+    # Execute
+    text = compact_aggregates(days, recent, recent_descriptions, budget=10_000)
+    
+    # Check
+    assert "Older readings averaged per day:" in text
+    assert "2022-01-03: 2 readings, average 120/80" in text
+    assert "2022-01-22" not in text.split("Most recent")[0]  # covered by the raw readings
+    assert "Most recent 3 readings:" in text
+    assert text.count("Systolic: ") == 3
+
+def test_compact_aggregates_coarsens_and_drops_to_fit(tmp_path):
+    """Test that long histories of daily totals move to coarser periods, then lose old days."""
+    batch, descriptions = make_history(2000, step=timedelta(days=1))
+    days = daily_totals(tmp_path, batch, descriptions)
+    recent, recent_descriptions = make_history(2, start=datetime(2030, 1, 1, 8, 0))
+    
+    text = compact_aggregates(days, recent, recent_descriptions, budget=1000)
+    assert count_tokens(text) <= 1000
+    assert "averaged per day" not in text
+    
+    text = compact_aggregates(days, recent, recent_descriptions, budget=250)
+    assert count_tokens(text) <= 250
+    assert "are left out here" in text
+    assert "Most recent 2 readings:" in text
+
+def test_analysis_prompt_from_daily_aggregates(tmp_path):
+    """Test that the prompt and statistics come from the totals when they are given."""
+    batch, descriptions = make_history(100)
+    days = daily_totals(tmp_path, batch, descriptions)
+    rows = list(zip(batch.systolic, batch.diastolic, batch.heart_rate, batch.datetimes(), descriptions))
+    
+    cache_key, prompt = _prepare_analysis(rows[-5:], 4242, data_version=3, daily_aggregates=days)
+    
+    assert cache_key == (4242, None, None, None, 3)
+    assert "Older readings averaged per day:" in prompt
+    assert "Most recent 5 readings:" in prompt
+    assert "Number of readings: 100" in prompt
+    assert "percentile" not in prompt
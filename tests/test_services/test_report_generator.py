@@ -1,8 +1,10 @@
 import pytest
 from unittest.mock import patch, MagicMock, mock_open
 import os
-from datetime import date
-from services.report_generator import ReportGenerator, generate_pdf
+from datetime import date, datetime
+from models.database import Database
+from services.report_generator import (ReportGenerator, generate_pdf, render_report,
+                                       render_report_from_db)
 
 @patch('services.report_generator.canvas.Canvas')
 def test_report_generator_init(mock_canvas):
@@ -99,13 +101,13 @@ def test_report_generator_with_filters(mock_canvas):
     assert filename == '12345_blood_pressure_report.pdf'
 
 @patch('services.report_generator.ReportGenerator')
-@patch('services.report_generator.db')
+@patch('models.database.db')
 def test_generate_pdf_function(mock_db, mock_generator):
     """Test the generate_pdf wrapper function."""
     # Setup mock database and generator
-    mock_db.get_readings.return_value = [
+    mock_db.iter_readings.side_effect = lambda *args: iter([
         (120, 80, 70, "2023-01-01 12:00:00", "Normal reading")
-    ]
+    ])
     mock_instance = MagicMock()
     mock_generator.return_value = mock_instance
     mock_instance.generate.return_value = "test_report.pdf"
@@ -117,8 +119,9 @@ def test_generate_pdf_function(mock_db, mock_generator):
     regex_pattern = "Normal"
     filename = generate_pdf(user_id, start_date=start_date, end_date=end_date, regex_pattern=regex_pattern)
     
-    # Check that database was queried
-    mock_db.get_readings.assert_called_once_with(user_id, start_date, end_date, regex_pattern)
+    # Check that database was streamed once for the analysis and once for the report
+    assert mock_db.iter_readings.call_count == 2
+    mock_db.iter_readings.assert_called_with(user_id, start_date, end_date, regex_pattern)
     
     # Check that generator was created with correct arguments
     mock_generator.assert_called_once()
@@ -129,4 +132,73 @@ def test_generate_pdf_function(mock_db, mock_generator):
     mock_instance.generate.assert_called_once_with(start_date, end_date, regex_pattern)
     
     # Check that filename was returned
-    assert filename == "test_report.pdf"
\ No newline at end of file
+    assert filename == "test_report.pdf"
+
+@patch('services.report_generator.canvas.Canvas')
+def test_report_generator_consumes_stream(mock_canvas):
+    """Test that the report is generated from a one-shot iterator."""
+    # Mock canvas and PDF methods
+    mock_pdf = MagicMock()
+    mock_canvas.return_value = mock_pdf
+    
+    # A generator can only be consumed once
+    readings = (r for r in [
+        (120, 80, 70, "2023-01-01 12:00:00", "Normal reading"),
+        (140, 90, None, "2023-01-02 12:00:00", "Elevated reading")
+    ])
+    
+    generator = ReportGenerator(12345, readings, "Test advice")
+    generator.generate()
+    
+    # Averages are computed from the single pass; heart rate skips missing values
+    drawn = [call[0][2] for call in mock_pdf.drawString.call_args_list]
+    assert any("Systolic: 130.0, Diastolic: 85.0, Heart Rate: 70.0" in text for text in drawn)
+    mock_pdf.save.assert_called_once()
+
+@patch('services.report_generator.canvas.Canvas')
+def test_report_generator_empty_stream(mock_canvas):
+    """Test that an empty iterator produces the no-readings report."""
+    mock_pdf = MagicMock()
+    mock_canvas.return_value = mock_pdf
+    
+    generator = ReportGenerator(12345, iter([]), "Test advice")
+    generator.generate()
+    
+    mock_pdf.drawString.assert_called_with(40, 720, "No blood pressure readings found matching your criteria.")
+
+def test_report_generator_in_memory():
+    """Test rendering a real PDF into memory without writing a file."""
+    readings = [
+        (120, 80, 70, "2023-01-01 12:00:00", "Normal reading"),
+        (130, 85, 75, "2023-01-02 12:00:00", "Elevated reading")
+    ]
+    
+    pdf_bytes = ReportGenerator(12345, readings, "Test advice", in_memory=True).generate()
+    
+    assert isinstance(pdf_bytes, bytes)
+    assert pdf_bytes.startswith(b'%PDF')
+    assert not os.path.exists('12345_blood_pressure_report.pdf')
+
+def test_render_report_in_memory():
+    """Test the worker entry point in memory mode."""
+    pdf_bytes = render_report(12345, [], "Test advice", in_memory=True)
+    
+    assert pdf_bytes.startswith(b'%PDF')
+
+@patch('services.report_generator.render_report', return_value=b'%PDF test content')
+def test_render_report_from_db_streams_readings(mock_render, tmp_path):
+    """Test that the worker entry point reads the filtered readings itself."""
+    db_path = str(tmp_path / "reports.db")
+    db = Database(db_path)
+    db.add_reading(12345, 120, 80, 70, datetime(2023, 1, 1, 8), "morning")
+    db.add_reading(12345, 130, 85, 75, datetime(2023, 1, 2, 8), "evening")
+    db.close()
+    
+    pdf_bytes = render_report_from_db(12345, "Test advice", db_path, date(2023, 1, 2),
+                                      date(2023, 1, 2), in_memory=True)
+    
+    assert pdf_bytes == b'%PDF test content'
+    args = mock_render.call_args[0]
+    assert [reading[0] for reading in args[1]] == [130]
+    assert args[2:] == ("Test advice", date(2023, 1, 2), date(2023, 1, 2), None)
+    assert mock_render.call_args[1] == {"in_memory": True}
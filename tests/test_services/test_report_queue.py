@@ -0,0 +1,96 @@
+import pytest
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.report_queue import ReportQueue, ReportQueueFull, ReportCancelled
+
+@pytest.fixture
+def thread_queue():
+    """A queue backed by threads, so tests can block workers with events."""
+    queue = ReportQueue(workers=2, max_pending=2, executor_factory=ThreadPoolExecutor)
+    yield queue
+    queue.shutdown()
+
+@pytest.mark.asyncio
+async def test_job_runs_on_worker_process():
+    """Test that the default queue renders in a separate process."""
+    queue = ReportQueue(workers=1, max_pending=1)
+    try:
+        worker_pid = await queue.submit(12345, os.getpid)
+    finally:
+        queue.shutdown()
+    
+    assert worker_pid != os.getpid()
+
+@pytest.mark.asyncio
+async def test_jobs_run_in_parallel(thread_queue):
+    """Test that jobs up to the worker count start immediately."""
+    barrier = threading.Barrier(2, timeout=5)
+    
+    first = thread_queue.submit(1, barrier.wait)
+    second = thread_queue.submit(2, barrier.wait)
+    
+    # Both jobs are rendering, so neither has a queue position
+    assert thread_queue.position(first) == 0
+    assert thread_queue.position(second) == 0
+    await asyncio.gather(first, second)
+
+@pytest.mark.asyncio
+async def test_queue_positions_and_backpressure(thread_queue):
+    """Test FIFO positions and the bounded queue."""
+    release = threading.Event()
+    running = [thread_queue.submit(user_id, release.wait, 5) for user_id in (1, 2)]
+    waiting = [thread_queue.submit(user_id, release.wait, 5) for user_id in (3, 4)]
+    
+    assert [thread_queue.position(job) for job in waiting] == [1, 2]
+    with pytest.raises(ReportQueueFull):
+        thread_queue.submit(5, release.wait, 5)
+    
+    release.set()
+    await asyncio.gather(*running, *waiting)
+    assert thread_queue.position(waiting[1]) == 0
+
+@pytest.mark.asyncio
+async def test_cancel_waiting_job(thread_queue):
+    """Test that cancelling a waiting job skips it and moves the others up."""
+    release = threading.Event()
+    for user_id in (1, 2):
+        thread_queue.submit(user_id, release.wait, 5)
+    cancelled = thread_queue.submit(3, release.wait, 5)
+    behind = thread_queue.submit(4, release.wait, 5)
+    
+    assert thread_queue.cancel(3) == 1
+    assert thread_queue.position(behind) == 1
+    with pytest.raises(ReportCancelled):
+        await cancelled
+    release.set()
+    await behind
+
+@pytest.mark.asyncio
+async def test_cancel_running_job_discards_result(thread_queue):
+    """Test that a rendering job can be cancelled and its worker is freed afterwards."""
+    release = threading.Event()
+    job = thread_queue.submit(1, release.wait, 5)
+    
+    assert thread_queue.cancel(1) == 1
+    with pytest.raises(ReportCancelled):
+        await job
+    
+    release.set()
+    # The worker slot is reused once the abandoned job finishes
+    assert await thread_queue.submit(1, lambda: "next") == "next"
+
+@pytest.mark.asyncio
+async def test_cancel_unknown_user(thread_queue):
+    """Test cancelling when a user has no reports."""
+    assert thread_queue.cancel(12345) == 0
+
+@pytest.mark.asyncio
+async def test_job_exception_propagates(thread_queue):
+    """Test that errors raised while rendering reach the caller."""
+    def fail():
+        raise RuntimeError("render failed")
+    
+    with pytest.raises(RuntimeError):
+        await thread_queue.submit(1, fail)
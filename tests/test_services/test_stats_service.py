@@ -0,0 +1,127 @@
+import pytest
+import numpy as np
+from datetime import datetime
+from models.reading import Reading
+from models.reading_batch import ReadingBatch
+from models.database import Database
+from services.stats_service import (CATEGORIES, aggregate_stats, categorize, compute_stats,
+                                    format_categories, format_stats)
+
+ROWS = [
+    (118, 78, 70, datetime(2023, 1, 1, 8, 0), "Morning"),
+    (142, 92, None, datetime(2023, 1, 1, 20, 0), "Evening"),
+    (125, 75, 66, datetime(2023, 1, 2, 7, 30), None),
+    (135, 85, 72, datetime(2023, 1, 2, 19, 0), None),
+    (185, 100, 90, datetime(2023, 1, 3, 9, 0), "Headache"),
+]
+
+@pytest.fixture
+def stats():
+    """Statistics for the sample rows."""
+    return compute_stats(ReadingBatch.from_rows(ROWS))
+
+def test_compute_stats_columns(stats):
+    """Test mean, min, max, std and percentiles of the pressure columns."""
+    systolic = np.array([118, 142, 125, 135, 185])
+    
+    assert stats["count"] == 5
+    assert stats["systolic"]["mean"] == pytest.approx(systolic.mean())
+    assert stats["systolic"]["min"] == 118
+    assert stats["systolic"]["max"] == 185
+    assert stats["systolic"]["std"] == pytest.approx(systolic.std())
+    assert stats["systolic"]["median"] == pytest.approx(135)
+    assert stats["diastolic"]["p25"] == pytest.approx(78)
+
+def test_compute_stats_heart_rate_skips_missing(stats):
+    """Test that missing heart rates are excluded."""
+    assert stats["heart_rate"]["mean"] == pytest.approx((70 + 66 + 72 + 90) / 4)
+    assert stats["heart_rate"]["min"] == 66
+
+def test_compute_stats_morning_evening_split(stats):
+    """Test the split between readings before and after noon."""
+    assert stats["morning"]["count"] == 3
+    assert stats["evening"]["count"] == 2
+    assert stats["evening"]["systolic_mean"] == pytest.approx((142 + 135) / 2)
+
+def test_compute_stats_days(stats):
+    """Test that the number of distinct days is counted."""
+    assert stats["days"] == 3
+
+def test_compute_stats_days_unsorted_input():
+    """Test that the day count does not depend on input order."""
+    batch = ReadingBatch.from_rows(list(reversed(ROWS)))
+    
+    assert compute_stats(batch)["days"] == 3
+
+def test_compute_stats_categories(stats):
+    """Test that each reading is counted once, in its most severe category."""
+    assert stats["categories"] == {
+        "normal": 1, "elevated": 1, "stage1": 1, "stage2": 1, "crisis": 1
+    }
+    assert sum(stats["categories"].values()) == stats["count"]
+
+def test_categorize_matches_reading_properties():
+    """Test the vectorized categories against the Reading model's definitions."""
+    systolic = np.arange(90, 200, 3)
+    diastolic = np.arange(50, 160, 3)[:len(systolic)]
+    
+    categories = categorize(systolic, diastolic)
+    
+    for s, d, index in zip(systolic, diastolic, categories):
+        reading = Reading(systolic=int(s), diastolic=int(d))
+        expected = ("crisis" if reading.is_crisis else "stage2" if reading.is_stage2
+                    else "stage1" if reading.is_stage1 else "elevated" if reading.is_elevated
+                    else "normal")
+        assert CATEGORIES[index] == expected
+
+def test_compute_stats_empty_batch():
+    """Test that an empty batch has no statistics."""
+    assert compute_stats(ReadingBatch()) is None
+
+def test_compute_stats_without_heart_rate():
+    """Test statistics when no reading has a heart rate."""
+    stats = compute_stats(ReadingBatch.from_rows([(120, 80, None, datetime(2023, 1, 1, 8, 0), None)]))
+    
+    assert stats["heart_rate"] is None
+    assert "Heart Rate: N/A" in format_stats(stats)
+
+def test_format_stats(stats):
+    """Test the plain text rendering used in the AI prompt."""
+    text = format_stats(stats)
+    
+    assert "Number of readings: 5 (2023-01-01 to 2023-01-03, 3 days)" in text
+    assert "Systolic: mean 141.0, min 118, max 185" in text
+    assert "Morning (before 12:00): 3 readings" in text
+    assert format_categories(stats) in text
+    assert format_categories(stats) == "Normal: 1, Elevated: 1, Stage 1: 1, Stage 2: 1, Crisis: 1"
+
+def test_aggregate_stats_match_compute_stats(stats, tmp_path):
+    """Test that statistics from daily totals agree with those from the readings."""
+    # Setup
+    db = Database(str(tmp_path / "stats.db"), pool_size=1)
+    db.add_readings([(1, *row) for row in ROWS])
+    
+    # Execute
+    totals = aggregate_stats(db.get_daily_aggregates(1))
+    db.close()
+    
+    # Check
+    for key in ("count", "first", "last", "categories"):
+        assert totals[key] == (stats[key].date() if key in ("first", "last") else stats[key])
+    for key in ("systolic", "diastolic", "heart_rate"):
+        assert totals[key]["mean"] == pytest.approx(stats[key]["mean"])
+        assert (totals[key]["min"], totals[key]["max"]) == (stats[key]["min"], stats[key]["max"])
+    assert totals["days"] == stats["days"]
+    assert aggregate_stats([]) is None
+
+def test_format_stats_without_percentiles(tmp_path):
+    """Test that statistics from daily totals format without the per-reading figures."""
+    db = Database(str(tmp_path / "stats.db"), pool_size=1)
+    db.add_readings([(1, *row) for row in ROWS])
+    text = format_stats(aggregate_stats(db.get_daily_aggregates(1)))
+    db.close()
+    
+    assert "Number of readings: 5 (2023-01-01 to 2023-01-03, 3 days)" in text
+    assert "Systolic: mean 141.0, min 118, max 185\n" in text
+    assert "percentile" not in text
+    assert "Morning" not in text
@@ -0,0 +1,183 @@
+import pytest
+import pytest_asyncio
+import asyncio
+from unittest.mock import AsyncMock, patch
+from aiohttp.test_utils import TestClient, TestServer
+from telegram import User
+from telegram.ext import Application, CommandHandler, ExtBot
+from services.webhook_server import create_webhook_app, serve_webhook, SECRET_HEADER
+
+def make_update(update_id, text, user_id=12345):
+    """Synthetic Update JSON as Telegram would POST it."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0,
+                          "length": len(text.split()[0])}],
+        },
+    }
+
+async def fake_get_me(self, *args, **kwargs):
+    # Application.initialize() calls getMe; answer it without the network
+    self._bot_user = User(id=1, first_name="Test", is_bot=True, username="test_bot")
+    return self._bot_user
+
+@pytest_asyncio.fixture
+async def running_app():
+    """A started Application with a recording /echo command and no network access."""
+    application = (Application.builder().token("123:TEST").updater(None)
+                   .concurrent_updates(4).build())
+    application.received = []
+    
+    async def echo(update, context):
+        application.received.append(update.message.text)
+    
+    application.add_handler(CommandHandler("echo", echo))
+    with patch.object(ExtBot, "get_me", fake_get_me):
+        async with application:
+            await application.start()
+            yield application
+            await application.stop()
+
+@pytest_asyncio.fixture
+async def client(running_app):
+    test_client = TestClient(TestServer(create_webhook_app(running_app, "/telegram", "s3cret")))
+    await test_client.start_server()
+    yield test_client
+    await test_client.close()
+
+async def wait_for(condition, timeout=2):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Condition not met in time")
+
+@pytest.mark.asyncio
+async def test_webhook_dispatches_posted_update(client, running_app):
+    """Test that a POSTed update reaches the command handler."""
+    # Execute
+    response = await client.post("/telegram", json=make_update(1, "/echo hello"),
+                                 headers={SECRET_HEADER: "s3cret"})
+    
+    # Check
+    assert response.status == 200
+    await wait_for(lambda: running_app.received)
+    assert running_app.received == ["/echo hello"]
+
+@pytest.mark.asyncio
+async def test_webhook_processes_updates_concurrently(client, running_app):
+    """Test that a slow handler does not hold up the next update."""
+    release = asyncio.Event()
+    started = []
+    
+    async def slow(update, context):
+        started.append(update.update_id)
+        await release.wait()
+    
+    running_app.add_handler(CommandHandler("slow", slow))
+    for update_id in (1, 2, 3):
+        response = await client.post("/telegram", json=make_update(update_id, "/slow"),
+                                     headers={SECRET_HEADER: "s3cret"})
+        assert response.status == 200
+    
+    # All three are running at once even though none has finished
+    await wait_for(lambda: len(started) == 3)
+    release.set()
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_wrong_secret(client, running_app):
+    """Test that requests without Telegram's secret token are refused."""
+    response = await client.post("/telegram", json=make_update(1, "/echo hi"),
+                                 headers={SECRET_HEADER: "wrong"})
+    
+    assert response.status == 403
+    assert running_app.update_queue.qsize() == 0
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_invalid_body(client):
+    """Test that a body that is not JSON is a client error."""
+    response = await client.post("/telegram", data=b"not json",
+                                 headers={SECRET_HEADER: "s3cret"})
+    
+    assert response.status == 400
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_bodies_that_are_not_updates(client, running_app):
+    """Test that JSON other than an update object is a client error, not a crash."""
+    for body in ([1], "text", {"update_id": "x", "message": 5}):
+        response = await client.post("/telegram", json=body, headers={SECRET_HEADER: "s3cret"})
+        assert response.status == 400
+    assert running_app.update_queue.qsize() == 0
+
+def test_webhook_app_requires_secret(running_app):
+    """Test that the webhook cannot be served without a secret token."""
+    with pytest.raises(ValueError):
+        create_webhook_app(running_app, "/telegram", None)
+
+@pytest.mark.asyncio
+async def test_serve_webhook_refuses_to_start_without_secret():
+    """Test that an unregistered webhook without a secret is refused before listening."""
+    application = Application.builder().token("123:TEST").updater(None).build()
+    
+    with pytest.raises(ValueError, match="WEBHOOK_SECRET"):
+        await serve_webhook(application, "127.0.0.1", 0, "/telegram", None, None,
+                            asyncio.Event())
+    assert not application.running
+
+@pytest.mark.asyncio
+async def test_serve_webhook_registers_generated_secret(unused_tcp_port):
+    """Test that a webhook registered at startup gets a random secret when none is set."""
+    application = Application.builder().token("123:TEST").updater(None).build()
+    stop = asyncio.Event()
+    
+    with patch.object(ExtBot, "get_me", fake_get_me), \
+         patch.object(ExtBot, "set_webhook", new_callable=AsyncMock) as set_webhook:
+        set_webhook.side_effect = lambda **kwargs: stop.set()
+        await asyncio.wait_for(serve_webhook(application, "127.0.0.1", unused_tcp_port,
+                                             "/telegram", "https://bot.example/", None, stop), 5)
+    
+    kwargs = set_webhook.call_args.kwargs
+    assert kwargs["url"] == "https://bot.example/telegram"
+    assert len(kwargs["secret_token"]) >= 32
+
+@pytest.mark.asyncio
+async def test_health_endpoint(client, running_app):
+    """Test that /healthz reports a running application and 503 once it stops."""
+    response = await client.get("/healthz")
+    assert response.status == 200
+    assert (await response.json())["status"] == "ok"
+    
+    await running_app.stop()
+    response = await client.get("/healthz")
+    assert response.status == 503
+    await running_app.start()
+
+@pytest.mark.asyncio
+async def test_serve_webhook_listens_until_stopped(unused_tcp_port):
+    """Test the full server on a real port, stopped through its stop event."""
+    import aiohttp
+    application = Application.builder().token("123:TEST").updater(None).build()
+    stop = asyncio.Event()
+    
+    with patch.object(ExtBot, "get_me", fake_get_me):
+        server = asyncio.create_task(serve_webhook(application, "127.0.0.1", unused_tcp_port,
+                                                   "/telegram", None, "s3cret", stop))
+        async with aiohttp.ClientSession() as session:
+            for _ in range(200):
+                try:
+                    async with session.get(f"http://127.0.0.1:{unused_tcp_port}/healthz") as response:
+                        status = response.status
+                        break
+                except aiohttp.ClientConnectionError:
+                    await asyncio.sleep(0.01)
+        stop.set()
+        await asyncio.wait_for(server, 5)
+    
+    assert status == 200
+    assert not application.running
@@ -1,17 +1,31 @@
 import pytest
-from unittest.mock import patch
-from utils.cache import Cache
-from datetime import datetime, timedelta
+import sqlite3
+import threading
+from unittest.mock import MagicMock
+from datetime import datetime
+from models.database import Database
+from utils.cache import Cache, SQLiteCacheBackend
 
-@patch('utils.cache.datetime')
-def test_cache_set_get(mock_datetime):
-    """Test setting and getting values from the cache."""
-    # Setup mock datetime
-    now = datetime(2023, 1, 1, 12, 0)
-    mock_datetime.now.return_value = now
+class FakeClock:
+    """Monotonic clock that only moves when told to."""
+    
+    def __init__(self, now=1000.0):
+        self.now = now
     
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def test_cache_set_get(clock):
+    """Test setting and getting values from the cache."""
     # Create a cache
-    cache = Cache()
+    cache = Cache(clock=clock)
     
     # Set a value
     cache.set('test_key', 'test_value')
@@ -21,18 +35,13 @@ def test_cache_set_get(mock_datetime):
     
     # Verify internal state
     assert 'test_key' in cache._cache
-    assert cache._cache['test_key'][0] == now
+    assert cache._cache['test_key'][0] == clock.now
     assert cache._cache['test_key'][1] == 'test_value'
 
-@patch('utils.cache.datetime')
-def test_cache_expiry(mock_datetime):
+def test_cache_expiry(clock):
     """Test that cache entries expire correctly."""
-    # Setup mock datetime for initial set
-    now = datetime(2023, 1, 1, 12, 0)
-    mock_datetime.now.return_value = now
-    
     # Create a cache with a short expiry time
-    cache = Cache(expiry_seconds=10)
+    cache = Cache(expiry_seconds=10, clock=clock)
     
     # Set a value
     cache.set('test_key', 'test_value')
@@ -41,15 +50,13 @@ def test_cache_expiry(mock_datetime):
     assert cache.get('test_key') == 'test_value'
     
     # Advance time by less than expiry
-    later = now + timedelta(seconds=5)
-    mock_datetime.now.return_value = later
+    clock.advance(5)
     
     # Verify value is still available
     assert cache.get('test_key') == 'test_value'
     
     # Advance time beyond expiry
-    expired = now + timedelta(seconds=15)
-    mock_datetime.now.return_value = expired
+    clock.advance(10)
     
     # Verify value is no longer available
     assert cache.get('test_key') is None
@@ -62,15 +69,10 @@ def test_cache_nonexistent_key():
     cache = Cache()
     assert cache.get('nonexistent_key') is None
 
-@patch('utils.cache.datetime')
-def test_cache_clear(mock_datetime):
+def test_cache_clear(clock):
     """Test clearing the cache."""
-    # Setup mock datetime
-    now = datetime(2023, 1, 1, 12, 0)
-    mock_datetime.now.return_value = now
-    
     # Create a cache
-    cache = Cache()
+    cache = Cache(clock=clock)
     
     # Set multiple values
     cache.set('key1', 'value1')
@@ -89,24 +91,19 @@ def test_cache_clear(mock_datetime):
     
     # Verify internal state
     assert not cache._cache
+    assert cache.nbytes == 0
 
-@patch('utils.cache.datetime')
-def test_cache_prune(mock_datetime):
+def test_cache_prune(clock):
     """Test pruning expired entries from the cache."""
-    # Setup mock datetime for initial sets
-    now = datetime(2023, 1, 1, 12, 0)
-    mock_datetime.now.return_value = now
-    
     # Create a cache with a short expiry time
-    cache = Cache(expiry_seconds=10)
+    cache = Cache(expiry_seconds=10, clock=clock)
     
     # Set multiple values
     cache.set('key1', 'value1')
     cache.set('key2', 'value2')
     
     # Advance time for some entries to expire
-    later = now + timedelta(seconds=15)
-    mock_datetime.now.return_value = later
+    clock.advance(15)
     
     # Set another value
     cache.set('key3', 'value3')
@@ -114,12 +111,177 @@ def test_cache_prune(mock_datetime):
     # Prune the cache
     cache.prune()
     
+    # Verify internal state
+    assert 'key1' not in cache._cache
+    assert 'key2' not in cache._cache
+    assert 'key3' in cache._cache
+    
     # Verify expired entries are removed
     assert cache.get('key1') is None
     assert cache.get('key2') is None
     assert cache.get('key3') == 'value3'
+
+def test_cache_evicts_least_recently_used(clock):
+    """Test that the entry limit evicts the least recently used entry."""
+    cache = Cache(max_entries=2, clock=clock)
+    
+    cache.set('key1', 'value1')
+    cache.set('key2', 'value2')
+    
+    # Reading key1 makes key2 the least recently used
+    assert cache.get('key1') == 'value1'
+    cache.set('key3', 'value3')
+    
+    assert cache.get('key2') is None
+    assert cache.get('key1') == 'value1'
+    assert cache.get('key3') == 'value3'
+    assert len(cache) == 2
+
+def test_cache_respects_byte_budget(clock):
+    """Test that the byte budget evicts old entries to make room."""
+    value = 'x' * 1000
+    cache = Cache(max_bytes=2500, clock=clock)
     
-    # Verify internal state
+    cache.set('key1', value)
+    cache.set('key2', value)
+    cache.set('key3', value)
+    
+    assert cache.get('key1') is None
+    assert cache.get('key3') == value
+    assert cache.nbytes <= 2500
+
+def test_cache_skips_values_over_budget(clock):
+    """Test that a value larger than the whole budget is not cached."""
+    cache = Cache(max_bytes=100, clock=clock)
+    cache.set('small', 'ok')
+    
+    cache.set('huge', 'x' * 1000)
+    
+    assert cache.get('huge') is None
+    assert cache.get('small') == 'ok'
+
+def test_cache_overwrite_updates_size(clock):
+    """Test that replacing a value keeps the byte count accurate."""
+    cache = Cache(clock=clock)
+    
+    cache.set('key', 'x' * 1000)
+    cache.set('key', 'y')
+    
+    assert len(cache) == 1
+    assert cache.nbytes < 1000
+
+def test_cache_sweeps_expired_entries_periodically(clock):
+    """Test that expired entries are swept without an explicit prune()."""
+    cache = Cache(expiry_seconds=10, sweep_interval=30, clock=clock)
+    cache.set('key1', 'value1')
+    cache.set('key2', 'value2')
+    
+    # Past expiry but before the next sweep, the entries are still held
+    clock.advance(15)
+    cache.set('key3', 'value3')
+    assert 'key1' in cache._cache
+    
+    # The first operation after the sweep interval drops them
+    clock.advance(20)
+    cache.get('other')
     assert 'key1' not in cache._cache
     assert 'key2' not in cache._cache
-    assert 'key3' in cache._cache
\ No newline at end of file
+
+@pytest.fixture
+def backend_db(tmp_path):
+    db = Database(str(tmp_path / "cache.db"))
+    yield db
+    db.close()
+
+def test_cache_persists_and_warms_across_instances(clock, backend_db):
+    """Test that advice written by one cache is loaded by a fresh one."""
+    wall = FakeClock(now=1_700_000_000.0)
+    key = (12345, "2023-01-01", None, None, datetime(2023, 1, 3, 12, 0))
+    
+    # Execute
+    first = Cache(expiry_seconds=100, clock=clock, backend=SQLiteCacheBackend(backend_db, clock=wall))
+    first.set(key, "Stored advice")
+    
+    wall.advance(40)
+    restarted = Cache(expiry_seconds=100, clock=FakeClock(now=5.0),
+                      backend=SQLiteCacheBackend(backend_db, clock=wall))
+    loaded = restarted.warm()
+    
+    # Check
+    assert loaded == 1
+    assert restarted.get(key) == "Stored advice"
+    
+    # The warmed entry keeps only its remaining 60 seconds
+    restarted._clock.advance(59)
+    assert restarted.get(key) == "Stored advice"
+    restarted._clock.advance(2)
+    assert restarted.get(key) is None
+
+def test_cache_warm_skips_expired_entries(clock, backend_db):
+    """Test that expired persisted entries are deleted instead of loaded."""
+    wall = FakeClock(now=1_700_000_000.0)
+    backend = SQLiteCacheBackend(backend_db, clock=wall)
+    Cache(expiry_seconds=10, clock=clock, backend=backend).set((1, None), "old")
+    
+    wall.advance(11)
+    restarted = Cache(expiry_seconds=10, clock=clock, backend=backend)
+    
+    assert restarted.warm() == 0
+    assert backend_db.get_cache_entries(0, 10) == []
+
+def test_cache_warm_respects_entry_limit(clock, backend_db):
+    """Test that warming loads only the newest entries that fit."""
+    wall = FakeClock(now=1_700_000_000.0)
+    backend = SQLiteCacheBackend(backend_db, clock=wall)
+    writer = Cache(clock=clock, backend=backend)
+    for i in range(3):
+        writer.set((i,), f"advice {i}")
+        wall.advance(1)
+    
+    restarted = Cache(max_entries=2, clock=clock, backend=backend)
+    
+    assert restarted.warm() == 2
+    assert restarted.get((0,)) is None
+    assert restarted.get((2,)) == "advice 2"
+
+def test_cache_keeps_memory_copy_when_backend_fails(clock):
+    """Test that a failing backend does not break set()/get()."""
+    backend = MagicMock()
+    backend.encode_key.side_effect = SQLiteCacheBackend.encode_key
+    backend.save.side_effect = sqlite3.OperationalError("database is locked")
+    cache = Cache(clock=clock, backend=backend)
+    
+    cache.set((1, None), "advice")
+    
+    assert cache.get((1, None)) == "advice"
+
+@pytest.mark.asyncio
+async def test_cache_set_async_persists_off_the_event_loop(clock):
+    """Test that set_async() keeps the backend write off the event loop thread."""
+    backend = MagicMock()
+    backend.encode_key.side_effect = SQLiteCacheBackend.encode_key
+    threads = []
+    backend.save.side_effect = lambda *args: threads.append(threading.current_thread())
+    cache = Cache(clock=clock, backend=backend)
+    
+    await cache.set_async((1, None), "advice")
+    
+    assert cache.get((1, None)) == "advice"
+    backend.save.assert_called_once_with('[1, null]', "advice", cache.expiry_seconds)
+    assert threads and threads[0] is not threading.current_thread()
+
+def test_cache_sweep_purges_expired_persisted_entries(clock, backend_db):
+    """Test that a long-running cache deletes expired rows, not only warm() at startup."""
+    wall = FakeClock(now=1_700_000_000.0)
+    cache = Cache(expiry_seconds=10, sweep_interval=30, clock=clock,
+                  backend=SQLiteCacheBackend(backend_db, clock=wall))
+    cache.set((1,), "old advice")
+    
+    # The sweep after expiry marks the table for purging; the next write carries it out
+    clock.advance(31)
+    wall.advance(31)
+    cache.set((2,), "new advice")
+    
+    with sqlite3.connect(backend_db.db_path) as conn:
+        keys = [row[0] for row in conn.execute("SELECT cache_key FROM advice_cache")]
+    assert keys == ["[2]"]
@@ -0,0 +1,106 @@
+import pytest
+import markdown
+from bs4 import BeautifulSoup
+from utils.plain_text import markdown_to_text
+
+def reference(md_content):
+    """The markdown -> HTML -> BeautifulSoup conversion markdown_to_text replaces."""
+    return BeautifulSoup(markdown.markdown(md_content), "html.parser").get_text()
+
+# Markdown as chat models write it, plus the edge cases the parser has to agree on
+CORPUS = [
+    "",
+    "Your average is 125/82 mmHg, which is in the elevated range.\n\n"
+    "Morning readings are higher than evening ones.\n\n"
+    "Try to reduce salt, exercise regularly and keep logging.",
+    "## Summary\n\nYour readings look **normal**.\n\n### Advice\n\n"
+    "1. Keep a *regular* schedule.\n2. Reduce salt & caffeine.\n"
+    "3. See [your doctor](https://example.com) if > 140/90.\n\nStay well!",
+    "Hello **world**\n\nPara 2",
+    "Line1\nLine2",
+    "Text\n\n\n\nMore",
+    "\n\nlead",
+    "  indented para",
+    "a  \nb",
+    "a \nb",
+    "a   \nb\n",
+    "trailing  ",
+    "text  \n\n",
+    "# Title\nText",
+    "## Heading ##",
+    "#NoSpace",
+    "###### six",
+    "####### seven",
+    "Para\n# Heading",
+    "Title\n=====\n\nbody",
+    "Title\n-----",
+    "Heading\n---\ntext",
+    "a\nb\n===",
+    "# Title\n- a",
+    "---",
+    "* * *",
+    "line\n***\nnext",
+    "Paragraph one.\n\n---\n\nParagraph two.",
+    "Intro\n\n- a\n- b\n\nOutro",
+    "Intro:\n- a\n- b",
+    "a\n- b",
+    "1. one\n2. two",
+    "10. ten",
+    "1990. was a year",
+    "1) a\n2) b",
+    "- a\n* b",
+    "- a\n  - b\n- c",
+    "- a\n\n- b",
+    "- a\n\n\n- b\n\nend",
+    "- a\n\nafter",
+    "* item\n  continued",
+    "x\n\n- a\n- b\nlazy",
+    "Para\n\n  - indented item",
+    "- **Bold:** text",
+    "1. **First**: do this\n2. __Second__: that",
+    "- item with `code *not em*`",
+    "> quote\n> more",
+    "> q\n\n> r",
+    "> q\nlazy",
+    "a\n\n    code block\n\nb",
+    "a\n\n\tcode",
+    "\t tab",
+    "```\nfence\n```",
+    "`code` and [link](http://x) and _em_ and *em* and __b__",
+    "**Note:** `120/80` is *ideal*.",
+    "***both***",
+    "*a **b** c*",
+    "**a**b**c**",
+    "**unclosed",
+    "a*b*c",
+    "3 * 4 * 5",
+    "snake_case_name",
+    "a_b_c",
+    "_a_b",
+    "\\*not\\*",
+    "Use \\_underscores\\_ literally",
+    "~~strike~~",
+    "[x]",
+    "[x] (y)",
+    "<https://x.org>",
+    "![img](x.png) text",
+    "<b>html</b>",
+    "a <br> b",
+    "a  b",
+    "x & y < z > w \"q\" 'a'",
+    "120/80 mmHg; 5 < 6",
+    "&amp; &copy;",
+    "&lt;tag&gt;",
+    "&#169; &#xA9; AT&T &copy",
+]
+
+@pytest.mark.parametrize("md_content", CORPUS)
+def test_matches_markdown_and_beautifulsoup(md_content):
+    """Test that the output is identical to the markdown + BeautifulSoup pipeline."""
+    assert markdown_to_text(md_content) == reference(md_content)
+
+def test_strips_common_markup():
+    """Test the plain text of a typical formatted reply."""
+    text = markdown_to_text("## Advice\n\n- **Reduce** salt\n- Walk *daily*")
+    
+    assert text == "Advice\n\nReduce salt\nWalk daily\n"
@@ -0,0 +1,184 @@
+import asyncio
+import pytest
+from utils.singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Test that callers with the same key await a single call."""
+    # Setup
+    flight = SingleFlight()
+    calls = []
+    release = asyncio.Event()
+    
+    async def work(value):
+        calls.append(value)
+        await release.wait()
+        return value * 2
+    
+    # Execute
+    tasks = [asyncio.create_task(flight.do("key", work, 21)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert "key" in flight
+    release.set()
+    results = await asyncio.gather(*tasks)
+    
+    # Check
+    assert results == [42, 42, 42]
+    assert calls == [21]
+    await asyncio.sleep(0)
+    assert len(flight) == 0
+
+@pytest.mark.asyncio
+async def test_different_keys_run_separately():
+    """Test that calls with different keys are not coalesced."""
+    flight = SingleFlight()
+    calls = []
+    
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0)
+        return value
+    
+    results = await asyncio.gather(flight.do("a", work, 1), flight.do("b", work, 2))
+    
+    assert results == [1, 2]
+    assert sorted(calls) == [1, 2]
+
+@pytest.mark.asyncio
+async def test_exception_is_shared_and_key_released():
+    """Test that every waiter sees the failure and a later call starts afresh."""
+    flight = SingleFlight()
+    attempts = []
+    
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0)
+        raise ValueError("boom")
+    
+    results = await asyncio.gather(flight.do("key", failing), flight.do("key", failing),
+                                   return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(attempts) == 1
+    
+    await asyncio.sleep(0)
+    with pytest.raises(ValueError):
+        await flight.do("key", failing)
+    assert len(attempts) == 2
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    """Test that one waiter giving up leaves the shared call running."""
+    flight = SingleFlight()
+    release = asyncio.Event()
+    
+    async def work():
+        await release.wait()
+        return "done"
+    
+    first = asyncio.create_task(flight.do("key", work))
+    second = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+    
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    
+    assert await second == "done"
+    assert first.cancelled()
+
+async def collect(updates):
+    return [update async for update in updates]
+
+@pytest.mark.asyncio
+async def test_concurrent_streams_share_one_iteration():
+    """Test that callers streaming the same key follow a single generator."""
+    # Setup
+    flight = SingleFlight()
+    calls = []
+    release = asyncio.Event()
+    
+    async def words(text):
+        calls.append(text)
+        await release.wait()
+        for i, _ in enumerate(text.split()):
+            yield " ".join(text.split()[:i + 1])
+            await asyncio.sleep(0)
+    
+    # Execute
+    streams = [asyncio.create_task(collect(flight.stream("key", words, "a b c")))
+               for _ in range(2)]
+    await asyncio.sleep(0)
+    joined = asyncio.create_task(flight.do("key", words, "a b c"))
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*streams)
+    
+    # Check
+    assert results == [["a", "a b", "a b c"]] * 2
+    assert await joined == "a b c"
+    assert calls == ["a b c"]
+    await asyncio.sleep(0)
+    assert len(flight) == 0
+
+@pytest.mark.asyncio
+async def test_late_stream_starts_from_latest_value():
+    """Test that a caller joining a running stream first gets the latest value."""
+    flight = SingleFlight()
+    step = asyncio.Event()
+    
+    async def count():
+        for i in range(3):
+            yield i
+            await step.wait()
+            step.clear()
+    
+    first = flight.stream("key", count)
+    assert await first.__anext__() == 0
+    late = flight.stream("key", count)
+    assert await late.__anext__() == 0
+    step.set()
+    assert await first.__anext__() == 1
+    assert await late.__anext__() == 1
+    step.set()
+    await asyncio.sleep(0)
+    step.set()
+    assert [value async for value in first] == [2]
+    assert [value async for value in late] == [2]
+
+@pytest.mark.asyncio
+async def test_stream_failure_reaches_every_caller():
+    """Test that a failing shared stream raises in every caller after its values."""
+    flight = SingleFlight()
+    
+    async def broken():
+        yield "partial"
+        await asyncio.sleep(0)
+        raise ValueError("boom")
+    
+    async def follow():
+        seen = []
+        with pytest.raises(ValueError, match="boom"):
+            async for value in flight.stream("key", broken):
+                seen.append(value)
+        return seen
+    
+    assert await asyncio.gather(follow(), follow()) == [["partial"], ["partial"]]
+
+@pytest.mark.asyncio
+async def test_stream_joins_running_call():
+    """Test that a stream arriving during a do() call yields its result."""
+    flight = SingleFlight()
+    release = asyncio.Event()
+    
+    async def work():
+        await release.wait()
+        return "done"
+    
+    call = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+    stream = asyncio.create_task(collect(flight.stream("key", work)))
+    await asyncio.sleep(0)
+    release.set()
+    
+    assert await stream == ["done"]
+    assert await call == "done"
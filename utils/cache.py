@@ -1,40 +1,204 @@
-from datetime import datetime, timedelta
-from config import CACHE_EXPIRY
+import asyncio
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+import models.database as database_module
+from config import (CACHE_EXPIRY, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_SWEEP_INTERVAL,
+                    CACHE_BACKEND)
+
+logger = logging.getLogger(__name__)
+
+class SQLiteCacheBackend:
+    """Persists cache entries in the advice_cache table of the readings database.
+
+    Keys are stored as JSON text and expiry as Unix time, so entries keep their
+    remaining TTL across restarts.
+    """
+
+    def __init__(self, database=None, clock=time.time):
+        self._database = database
+        self._clock = clock
+
+    @property
+    def database(self):
+        """The backing Database, defaulting to the current module-level singleton."""
+        return self._database or database_module.db
+
+    @staticmethod
+    def encode_key(key):
+        """Serialize a cache key such as (user_id, start, end, pattern, max_timestamp)."""
+        return json.dumps(key, default=str)
+
+    def save(self, key, value, ttl):
+        """Store an entry that expires `ttl` seconds from now."""
+        self.database.set_cache_entry(key, value, self._clock() + ttl)
+
+    def purge(self):
+        """Delete expired entries."""
+        self.database.remove_expired_cache_entries(self._clock())
+
+    def load(self, limit):
+        """Drop expired entries and return up to `limit` (key, value, remaining_ttl), newest first."""
+        self.purge()
+        now = self._clock()
+        return [(key, value, expires_at - now)
+                for key, value, expires_at in self.database.get_cache_entries(now, limit)]
 
 class Cache:
-    """Simple in-memory cache with expiry."""
-    
-    def __init__(self, expiry_seconds=CACHE_EXPIRY):
-        self._cache = {}  # key -> (timestamp, value)
+    """In-memory LRU cache with expiry and entry-count and byte budgets.
+
+    Timestamps come from a monotonic clock, so wall-clock changes never expire or
+    revive entries. Expired entries are dropped when read and by a sweep that runs
+    at most once per `sweep_interval` seconds from get()/set(), so the cost is amortized.
+
+    With a `backend`, keys are serialized with backend.encode_key(), every set() is
+    written through to it and warm() reloads its unexpired entries. The sweep also
+    marks the backend for purging, which the next write through carries out.
+    Coroutines should use set_async(), which writes through in a worker thread.
+    """
+
+    def __init__(self, expiry_seconds=CACHE_EXPIRY, max_entries=CACHE_MAX_ENTRIES,
+                 max_bytes=CACHE_MAX_BYTES, sweep_interval=CACHE_SWEEP_INTERVAL,
+                 clock=time.monotonic, backend=None):
+        self._cache = OrderedDict()  # key -> (timestamp, value, size), least recently used first
+        self.backend = backend
         self.expiry_seconds = expiry_seconds
-    
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._bytes = 0
+        self._last_sweep = clock()
+        self._purge_due = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the cached values."""
+        return self._bytes
+
     def get(self, key):
         """Get a value from cache if it exists and hasn't expired."""
-        if key in self._cache:
-            timestamp, value = self._cache[key]
-            if datetime.now() - timestamp < timedelta(seconds=self.expiry_seconds):
+        key = self._encode(key)
+        with self._lock:
+            now = self._clock()
+            self._maybe_sweep(now)
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            timestamp, value, _ = entry
+            if now - timestamp < self.expiry_seconds:
+                self._cache.move_to_end(key)
                 return value
             # Clean up expired entry
-            del self._cache[key]
-        return None
-    
+            self._remove(key)
+            return None
+
     def set(self, key, value):
-        """Store a value in the cache."""
-        self._cache[key] = (datetime.now(), value)
-    
+        """Store a value in the cache, evicting least recently used entries if over budget."""
+        key = self._encode(key)
+        if self._store(key, value, self.expiry_seconds):
+            self._persist(key, value)
+
+    async def set_async(self, key, value):
+        """set() for coroutines; the backend write runs in a worker thread.
+
+        A write can wait up to SQLite's busy timeout behind another writer, which
+        must not stall the event loop.
+        """
+        key = self._encode(key)
+        if self._store(key, value, self.expiry_seconds) and self.backend is not None:
+            await asyncio.to_thread(self._persist, key, value)
+
+    def _persist(self, key, value):
+        """Write an entry through to the backend, purging expired ones if a sweep asked to."""
+        if self.backend is None:
+            return
+        try:
+            self.backend.save(key, value, self.expiry_seconds)
+            if self._purge_due:
+                self._purge_due = False
+                self.backend.purge()
+        except sqlite3.Error:
+            # The in-memory copy still serves this process
+            logger.exception("Failed to persist cache entry")
+
+    def warm(self):
+        """Load unexpired entries from the backend and return how many were loaded."""
+        if self.backend is None:
+            return 0
+        entries = self.backend.load(self.max_entries)
+        # Oldest first, so the newest entries end up most recently used
+        for key, value, remaining in reversed(entries):
+            self._store(key, value, remaining)
+        return len(entries)
+
+    def _encode(self, key):
+        return key if self.backend is None else self.backend.encode_key(key)
+
+    def _store(self, key, value, ttl):
+        """Insert an entry that expires in `ttl` seconds; return False if it is too large."""
+        size = sys.getsizeof(value)
+        with self._lock:
+            now = self._clock()
+            self._maybe_sweep(now)
+            if key in self._cache:
+                self._remove(key)
+            if size > self.max_bytes:
+                # Would evict everything else and still not fit
+                return False
+            # Backdate the timestamp so the entry expires after `ttl` rather than a full expiry
+            self._cache[key] = (now - (self.expiry_seconds - ttl), value, size)
+            self._bytes += size
+            while len(self._cache) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._cache)))
+            return True
+
     def clear(self):
-        """Clear all cache entries."""
-        self._cache.clear()
-    
+        """Clear all in-memory cache entries."""
+        with self._lock:
+            self._cache.clear()
+            self._bytes = 0
+
     def prune(self):
         """Remove expired cache entries."""
-        now = datetime.now()
+        with self._lock:
+            self._prune(self._clock())
+
+    def _maybe_sweep(self, now):
+        if now - self._last_sweep >= self.sweep_interval:
+            self._prune(now)
+
+    def _prune(self, now):
+        self._last_sweep = now
+        # Every data version gets a new key, so persisted entries only ever expire
+        self._purge_due = self.backend is not None
         expired_keys = [
-            key for key, (timestamp, _) in self._cache.items()
-            if now - timestamp >= timedelta(seconds=self.expiry_seconds)
+            key for key, (timestamp, _, _) in self._cache.items()
+            if now - timestamp >= self.expiry_seconds
         ]
         for key in expired_keys:
-            del self._cache[key]
+            self._remove(key)
+
+    def _remove(self, key):
+        _, _, size = self._cache.pop(key)
+        self._bytes -= size
 
 # Initialize the cache
-cache = Cache()
\ No newline at end of file
+cache = Cache()
+
+def init_cache(database=None):
+    """Attach the configured persistent backend to the shared cache and warm it.
+
+    Returns the number of entries loaded.
+    """
+    if CACHE_BACKEND == "sqlite":
+        cache.backend = SQLiteCacheBackend(database)
+    return cache.warm()
@@ -0,0 +1,179 @@
+import html
+import re
+
+# Reproduces the text of BeautifulSoup(markdown.markdown(md)).get_text() for the
+# markdown that chat models actually write, without either library: block elements
+# are recognized line by line and inline markup is removed with a few regexes.
+
+ATX_HEADING = re.compile(r"^(#{1,6})(.*?)#*$")
+SETEXT_UNDERLINE = re.compile(r"^(=+|-+)[ ]*$")
+HORIZONTAL_RULE = re.compile(r"^ {0,3}([-*_])(?: *\1){2,} *$")
+LIST_ITEM = re.compile(r"^ {0,3}(?:[*+-]|\d+\.)[ ]+(.*)$")
+BLOCKQUOTE = re.compile(r"^ {0,3}> ?(.*)$")
+
+CODE_SPAN = re.compile(r"(?<![\\`])(`+)(?!`)(.+?)(?<!`)\1(?!`)", re.DOTALL)
+ESCAPE = re.compile(r"\\([\\`*_{}\[\]()>#+\-.!])")
+AUTOLINK = re.compile(r"<((?:https?|ftp)://[^<>\s]+)>")
+HTML_TAG = re.compile(r"</?[A-Za-z][A-Za-z0-9-]*(?:\s[^<>]*)?/?>")
+IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+# (marker character, pattern), strongest first; the character check skips most text
+EMPHASIS = [
+    ("*", re.compile(r"\*\*\*(?=\S)(.+?)(?<=\S)\*\*\*", re.DOTALL)),
+    ("_", re.compile(r"(?<!\w)___(?=\S)(.+?)(?<=\S)___(?!\w)", re.DOTALL)),
+    ("*", re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*", re.DOTALL)),
+    ("_", re.compile(r"(?<!\w)__(?=\S)(.+?)(?<=\S)__(?!\w)", re.DOTALL)),
+    ("*", re.compile(r"\*(?=\S)(.+?)(?<=\S)\*", re.DOTALL)),
+    ("_", re.compile(r"(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)", re.DOTALL)),
+]
+ENTITY = re.compile(r"&(?:#\d+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);")
+HARD_BREAK = re.compile(r"  \n")
+MARKUP = re.compile(r"[`\\<\[*_&]")
+
+# Protected text is swapped for these markers while the other rules run
+PLACEHOLDER = re.compile("\x02(\\d+)\x03")
+
+def _inline(text):
+    """Remove inline markup, keeping code spans and escaped characters literal."""
+    if not MARKUP.search(text):
+        return text
+    protected = []
+
+    def protect(value):
+        protected.append(value)
+        return f"\x02{len(protected) - 1}\x03"
+
+    if "`" in text:
+        text = CODE_SPAN.sub(lambda m: protect(m.group(2).strip()), text)
+    if "\\" in text:
+        text = ESCAPE.sub(lambda m: protect(m.group(1)), text)
+    if "<" in text:
+        text = AUTOLINK.sub(lambda m: protect(m.group(1)), text)
+        text = HTML_TAG.sub("", text)
+    if "](" in text:
+        text = IMAGE.sub("", text)
+        text = LINK.sub(r"\1", text)
+    for marker, pattern in EMPHASIS:
+        # Repeat so nested emphasis of the same kind is removed too
+        replaced = marker in text
+        while replaced:
+            text, replaced = pattern.subn(r"\1", text)
+    if "&" in text:
+        text = ENTITY.sub(lambda m: html.unescape(m.group(0)), text)
+    if protected:
+        text = PLACEHOLDER.sub(lambda m: protected[int(m.group(1))], text)
+    return text
+
+def _is_blank(line):
+    return not line.strip()
+
+def _indent(line):
+    return len(line) - len(line.lstrip(" "))
+
+def _interrupts_paragraph(line):
+    return bool(ATX_HEADING.match(line) or HORIZONTAL_RULE.match(line))
+
+def _code_block(lines, i):
+    block = []
+    while i < len(lines) and (_is_blank(lines[i]) or _indent(lines[i]) >= 4):
+        block.append(lines[i][4:])
+        i += 1
+    while block and _is_blank(block[-1]):
+        block.pop()
+    return "\n".join(block) + "\n", i
+
+def _blockquote(lines, i):
+    inner = []
+    while i < len(lines):
+        match = BLOCKQUOTE.match(lines[i])
+        if match:
+            inner.append(match.group(1))
+        elif _is_blank(lines[i]):
+            # A blank line only continues the quote if more quoted lines follow
+            j = i
+            while j < len(lines) and _is_blank(lines[j]):
+                j += 1
+            if j == len(lines) or not BLOCKQUOTE.match(lines[j]):
+                break
+            inner.append("")
+        elif inner and not _is_blank(inner[-1]):
+            inner.append(lines[i])  # Lazy continuation of a quoted paragraph
+        else:
+            break
+        i += 1
+    return "\n" + "\n".join(_blocks(inner)) + "\n", i
+
+def _list(lines, i):
+    items = []
+    loose = False
+    while i < len(lines):
+        match = LIST_ITEM.match(lines[i])
+        if match and not HORIZONTAL_RULE.match(lines[i]):
+            items.append([match.group(1)])
+        elif _is_blank(lines[i]):
+            j = i
+            while j < len(lines) and _is_blank(lines[j]):
+                j += 1
+            if j == len(lines) or not LIST_ITEM.match(lines[j]):
+                break
+            loose = True
+            i = j
+            continue
+        else:
+            items[-1].append(lines[i])  # Continuation line of the current item
+        i += 1
+
+    texts = [_inline(HARD_BREAK.sub("\n", "\n".join(item))) for item in items]
+    if loose:
+        texts = [f"\n{text}\n" for text in texts]
+    return "\n" + "\n".join(texts) + "\n", i
+
+def _paragraph(lines, i):
+    block = [lines[i]]
+    i += 1
+    while i < len(lines) and not _is_blank(lines[i]) and not _interrupts_paragraph(lines[i]):
+        block.append(lines[i])
+        i += 1
+    return _inline(HARD_BREAK.sub("\n", "\n".join(block).lstrip())), i
+
+def _blocks(lines):
+    """Return the text of each block element in lines."""
+    texts = []
+    i = 0
+    at_block_start = True
+    while i < len(lines):
+        line = lines[i]
+        if _is_blank(line):
+            at_block_start = True
+            i += 1
+            continue
+        if at_block_start and _indent(line) >= 4:
+            text, i = _code_block(lines, i)
+        # Headings and rules end their block, so the line after them starts a new one
+        elif HORIZONTAL_RULE.match(line):
+            texts.append("")
+            i += 1
+            continue
+        elif ATX_HEADING.match(line):
+            texts.append(_inline(ATX_HEADING.match(line).group(2).strip()))
+            i += 1
+            continue
+        elif (i + 1 < len(lines) and SETEXT_UNDERLINE.match(lines[i + 1])
+              and not LIST_ITEM.match(line) and not BLOCKQUOTE.match(line)):
+            texts.append(_inline(line.strip()))
+            i += 2
+            continue
+        elif BLOCKQUOTE.match(line):
+            text, i = _blockquote(lines, i)
+        elif at_block_start and LIST_ITEM.match(line):
+            text, i = _list(lines, i)
+        else:
+            text, i = _paragraph(lines, i)
+        texts.append(text)
+        # Only a blank line lets the next line start a list or code block
+        at_block_start = False
+    return texts
+
+def markdown_to_text(md_content):
+    """Convert markdown to plain text in one pass over its lines."""
+    return "\n".join(_blocks(md_content.expandtabs(4).split("\n")))
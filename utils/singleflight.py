@@ -0,0 +1,103 @@
+import asyncio
+
+# Queue marker for the end of a shared stream
+_DONE = object()
+
+class _Broadcast:
+    """The latest value of a shared stream and the queues of the callers following it."""
+
+    def __init__(self):
+        self.values = 0
+        self.latest = None
+        self.queues = set()
+
+    def publish(self, value):
+        self.values += 1
+        self.latest = value
+        for queue in self.queues:
+            queue.put_nowait(value)
+
+    def close(self):
+        for queue in self.queues:
+            queue.put_nowait(_DONE)
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight task.
+
+    Callers that arrive while a call for their key is running await its result instead
+    of starting their own. The key is forgotten once the call finishes, so later callers
+    start afresh. Must be used from the event loop thread.
+
+    stream() does the same for async generators: every caller follows one shared
+    iteration, and do() callers with the same key await its last value.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._broadcasts = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    def __contains__(self, key):
+        return key in self._calls
+
+    async def do(self, key, func, *args, **kwargs):
+        """Await func(*args, **kwargs), sharing one call among concurrent callers with `key`.
+
+        Every caller receives the same result or exception.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # Shielded so that one caller giving up doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def stream(self, key, func, *args, **kwargs):
+        """Iterate func(*args, **kwargs), an async generator, sharing it among callers with `key`.
+
+        A caller that joins late starts from the latest value. Every caller gets each
+        value from then on and the same exception if the generator fails. Joining a
+        do() call with the same key yields its result once it is done.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            broadcast = _Broadcast()
+            task = asyncio.ensure_future(self._pump(func(*args, **kwargs), broadcast))
+            self._calls[key] = task
+            self._broadcasts[key] = broadcast
+
+            def finished(_):
+                self._calls.pop(key, None)
+                self._broadcasts.pop(key, None)
+                broadcast.close()
+            task.add_done_callback(finished)
+
+        broadcast = self._broadcasts.get(key)
+        if broadcast is None:
+            yield await asyncio.shield(task)
+            return
+
+        queue = asyncio.Queue()
+        if broadcast.values:
+            queue.put_nowait(broadcast.latest)
+        if task.done():
+            queue.put_nowait(_DONE)
+        broadcast.queues.add(queue)
+        try:
+            while (value := await queue.get()) is not _DONE:
+                yield value
+        finally:
+            broadcast.queues.discard(queue)
+        # Raises the generator's exception, if it failed
+        task.result()
+
+    @staticmethod
+    async def _pump(values, broadcast):
+        """Publish each value of an async generator and return the last one."""
+        value = None
+        async for value in values:
+            broadcast.publish(value)
+        return value